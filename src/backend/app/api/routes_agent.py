@@ -99,11 +99,11 @@ async def activate_agent(body: ActivateAgentRequest, request: Request):
             )
             _ = generate_demo_actions(chosen.get("id", scenario_id), "p05")
         else:
-            from pipeline.extractor import extract_persona_data
+            from pipeline.extractor import aextract_persona_data
             from pipeline.scenario_gen import generate_scenarios as generate_scenarios_llm
             from pipeline.action_planner import generate_actions
 
-            extracted = extract_persona_data("p05")
+            extracted = await aextract_persona_data("p05")
             scenarios = await generate_scenarios_llm(extracted)
             chosen = next(
                 (s for s in scenarios if s.get("id") == body.scenario_id),
@@ -212,7 +212,7 @@ async def stream_agent_events(request: Request):
     from app.deps import get_master
 
     master = get_master(request)
-    return await stream_events(master)
+    return await stream_events(request, last_event_id=None, types=None, quest=None, policy=None, master=master)
 
 
 # ---------------------------------------------------------------------------
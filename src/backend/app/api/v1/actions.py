@@ -73,7 +73,7 @@ async def create_actions(
             # skips action LLM if data_refs / scenario inputs haven't changed.
             try:
                 from daemon.analysis_cache import get_analysis_cache
-                analysis_cache = get_analysis_cache()
+                analysis_cache = get_analysis_cache(persona_id)
             except Exception:
                 analysis_cache = None
 
@@ -103,11 +103,11 @@ async def create_actions(
                 result = {"scenario_id": chosen.get("id", scenario_id), "actions": actions_list}
             else:
                 # Fallback: direct pipeline (no cache)
-                from pipeline.extractor import extract_persona_data
+                from pipeline.extractor import aextract_persona_data
                 from pipeline.scenario_gen import generate_scenarios as generate_scenarios_llm
                 from pipeline.action_planner import generate_actions
 
-                extracted = extract_persona_data(persona_id)
+                extracted = await aextract_persona_data(persona_id)
                 scenarios = await asyncio.wait_for(
                     generate_scenarios_llm(extracted), timeout=30.0
                 )
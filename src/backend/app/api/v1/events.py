@@ -3,17 +3,20 @@
 from __future__ import annotations
 
 import asyncio
-import json
+from datetime import UTC, datetime
 from typing import Any
 
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.api.v1.schemas import ListObject, generate_id, epoch_now, paginate
+from app.api.v1.quests import build_quest
+from app.api.v1.schemas import ListObject, generate_id, epoch_now
 from app.auth import get_livemode, get_mode
 from app.deps import get_master
+from app.middleware.errors import ApiException
 from deepagent.loop import AlwaysOnMaster
+from deepagent.stream import SLOW_CONSUMER_POLICIES, STREAM_CLOSED, event_quest
 
 router = APIRouter()
 
@@ -57,19 +60,119 @@ async def create_event(
         "type": event.get("type", body.type),
         "payload": event.get("payload", payload),
         "cycle": result.get("cycle"),
+        "task": (
+            {"id": result["task_id"], "deduplicated": result["deduplicated"]}
+            if result.get("task_id")
+            else None
+        ),
     }
 
 
+def _created_cursor(value: str) -> str:
+    """Accept ``created[gte]`` as epoch seconds or ISO-8601 and return ISO-8601 (UTC)."""
+    value = value.strip()
+    try:
+        try:
+            seconds = int(value)
+        except ValueError:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=UTC)
+            return parsed.astimezone(UTC).isoformat()
+        return datetime.fromtimestamp(seconds, UTC).isoformat()
+    except (ValueError, OverflowError, OSError):
+        # Out-of-range timestamps overflow rather than fail to parse.
+        raise ApiException(
+            status_code=400,
+            code="parameter_invalid",
+            message="created[gte] must be epoch seconds or an ISO-8601 timestamp.",
+            param="created[gte]",
+        ) from None
+
+
+def _epoch(created_at: str) -> int:
+    try:
+        return int(datetime.fromisoformat(created_at).timestamp())
+    except (TypeError, ValueError):
+        return epoch_now()
+
+
+def _cursor_seq(log, event_id: str, param: str) -> int:
+    seq = log.seq_for_id(event_id)
+    if seq is None and event_id.startswith("evt_"):
+        seq = log.seq_for_id(event_id.removeprefix("evt_"))
+    if seq is None:
+        raise ApiException(
+            status_code=400,
+            code="resource_missing",
+            message=f"{param} does not reference a retained event.",
+            param=param,
+        )
+    return seq
+
+
+def _read_page(
+    log,
+    quest: str | None,
+    limit: int,
+    after_seq: int,
+    before_seq: int | None = None,
+    types: list[str] | None = None,
+    descending: bool = False,
+) -> tuple[list[dict[str, Any]], bool]:
+    """``log.read`` narrowed to one quest's events, still up to ``limit`` of them per page."""
+    if quest is None:
+        return log.read(after_seq=after_seq, before_seq=before_seq, limit=limit, types=types, descending=descending)
+    matched: list[dict[str, Any]] = []
+    while True:
+        batch, more = log.read(
+            after_seq=after_seq, before_seq=before_seq, limit=limit, types=types, descending=descending
+        )
+        for event in batch:
+            if event_quest(event) != quest:
+                continue
+            if len(matched) == limit:
+                return matched, True
+            matched.append(event)
+        if not more or not batch:
+            return matched, False
+        if descending:
+            before_seq = batch[-1]["seq"]
+        else:
+            after_seq = batch[-1]["seq"]
+
+
 @router.get("/events")
 async def list_events(
     request: Request,
     quest: str | None = Query(None),
     limit: int = Query(20, ge=1, le=100),
     starting_after: str | None = Query(None),
+    ending_before: str | None = Query(None),
+    types: list[str] | None = Query(None, alias="type"),
+    created_gte: str | None = Query(None, alias="created[gte]"),
     master: AlwaysOnMaster = Depends(get_master),
 ):
-    state = await master.get_state()
-    events = state.get("event_history", [])
+    """Newest events first, keyset-paginated over the on-disk event log.
+
+    ``type`` and ``quest`` narrow the list as they do the stream; a ``qst_``
+    id for the active quest is matched as its scenario id.
+    """
+    log = master.events
+    scope = await _quest_scope(master, quest)
+    lower = 0
+    if created_gte:
+        lower = log.seq_at_or_after(_created_cursor(created_gte)) - 1
+
+    if ending_before:
+        after_seq = max(lower, _cursor_seq(log, ending_before, "ending_before"))
+        events, has_more = _read_page(log, scope, limit, after_seq=after_seq, types=types)
+        events.reverse()
+    else:
+        before_seq = _cursor_seq(log, starting_after, "starting_after") if starting_after else None
+        events, has_more = _read_page(
+            log, scope, limit, after_seq=lower, before_seq=before_seq, types=types, descending=True
+        )
     livemode = get_livemode(request.headers.get("Authorization"))
 
     resources = []
@@ -81,7 +184,7 @@ async def list_events(
             {
                 "id": evt_id,
                 "object": "event",
-                "created": epoch_now(),
+                "created": _epoch(e.get("created_at", "")),
                 "livemode": livemode,
                 "metadata": {},
                 "type": e.get("type", ""),
@@ -89,30 +192,76 @@ async def list_events(
             }
         )
 
-    page, has_more = paginate(resources, limit=limit, starting_after=starting_after)
-    return ListObject(data=page, has_more=has_more, url="/v1/events").model_dump(
+    return ListObject(data=resources, has_more=has_more, url="/v1/events").model_dump(
         mode="json"
     )
 
 
+def _last_event_id(request: Request, last_event_id: str | None) -> int | None:
+    raw = request.headers.get("Last-Event-ID") or last_event_id
+    if raw is None or not raw.strip():
+        return None
+    try:
+        return max(0, int(raw.strip()))
+    except ValueError:
+        raise ApiException(
+            status_code=400,
+            code="parameter_invalid",
+            message="Last-Event-ID must be a stream sequence number from a previous id: line.",
+            param="last_event_id",
+        ) from None
+
+
 @router.get("/events/stream")
-async def stream_events(master: AlwaysOnMaster = Depends(get_master)):
-    sid, queue = master.stream.subscribe()
+async def stream_events(
+    request: Request,
+    last_event_id: str | None = Query(None),
+    types: list[str] | None = Query(None),
+    quest: str | None = Query(None),
+    policy: str | None = Query(None),
+    master: AlwaysOnMaster = Depends(get_master),
+):
+    """SSE stream of master events; resumes after ``Last-Event-ID`` (header or query) on reconnect.
+
+    ``types`` and ``quest`` narrow the stream server-side. A ``qst_`` id for the
+    active quest is matched as its scenario id. ``policy`` picks what happens
+    when this client falls behind (see :mod:`deepagent.stream`).
+    """
+    resume_from = _last_event_id(request, last_event_id)
+    if policy is not None and policy not in SLOW_CONSUMER_POLICIES:
+        raise ApiException(
+            status_code=400,
+            code="parameter_invalid",
+            message=f"policy must be one of: {', '.join(SLOW_CONSUMER_POLICIES)}.",
+            param="policy",
+        )
+    sid, queue = master.stream.subscribe(
+        types=types, quest=await _quest_scope(master, quest), policy=policy
+    )
+    backlog = master.stream.replay(resume_from, sid=sid) if resume_from is not None else []
 
     async def event_generator():
         try:
+            for frame in backlog:
+                yield frame.data
             while True:
                 try:
-                    event = await asyncio.wait_for(queue.get(), timeout=20.0)
-                    # Prefix event IDs
-                    if isinstance(event, dict) and "event_id" in event:
-                        eid = event["event_id"]
-                        if not eid.startswith("evt_"):
-                            event["event_id"] = f"evt_{eid}"
-                    yield f"data: {json.dumps(event)}\n\n"
+                    frame = await asyncio.wait_for(queue.get(), timeout=20.0)
+                    yield frame.data
+                    if frame.type == STREAM_CLOSED:
+                        return
                 except asyncio.TimeoutError:
-                    yield ": keepalive\n\n"
+                    yield b": keepalive\n\n"
         finally:
             master.stream.unsubscribe(sid)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+async def _quest_scope(master: AlwaysOnMaster, quest: str | None) -> str | None:
+    if not quest or not quest.startswith("qst_"):
+        return quest
+    active = build_quest(await master.get_state())
+    if active and active["id"] == quest:
+        return active["scenario"]
+    return quest
@@ -561,10 +561,13 @@ async def poll_figma_comments(
         if watcher:
             synthesized["watcher_id"] = str(watcher.get("watcher_id", ""))
 
-        result = await master.ingest_event("integration.figma.webhook.received", synthesized)
+        await master.ingest_event("integration.figma.webhook.received", synthesized, dispatch=False)
         ingested += 1
         submitted_comment_ids.append(comment_id)
-        cycle = result.get("cycle", {})
+
+    if ingested:
+        # One dispatch cycle for the whole batch instead of one per comment.
+        cycle = await master.request_cycle(trigger="integration.figma.webhook.received")
         if isinstance(cycle, dict):
             cycles.append(cycle)
 
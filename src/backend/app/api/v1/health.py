@@ -7,6 +7,8 @@ import os
 from fastapi import APIRouter, Request
 
 from app.auth import get_livemode
+from daemon.analysis_cache import get_analysis_registry
+from deepagent.workers.kg_worker import get_retrieval_cache
 
 router = APIRouter()
 
@@ -27,6 +29,7 @@ async def health(request: Request):
         rag_ok = False
 
     livemode = get_livemode(request.headers.get("Authorization"))
+    master = getattr(request.app.state, "always_on_master", None)
 
     return {
         "object": "health",
@@ -34,4 +37,16 @@ async def health(request: Request):
         "backend": "openai" if os.environ.get("OPENAI_API_KEY") else "ollama",
         "rag": rag_ok,
         "livemode": livemode,
+        "stream": master.stream.stats() if master is not None else None,
+        "leader": _leader_status(request, master),
+        "kg_cache": get_retrieval_cache().stats(),
+        "analysis_cache": registry.stats() if (registry := get_analysis_registry()) is not None else None,
     }
+
+
+def _leader_status(request: Request, master) -> dict:
+    election = getattr(request.app.state, "leader_election", None)
+    if election is not None:
+        return election.status()
+    # No election configured: this process always leads.
+    return {"role": "leader" if master is None or master.is_leader else "follower", "election": False}
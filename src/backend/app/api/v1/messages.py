@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import time
 from typing import List
 
 from fastapi import APIRouter, Request
@@ -13,9 +15,11 @@ from pydantic import BaseModel
 from app.auth import get_mode
 from utils import (
     ClientMessage,
+    DataPart,
+    TextDelta,
+    aiter_ollama_events,
+    aiter_openai_events,
     extract_text,
-    iter_ollama_events,
-    iter_openai_events,
     patch_response_with_headers,
     wrap_stream,
 )
@@ -55,11 +59,67 @@ class CreateMessageRequest(BaseModel):
     model_config = {"extra": "allow"}
 
 
+# Holds in-flight retrievals; one that overruns the budget or outlives its client
+# keeps running so it still warms the KG cache.
+_background_retrievals: set[asyncio.Task] = set()
+
+
+def _kg_budget_seconds() -> float:
+    return int(os.environ.get("AGENT_CHAT_KG_BUDGET_MS", "1500")) / 1000
+
+
+def _early_start() -> bool:
+    return os.environ.get("AGENT_CHAT_EARLY_START", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+async def _retrieve_kg_context(query: str, mode: str, intent: str) -> tuple[str | None, str | None]:
+    """Return ``(context, intent)`` from the KG worker, routed by ``intent``; ``(None, None)`` on failure."""
+    from deepagent.workers.kg_worker import KgWorker
+
+    kg = KgWorker()
+    kg_payload: dict = {"query": query, "intent": intent}
+
+    if mode == "demo":
+        # Use demo snippets — no external services needed
+        kg_payload["demo_mode"] = True
+    else:
+        # Live mode: lazily init LightRAG if not already running
+        import main as main_mod
+        if main_mod._rag is None:
+            from deepagent.workers.kg_worker import _create_rag_instance
+            rag = _create_rag_instance()
+            if rag is not None:
+                await rag.initialize_storages()
+                main_mod._rag = rag
+
+    result = await kg._search(kg_payload)
+    if not (result.ok and result.data):
+        return None, None
+    raw = result.data.get("raw_context")
+    snippets = result.data.get("snippets", [])
+    context = raw or ("\n\n".join(snippets) if snippets else None)
+    return context, result.data.get("intent")
+
+
+async def _await_kg_context(task: asyncio.Task, budget: float) -> tuple[str | None, str | None, str]:
+    """Wait up to ``budget`` seconds for retrieval; returns ``(context, intent, status)``."""
+    done, _ = await asyncio.wait({task}, timeout=budget)
+    if not done:
+        return None, None, "timeout"
+    try:
+        context, intent = task.result()
+    except Exception as e:
+        logger.error(f"KG retrieval error: {e}")
+        return None, None, "error"
+    return context, intent, "ready" if context else "empty"
+
+
 @router.post("/messages")
 async def create_message(body: CreateMessageRequest, request: Request):
     from deepagent.workers.kg_worker import classify_intent
-    from deepagent.persona.prompt_builder import build_system_prompt
+    from deepagent.persona.prompt_packer import ActionItem, pack_prompt
 
+    received = time.perf_counter()
     USE_OPENAI = bool(os.environ.get("OPENAI_API_KEY"))
     OPENAI_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
 
@@ -69,39 +129,20 @@ async def create_message(body: CreateMessageRequest, request: Request):
             last_user_text = extract_text(msg)
             break
 
+    # Classified once: this intent routes KG retrieval and is reported in
+    # x-porthon-intent, which goes out before retrieval finishes.
     intent = classify_intent(last_user_text) if last_user_text else "casual"
-    context = None
     mode = get_mode(request.headers.get("Authorization"))
 
-    try:
-        from deepagent.workers.kg_worker import KgWorker
-        kg = KgWorker()
-        kg_payload: dict = {"query": last_user_text}
-
-        if mode == "demo":
-            # Use demo snippets — no external services needed
-            kg_payload["demo_mode"] = True
-        else:
-            # Live mode: lazily init LightRAG if not already running
-            import main as main_mod
-            if main_mod._rag is None:
-                from deepagent.workers.kg_worker import _create_rag_instance
-                rag = _create_rag_instance()
-                if rag is not None:
-                    await rag.initialize_storages()
-                    main_mod._rag = rag
-
-        result = await kg._search(kg_payload)
-        if result.ok and result.data:
-            raw = result.data.get("raw_context")
-            snippets = result.data.get("snippets", [])
-            if raw:
-                context = raw
-            elif snippets:
-                context = "\n\n".join(snippets)
-            intent = result.data.get("intent", intent)
-    except Exception as e:
-        logger.error(f"KG retrieval error: {e}")
+    # Retrieval starts now; with early start the response opens without waiting for it.
+    kg_task = asyncio.create_task(_retrieve_kg_context(last_user_text, mode, intent))
+    _background_retrievals.add(kg_task)
+    kg_task.add_done_callback(_background_retrievals.discard)
+    kg_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    early = _early_start()
+    if not early:
+        await asyncio.wait({kg_task})
+    budget = _kg_budget_seconds() if early else None
 
     scenario_context = None
     if body.scenario:
@@ -111,24 +152,64 @@ async def create_message(body: CreateMessageRequest, request: Request):
             f"{body.scenario.summary}"
         )
 
-    actions_context = None
-    if body.actions:
-        lines = []
-        for i, a in enumerate(body.actions, 1):
-            label = a.title or a.action
-            lines.append(f"{i:02d}. {label}")
-            lines.append(f"    Rationale: {a.rationale}")
-            if a.data_ref:
-                lines.append(f"    Grounded in: {a.data_ref}")
-        actions_context = "\n".join(lines)
-
-    system_prompt = build_system_prompt(context=context, intent=intent, scenario=scenario_context, actions=actions_context)
-
-    events = (
-        iter_openai_events(body.messages, model=OPENAI_MODEL, system_prompt=system_prompt)
-        if USE_OPENAI
-        else iter_ollama_events(body.messages, host=OLLAMA_HOST, model=OLLAMA_MODEL, system_prompt=system_prompt)
-    )
-    response = StreamingResponse(wrap_stream(events), media_type="text/event-stream")
+    actions = [
+        ActionItem(
+            label=a.title or a.action,
+            details=[f"Rationale: {a.rationale}"] + ([f"Grounded in: {a.data_ref}"] if a.data_ref else []),
+        )
+        for a in body.actions
+    ]
+    model = OPENAI_MODEL if USE_OPENAI else OLLAMA_MODEL
+
+    async def chat_events():
+        # wrap_stream hands the start frame to the server before pulling our first
+        # event, so this is when the first body chunk went out.
+        first_chunk_ms = (time.perf_counter() - received) * 1000
+        if not kg_task.done():
+            yield DataPart("kg-status", {"status": "retrieving", "budget_ms": round(budget * 1000)}, transient=True)
+        kg_started = time.perf_counter()
+        context, kg_intent, kg_status = await _await_kg_context(kg_task, budget)
+        kg_wait_ms = (time.perf_counter() - kg_started) * 1000
+        if kg_status == "timeout":
+            logger.warning("Chat: KG retrieval exceeded %.0f ms budget; answering without KG context", budget * 1000)
+        yield DataPart(
+            "kg-status", {"status": kg_status, "context": context is not None, "wait_ms": round(kg_wait_ms)}, transient=True
+        )
+
+        # Tokenizing long histories (and a first-use BPE load) stays off the event loop.
+        packed = await asyncio.to_thread(
+            pack_prompt,
+            model,
+            body.messages,
+            extract_text,
+            context=context,
+            intent=kg_intent or intent,
+            scenario=scenario_context,
+            actions=actions,
+        )
+        yield DataPart("prompt-usage", packed.usage, transient=True)
+        # Async iterators keep each open chat stream on the event loop rather than a threadpool thread.
+        events = (
+            aiter_openai_events(packed.messages, model=OPENAI_MODEL, system_prompt=packed.system_prompt)
+            if USE_OPENAI
+            else aiter_ollama_events(
+                packed.messages, host=OLLAMA_HOST, model=OLLAMA_MODEL, system_prompt=packed.system_prompt
+            )
+        )
+        ttft_ms = None
+        async for event in events:
+            if ttft_ms is None and isinstance(event, TextDelta):
+                ttft_ms = (time.perf_counter() - received) * 1000
+            yield event
+        logger.info(
+            "Chat timing: prep=%.0fms first_chunk=%.0fms ttft=%sms kg=%s kg_wait=%.0fms early_start=%s prompt_tokens=%d/%d",
+            prep_ms, first_chunk_ms, "-" if ttft_ms is None else f"{ttft_ms:.0f}", kg_status, kg_wait_ms, early,
+            packed.usage["prompt_tokens"], packed.usage["budget"],
+        )
+
+    response = StreamingResponse(wrap_stream(chat_events()), media_type="text/event-stream")
     response.headers["x-porthon-intent"] = intent
+    # Handler time before the response opens; the first-chunk time is only known later, so it is logged.
+    prep_ms = (time.perf_counter() - received) * 1000
+    response.headers["Server-Timing"] = f'prep;desc="request prep before streaming";dur={prep_ms:.1f}'
     return patch_response_with_headers(response)
@@ -105,7 +105,7 @@ def _patterns_from_cache(persona_id: str) -> list[Pattern] | None:
     try:
         from daemon.analysis_cache import get_analysis_cache
 
-        cache = get_analysis_cache()
+        cache = get_analysis_cache(persona_id)
         if cache is None:
             return None
 
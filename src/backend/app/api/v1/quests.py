@@ -32,7 +32,7 @@ def _stable_quest_id(scenario_id: str, persona_id: str) -> str:
     return f"qst_{h}"
 
 
-def _build_quest(state: dict[str, Any], livemode: bool = True) -> dict[str, Any] | None:
+def build_quest(state: dict[str, Any], livemode: bool = True) -> dict[str, Any] | None:
     """Build a quest resource from current runtime state."""
     sc = state.get("active_scenario")
     if not sc:
@@ -100,11 +100,11 @@ async def create_quest(
             )
             _ = generate_demo_actions(chosen.get("id", scenario_id), body.persona_id)
         else:
-            from pipeline.extractor import extract_persona_data
+            from pipeline.extractor import aextract_persona_data
             from pipeline.scenario_gen import generate_scenarios as generate_scenarios_llm
             from pipeline.action_planner import generate_actions
 
-            extracted = extract_persona_data(body.persona_id)
+            extracted = await aextract_persona_data(body.persona_id)
             scenarios = await asyncio.wait_for(
                 generate_scenarios_llm(extracted), timeout=30.0
             )
@@ -127,7 +127,7 @@ async def create_quest(
         raise ApiException(status_code=500, code="internal_error", message=str(e))
 
     state = await master.get_state()
-    quest = _build_quest(state, livemode)
+    quest = build_quest(state, livemode)
     if quest:
         quest["cycle"] = result.get("cycle")
         quest["activation_duration_ms"] = int((time.perf_counter() - started) * 1000)
@@ -147,7 +147,7 @@ async def list_quests(
     livemode = get_livemode(request.headers.get("Authorization"))
 
     quests = []
-    quest = _build_quest(state, livemode)
+    quest = build_quest(state, livemode)
     if quest:
         quests.append(quest)
 
@@ -164,7 +164,7 @@ async def get_quest(
     master: AlwaysOnMaster = Depends(get_master),
 ):
     state = await master.get_state()
-    quest = _build_quest(state)
+    quest = build_quest(state)
     if quest and quest["id"] == quest_id:
         return quest
     raise ApiException(
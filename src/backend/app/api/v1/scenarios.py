@@ -72,7 +72,7 @@ async def _generate_scenarios(
     # --- AnalysisCache path (incremental, skips LLM when inputs unchanged) ---
     try:
         from daemon.analysis_cache import get_analysis_cache
-        analysis_cache = get_analysis_cache()
+        analysis_cache = get_analysis_cache(persona_id)
         if analysis_cache is not None:
             has_llm = bool(
                 os.environ.get("ANTHROPIC_API_KEY")
@@ -104,12 +104,12 @@ async def _generate_scenarios(
         _cached_scenarios[cache_key] = (time.monotonic(), scenarios)
         return scenarios
 
-    from pipeline.extractor import extract_persona_data
+    from pipeline.extractor import aextract_persona_data
     from pipeline.scenario_gen import generate_scenarios as generate_scenarios_llm
     from simulation.scenarios import generate_scenarios as generate_scenarios_fallback
 
     try:
-        extracted = extract_persona_data(persona_id)
+        extracted = await aextract_persona_data(persona_id)
         scenarios = await asyncio.wait_for(
             generate_scenarios_llm(extracted), timeout=30.0
         )
@@ -14,7 +14,7 @@ from deepagent.skills.registry import SKILL_REGISTRY
 router = APIRouter()
 
 
-def _worker_resource(w: dict, livemode: bool = True) -> dict:
+def _worker_resource(w: dict, livemode: bool = True, stats: dict | None = None) -> dict:
     wid = w.get("worker_id", "")
     if not wid.startswith("wrkr_"):
         wid = f"wrkr_{wid}"
@@ -28,6 +28,8 @@ def _worker_resource(w: dict, livemode: bool = True) -> dict:
         "status": w.get("status", "ready"),
         "queue_depth": w.get("queue_depth", 0),
         "last_error": w.get("last_error"),
+        "concurrency": (stats or {}).get("concurrency"),
+        "admission": (stats or {}).get("admission"),
     }
 
 
@@ -40,9 +42,13 @@ async def list_workers(
     master: AlwaysOnMaster = Depends(get_master),
 ):
     state = await master.get_state()
+    stats = await master.get_worker_stats()
     livemode = get_livemode(request.headers.get("Authorization"))
 
-    resources = [_worker_resource(w, livemode) for w in state.get("workers", [])]
+    resources = [
+        _worker_resource(w, livemode, stats.get(w.get("worker_id", "")))
+        for w in state.get("workers", [])
+    ]
 
     # Expand skills inline if requested
     expansions = set(expand) if expand else set()
@@ -94,7 +100,8 @@ async def get_worker(
             param="worker_id",
         )
 
-    resource = _worker_resource(w)
+    stats = await master.get_worker_stats()
+    resource = _worker_resource(w, stats=stats.get(raw_id))
     expansions = set(expand) if expand else set()
     if "skills" in expansions:
         resource["skills"] = [
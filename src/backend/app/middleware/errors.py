@@ -7,6 +7,8 @@ import logging
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
+from state.task_queue import QueueAdmissionError
+
 logger = logging.getLogger(__name__)
 
 
@@ -44,6 +46,19 @@ async def api_exception_handler(request: Request, exc: ApiException) -> JSONResp
     )
 
 
+async def queue_admission_exception_handler(request: Request, exc: QueueAdmissionError) -> JSONResponse:
+    return await api_exception_handler(
+        request,
+        ApiException(
+            status_code=429,
+            type="rate_limit_error",
+            code=exc.code,
+            message=str(exc),
+            param="worker_id",
+        ),
+    )
+
+
 async def generic_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     logger.exception("Unhandled exception")
     return JSONResponse(
@@ -12,6 +12,14 @@ Dependency graph:
       actions_node[id]    →  skip LLM if hash unchanged
 
 Every LLM call avoided saves ~$0.001–0.003 and 5–15 seconds.
+
+Hashes are Merkle-style: each domain's digests are computed once when it is
+re-extracted (the data_refs digest only over appended records), and the
+scenario/action hashes combine those, so a cache hit costs O(domains).
+
+With an :class:`~daemon.analysis_store.AnalysisNodeStore`, scenario and action
+nodes are also persisted by input hash and model, so a restart with unchanged
+inputs serves them without calling the LLM.
 """
 
 from __future__ import annotations
@@ -20,10 +28,16 @@ import asyncio
 import hashlib
 import json
 import logging
+import os
+import re
 import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from daemon.analysis_store import AnalysisNodeStore
+from pipeline.extractor import DOMAIN_AGGREGATES, IncrementalExtractor, get_extraction_pool
+
 logger = logging.getLogger(__name__)
 
 # Domains whose changes can affect the scenario generation prompt
@@ -31,6 +45,17 @@ _SCENARIO_DOMAINS: frozenset[str] = frozenset(
     {"finance", "calendar", "lifelog", "notion_leads", "time_commitments", "budget_commitments"}
 )
 
+# Order in which domains contribute to data_refs (later ids win)
+_DATA_REF_DOMAINS: tuple[str, ...] = (
+    "calendar",
+    "finance",
+    "lifelog",
+    "social",
+    "notion_leads",
+    "time_commitments",
+    "budget_commitments",
+)
+
 # Domain name → JSONL filename
 _DOMAIN_FILE: dict[str, str] = {
     "finance": "transactions.jsonl",
@@ -48,11 +73,32 @@ _DOMAIN_FILE: dict[str, str] = {
 # Internal data nodes
 # ---------------------------------------------------------------------------
 
+class _RefsDigest:
+    """Running sha256 over a domain's ``(id, text)`` refs, extended as records are appended."""
+
+    def __init__(self) -> None:
+        self._hash = hashlib.sha256()
+        self.count = 0
+
+    def extend(self, records: list) -> "_RefsDigest":
+        for r in records[self.count:]:
+            rid = r.get("id")
+            if rid:
+                self._hash.update(json.dumps([rid, r.get("text", "")], default=str).encode() + b"\n")
+        self.count = len(records)
+        return self
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
 @dataclass
 class _DomainSnapshot:
     summary: dict | list
     raw: list
     mtime: float
+    digest: str = ""                 # sha256 of summary
+    refs: _RefsDigest = field(default_factory=_RefsDigest)
 
 
 @dataclass
@@ -76,7 +122,7 @@ class AnalysisCache:
 
     Usage
     -----
-    cache = AnalysisCache(data_dir=..., persona_id="p05")
+    cache = get_analysis_cache("p05")   # per-persona instance from the registry
 
     # From DataWatcher (knows which domain changed):
     scenarios, regenerated = await cache.get_scenarios(changed_domains={"finance"})
@@ -88,16 +134,46 @@ class AnalysisCache:
     actions, regenerated = await cache.get_actions(scenario, changed_domains={"calendar"})
     """
 
-    def __init__(self, data_dir: Path, persona_id: str = "p05") -> None:
+    def __init__(self, data_dir: Path, persona_id: str = "p05", store: AnalysisNodeStore | None = None) -> None:
         self._data_dir = data_dir
         self._persona_id = persona_id
+        self._store = store
+        self._extractor = IncrementalExtractor(persona_id)
         self._profile: dict = {}
         self._profile_mtime: float = 0.0
+        self._profile_digest: str = _sha256({})
         self._domains: dict[str, _DomainSnapshot] = {}
         self._data_refs: dict[str, str] = {}
+        self._data_refs_digest: str = _sha256({})
         self._scenarios: _ScenariosNode | None = None
         self._actions: dict[str, _ActionsNode] = {}
+        # Per persona: one persona's LLM call never waits on another's.
         self._lock = asyncio.Lock()
+        self.metrics = {
+            "scenario_hits": 0,
+            "scenario_store_hits": 0,
+            "scenario_llm_calls": 0,
+            "action_hits": 0,
+            "action_store_hits": 0,
+            "action_llm_calls": 0,
+            "llm_seconds": 0.0,
+        }
+
+    @property
+    def persona_id(self) -> str:
+        return self._persona_id
+
+    @property
+    def busy(self) -> bool:
+        """True while a call holds this cache's lock (an extraction or LLM analysis is running)."""
+        return self._lock.locked()
+
+    def approx_bytes(self) -> int:
+        """Approximate memory held by this persona's extracted inputs."""
+        return self._extractor.bytes_loaded()
+
+    def stats(self) -> dict:
+        return {**self.metrics, "bytes": self.approx_bytes(), "extractor": dict(self._extractor.metrics)}
 
     # -----------------------------------------------------------------------
     # Public API
@@ -110,6 +186,9 @@ class AnalysisCache:
     ) -> tuple[list[dict], bool]:
         """Return (scenarios, was_regenerated).
 
+        ``was_regenerated`` is True whenever the cached node was replaced, by
+        the LLM or from the persistent store.
+
         Parameters
         ----------
         changed_domains:
@@ -119,21 +198,13 @@ class AnalysisCache:
             Whether LLM keys are available. Falls back to demo scenarios if False.
         """
         async with self._lock:
-            self._refresh_profile()
-
-            stale = (
-                changed_domains
-                if changed_domains is not None
-                else self._stale_domains()
-            )
-
-            for domain in stale:
-                self._extract_domain(domain)
-            if stale:
-                self._rebuild_data_refs()
+            # File parsing runs in a worker thread; the lock still serialises
+            # this persona, but the event loop keeps serving other requests.
+            stale = await asyncio.to_thread(self._refresh_inputs, changed_domains)
 
             # Fast path: no scenario-relevant domain changed and we have cached results
             if not (stale & _SCENARIO_DOMAINS) and self._scenarios is not None:
+                self.metrics["scenario_hits"] += 1
                 return self._scenarios.scenarios, False
 
             # Content-hash check: even if a domain was re-extracted, the prompt
@@ -141,13 +212,26 @@ class AnalysisCache:
             input_hash = self._hash_scenario_inputs()
             if self._scenarios is not None and self._scenarios.input_hash == input_hash:
                 logger.debug("AnalysisCache: scenario inputs unchanged, skipping LLM")
+                self.metrics["scenario_hits"] += 1
                 return self._scenarios.scenarios, False
 
+            model = _model_name(has_llm)
+            stored = self._store_get("scenarios", model, input_hash)
+            if stored is not None:
+                self._scenarios = _ScenariosNode(scenarios=stored, input_hash=input_hash)
+                logger.info("AnalysisCache: scenarios loaded from store for persona=%s", self._persona_id)
+                self.metrics["scenario_store_hits"] += 1
+                return stored, True
+
             # LLM call required — enrich with KG context first (non-blocking)
+            started = time.monotonic()
             extracted = self._assemble_extracted()
             kg_snippets = await self._fetch_kg_snippets(has_llm)
             scenarios = await _run_scenario_llm(extracted, self._persona_id, has_llm, kg_snippets)
+            self.metrics["scenario_llm_calls"] += 1
+            self.metrics["llm_seconds"] += time.monotonic() - started
             self._scenarios = _ScenariosNode(scenarios=scenarios, input_hash=input_hash)
+            self._store_put("scenarios", model, input_hash, scenarios)
             logger.info(
                 "AnalysisCache: scenarios regenerated (%d) for persona=%s",
                 len(scenarios),
@@ -163,31 +247,35 @@ class AnalysisCache:
     ) -> tuple[list[dict], bool]:
         """Return (actions, was_regenerated)."""
         async with self._lock:
-            self._refresh_profile()
-
-            stale = (
-                changed_domains
-                if changed_domains is not None
-                else self._stale_domains()
-            )
-
-            for domain in stale:
-                self._extract_domain(domain)
-            if stale:
-                self._rebuild_data_refs()
+            # File parsing runs in a worker thread; the lock still serialises
+            # this persona, but the event loop keeps serving other requests.
+            stale = await asyncio.to_thread(self._refresh_inputs, changed_domains)
 
             scenario_id = scenario.get("id", "")
             input_hash = self._hash_action_inputs(scenario)
             cached = self._actions.get(scenario_id)
             if cached is not None and cached.input_hash == input_hash:
                 logger.debug("AnalysisCache: action inputs unchanged for %s, skipping LLM", scenario_id)
+                self.metrics["action_hits"] += 1
                 return cached.actions, False
 
+            model = _model_name(has_llm)
+            stored = self._store_get("actions", model, input_hash)
+            if stored is not None:
+                self._actions[scenario_id] = _ActionsNode(actions=stored, input_hash=input_hash)
+                logger.info("AnalysisCache: actions loaded from store for scenario=%s", scenario_id)
+                self.metrics["action_store_hits"] += 1
+                return stored, True
+
+            started = time.monotonic()
             extracted = self._assemble_extracted()
             kg_snippets = await self._fetch_kg_snippets(has_llm)
-            result = await _run_actions_llm(scenario, extracted, has_llm, kg_snippets)
+            result = await _run_actions_llm(scenario, extracted, has_llm, kg_snippets, persona_id=self._persona_id)
+            self.metrics["action_llm_calls"] += 1
+            self.metrics["llm_seconds"] += time.monotonic() - started
             actions = result.get("actions", [])
             self._actions[scenario_id] = _ActionsNode(actions=actions, input_hash=input_hash)
+            self._store_put("actions", model, input_hash, actions)
             logger.info(
                 "AnalysisCache: actions regenerated (%d) for scenario=%s",
                 len(actions),
@@ -199,6 +287,17 @@ class AnalysisCache:
         """Force full regeneration on next call (external cache bust)."""
         self._scenarios = None
         self._actions.clear()
+        if self._store is not None:
+            self._store.clear(self._persona_id)
+
+    def _store_get(self, kind: str, model: str, input_hash: str):
+        if self._store is None:
+            return None
+        return self._store.get(kind, self._persona_id, model, input_hash)
+
+    def _store_put(self, kind: str, model: str, input_hash: str, value) -> None:
+        if self._store is not None:
+            self._store.put(kind, self._persona_id, model, input_hash, value)
 
     async def _fetch_kg_snippets(self, has_llm: bool) -> list[str]:
         """Retrieve cross-domain patterns from the KG. Fails silently."""
@@ -217,9 +316,26 @@ class AnalysisCache:
         return []
 
     # -----------------------------------------------------------------------
-    # Domain extraction (sync — called inside async lock)
+    # Domain extraction (sync — run in a worker thread inside the async lock)
     # -----------------------------------------------------------------------
 
+    def _refresh_inputs(self, changed_domains: set[str] | None) -> set[str]:
+        """Re-extract stale domains and return them.
+
+        Domains loaded for the first time are extracted in parallel on the
+        shared process pool; later changes are incremental and stay in-thread.
+        """
+        self._refresh_profile()
+        stale = changed_domains if changed_domains is not None else self._stale_domains()
+        untracked = self._extractor.untracked(stale)
+        if untracked:
+            self._extractor.prime(untracked, get_extraction_pool())
+        for domain in stale:
+            self._extract_domain(domain)
+        if stale:
+            self._rebuild_data_refs()
+        return stale
+
     def _stale_domains(self) -> set[str]:
         stale: set[str] = set()
         for domain, filename in _DOMAIN_FILE.items():
@@ -248,10 +364,11 @@ class AnalysisCache:
         from pipeline.extractor import extract_profile
         self._profile = extract_profile(self._persona_id)
         self._profile_mtime = mtime
+        self._profile_digest = _sha256(self._profile)
 
     def _extract_domain(self, domain: str) -> None:
         filename = _DOMAIN_FILE.get(domain)
-        if not filename:
+        if not filename or domain not in DOMAIN_AGGREGATES:
             return
         path = self._data_dir / filename
         if not path.exists():
@@ -261,50 +378,34 @@ class AnalysisCache:
         except OSError:
             return
 
-        if domain == "finance":
-            from pipeline.extractor import extract_transactions
-            summary, raw = extract_transactions(self._persona_id)
-        elif domain == "calendar":
-            from pipeline.extractor import extract_calendar_data
-            summary, raw = extract_calendar_data(self._persona_id)
-        elif domain == "lifelog":
-            from pipeline.extractor import extract_lifelog
-            summary, raw = extract_lifelog(self._persona_id)
-        elif domain == "social":
-            from pipeline.extractor import extract_social
-            summary, raw = extract_social(self._persona_id)
-        elif domain == "notion_leads":
-            from pipeline.extractor import extract_notion_leads
-            summary, raw = extract_notion_leads(self._persona_id)
-        elif domain == "time_commitments":
-            from pipeline.extractor import extract_time_commitments
-            summary, raw = extract_time_commitments(self._persona_id)
-        elif domain == "budget_commitments":
-            from pipeline.extractor import extract_budget_commitments
-            summary, raw = extract_budget_commitments(self._persona_id)
-        else:
-            return
-
-        self._domains[domain] = _DomainSnapshot(summary=summary, raw=raw, mtime=mtime)
+        # Only lines appended since the last extraction are parsed.
+        summary, raw = self._extractor.extract(domain)
+
+        # The extractor appends to the same list until a full rebuild, so the
+        # refs digest only has to absorb the new records.
+        prev = self._domains.get(domain)
+        refs = prev.refs if prev is not None and prev.raw is raw and len(raw) >= prev.refs.count else _RefsDigest()
+        self._domains[domain] = _DomainSnapshot(
+            summary=summary,
+            raw=raw,
+            mtime=mtime,
+            digest=_sha256(summary),
+            refs=refs.extend(raw),
+        )
 
     def _rebuild_data_refs(self) -> None:
         refs: dict[str, str] = {}
-        for domain in (
-            "calendar",
-            "finance",
-            "lifelog",
-            "social",
-            "notion_leads",
-            "time_commitments",
-            "budget_commitments",
-        ):
+        digests: list[tuple[str, str]] = []
+        for domain in _DATA_REF_DOMAINS:
             snap = self._domains.get(domain)
             if snap:
                 for r in snap.raw:
                     rid = r.get("id")
                     if rid:
                         refs[rid] = r.get("text", "")
+                digests.append((domain, snap.refs.hexdigest()))
         self._data_refs = refs
+        self._data_refs_digest = _sha256(digests)
 
     def _assemble_extracted(self) -> dict:
         def _snap_summary(domain: str, default):
@@ -327,41 +428,35 @@ class AnalysisCache:
     # Hashing — must mirror exactly what scenario_gen and action_planner use
     # -----------------------------------------------------------------------
 
+    def _domain_digest(self, domain: str) -> str:
+        snap = self._domains.get(domain)
+        return snap.digest if snap else _sha256({})
+
     def _hash_scenario_inputs(self) -> str:
         """Hash the inputs consumed by scenario_gen._build_prompt."""
-        fin = self._domains.get("finance")
-        cal = self._domains.get("calendar")
-        ll = self._domains.get("lifelog")
-        nl = self._domains.get("notion_leads")
-        tc = self._domains.get("time_commitments")
-        bc = self._domains.get("budget_commitments")
-        payload = {
-            "profile": self._profile,
-            "transactions": fin.summary if fin else {},
-            "calendar": cal.summary if cal else {},
-            "lifelog": ll.summary if ll else {},
-            "notion_leads": nl.summary if nl else {},
-            "time_commitments": tc.summary if tc else {},
-            "budget_commitments": bc.summary if bc else {},
-        }
-        return _sha256(payload)
+        return _sha256({
+            "profile": self._profile_digest,
+            "transactions": self._domain_digest("finance"),
+            "calendar": self._domain_digest("calendar"),
+            "lifelog": self._domain_digest("lifelog"),
+            "notion_leads": self._domain_digest("notion_leads"),
+            "time_commitments": self._domain_digest("time_commitments"),
+            "budget_commitments": self._domain_digest("budget_commitments"),
+        })
 
     def _hash_action_inputs(self, scenario: dict) -> str:
         """Hash the inputs consumed by action_planner._build_prompt."""
         ll = self._domains.get("lifelog")
-        nl = self._domains.get("notion_leads")
-        tc = self._domains.get("time_commitments")
-        bc = self._domains.get("budget_commitments")
-        payload = {
-            "scenario": scenario,
-            "profile": self._profile,
-            "data_refs": self._data_refs,
-            "lifelog_recent": (ll.summary or {}).get("recent", []) if ll else [],
-            "notion_leads": nl.summary if nl else {},
-            "time_commitments": tc.summary if tc else {},
-            "budget_commitments": bc.summary if bc else {},
-        }
-        return _sha256(payload)
+        return _sha256({
+            "scenario": _sha256(scenario),
+            "profile": self._profile_digest,
+            "data_refs": self._data_refs_digest,
+            # Bounded to the handful of most recent entries.
+            "lifelog_recent": _sha256((ll.summary or {}).get("recent", []) if ll else []),
+            "notion_leads": self._domain_digest("notion_leads"),
+            "time_commitments": self._domain_digest("time_commitments"),
+            "budget_commitments": self._domain_digest("budget_commitments"),
+        })
 
 
 # ---------------------------------------------------------------------------
@@ -379,11 +474,11 @@ async def _run_scenario_llm(
 
 
 async def _run_actions_llm(
-    scenario: dict, extracted: dict, has_llm: bool, kg_snippets: list | None = None
+    scenario: dict, extracted: dict, has_llm: bool, kg_snippets: list | None = None, persona_id: str = "p05"
 ) -> dict:
     if not has_llm:
         from pipeline.demo_theo import generate_demo_actions
-        return generate_demo_actions(scenario.get("id", ""), "p05")
+        return generate_demo_actions(scenario.get("id", ""), persona_id)
     from pipeline.action_planner import generate_actions
     return await generate_actions(scenario, extracted, kg_snippets=kg_snippets)
 
@@ -392,6 +487,11 @@ async def _run_actions_llm(
 # Helpers
 # ---------------------------------------------------------------------------
 
+def _model_name(has_llm: bool) -> str:
+    """Model the LLM helpers would use; demo output is stored separately."""
+    return os.environ.get("LLM_MODEL", "gpt-4o-mini") if has_llm else "demo"
+
+
 def _sha256(obj) -> str:
     return hashlib.sha256(
         json.dumps(obj, sort_keys=True, default=str).encode()
@@ -399,17 +499,100 @@ def _sha256(obj) -> str:
 
 
 # ---------------------------------------------------------------------------
-# Module-level singleton — shared between DataWatcher and HTTP routes
+# Per-persona registry — shared between DataWatcher and HTTP routes
 # ---------------------------------------------------------------------------
 
-_cache: AnalysisCache | None = None
+_PERSONA_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class AnalysisCacheRegistry:
+    """Builds one :class:`AnalysisCache` per persona on first use.
+
+    Personas are those with a ``persona_<id>`` directory under ``data_root``.
+    Caches are kept within ``max_bytes`` of extracted input
+    (``AGENT_ANALYSIS_CACHE_MEMORY_MB``, default 256), measured as the JSONL
+    bytes each has read, and at most ``max_personas`` of them
+    (``AGENT_ANALYSIS_CACHE_PERSONAS``, default 8); the least recently used is
+    dropped first, but never the one being returned nor one that is busy,
+    since rebuilding it would run a second analysis of that persona
+    concurrently with the first. Sizes grow as caches
+    extract, so the budget is enforced on the next :meth:`get`. A dropped
+    persona rebuilds from the persistent store, if there is one, without the LLM.
+    """
+
+    def __init__(
+        self,
+        data_root: Path,
+        store: AnalysisNodeStore | None = None,
+        max_personas: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        self._data_root = data_root
+        self._store = store
+        self.max_personas = (
+            max_personas
+            if max_personas is not None
+            else int(os.environ.get("AGENT_ANALYSIS_CACHE_PERSONAS", "8"))
+        )
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(float(os.environ.get("AGENT_ANALYSIS_CACHE_MEMORY_MB", "256")) * 1024 * 1024)
+        )
+        self._caches: OrderedDict[str, AnalysisCache] = OrderedDict()
+        self._evicted = 0
+
+    def get(self, persona_id: str) -> AnalysisCache | None:
+        """The persona's cache, or ``None`` if the persona has no data directory."""
+        cache = self._caches.get(persona_id)
+        if cache is not None:
+            self._caches.move_to_end(persona_id)
+        else:
+            if not _PERSONA_ID.match(persona_id):
+                return None
+            data_dir = self._data_root / f"persona_{persona_id}"
+            if not data_dir.is_dir():
+                return None
+            cache = AnalysisCache(data_dir=data_dir, persona_id=persona_id, store=self._store)
+            self._caches[persona_id] = cache
+        self._evict(keep=persona_id)
+        return cache
+
+    def _evict(self, keep: str) -> None:
+        total = sum(cache.approx_bytes() for cache in self._caches.values())
+        for persona_id, cache in list(self._caches.items()):
+            if len(self._caches) <= self.max_personas and total <= self.max_bytes:
+                break
+            if persona_id == keep or cache.busy:
+                continue
+            del self._caches[persona_id]
+            total -= cache.approx_bytes()
+            self._evicted += 1
+            logger.info("AnalysisCache: evicted persona=%s from registry", persona_id)
+
+    def stats(self) -> dict:
+        return {
+            "personas": {pid: cache.stats() for pid, cache in self._caches.items()},
+            "max_personas": self.max_personas,
+            "bytes": sum(cache.approx_bytes() for cache in self._caches.values()),
+            "max_bytes": self.max_bytes,
+            "evicted": self._evicted,
+            "store": self._store.stats() if self._store is not None else None,
+        }
+
+
+_registry: AnalysisCacheRegistry | None = None
+
+
+def init_analysis_cache(data_root: Path, store: AnalysisNodeStore | None = None) -> AnalysisCacheRegistry:
+    global _registry
+    _registry = AnalysisCacheRegistry(data_root=data_root, store=store)
+    return _registry
 
 
-def init_analysis_cache(data_dir: Path, persona_id: str = "p05") -> AnalysisCache:
-    global _cache
-    _cache = AnalysisCache(data_dir=data_dir, persona_id=persona_id)
-    return _cache
+def get_analysis_registry() -> AnalysisCacheRegistry | None:
+    return _registry
 
 
-def get_analysis_cache() -> AnalysisCache | None:
-    return _cache
+def get_analysis_cache(persona_id: str = "p05") -> AnalysisCache | None:
+    return _registry.get(persona_id) if _registry is not None else None
@@ -0,0 +1,136 @@
+"""Persistent content-addressed store for AnalysisCache LLM results.
+
+Scenario and action nodes are written as one JSON file each, named by
+``sha256(kind, persona, model, input_hash)``, so a restart with unchanged
+inputs finds the previous LLM output instead of paying for it again. Files are
+written atomically; several processes may share the directory.
+
+The directory is bounded by ``AGENT_ANALYSIS_CACHE_MAX_MB`` (default 64).
+Reads refresh a file's mtime and the least recently used files are evicted
+first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisNodeStore:
+    def __init__(self, root: Path, max_bytes: int | None = None) -> None:
+        self.root = root
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(float(os.environ.get("AGENT_ANALYSIS_CACHE_MAX_MB", "64")) * 1024 * 1024)
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._metrics = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0}
+
+    @staticmethod
+    def key(kind: str, persona_id: str, model: str, input_hash: str) -> str:
+        return hashlib.sha256(f"{kind}\0{persona_id}\0{model}\0{input_hash}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, kind: str, persona_id: str, model: str, input_hash: str) -> Any | None:
+        path = self._path(self.key(kind, persona_id, model, input_hash))
+        try:
+            record = json.loads(path.read_text())
+            os.utime(path)
+        except FileNotFoundError:
+            self._metrics["misses"] += 1
+            return None
+        except (OSError, ValueError) as exc:
+            logger.warning("AnalysisNodeStore: unreadable %s (%s); ignoring", path.name, exc)
+            self._metrics["misses"] += 1
+            return None
+        if record.get("input_hash") != input_hash or record.get("model") != model:
+            self._metrics["misses"] += 1
+            return None
+        self._metrics["hits"] += 1
+        return record["value"]
+
+    def put(self, kind: str, persona_id: str, model: str, input_hash: str, value: Any) -> None:
+        path = self._path(self.key(kind, persona_id, model, input_hash))
+        record = {
+            "kind": kind,
+            "persona_id": persona_id,
+            "model": model,
+            "input_hash": input_hash,
+            "created_at": time.time(),
+            "value": value,
+        }
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp.write_text(json.dumps(record, default=str))
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("AnalysisNodeStore: could not write %s: %s", path.name, exc)
+            tmp.unlink(missing_ok=True)
+            return
+        self._metrics["writes"] += 1
+        self._evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob("*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self._metrics["evicted"] += 1
+
+    def clear(self, persona_id: str | None = None) -> None:
+        """Delete every stored node, or only ``persona_id``'s when given."""
+        for _, _, path in self._entries():
+            if persona_id is not None:
+                try:
+                    owner = json.loads(path.read_text()).get("persona_id")
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError):
+                    owner = None  # unreadable: leave it for eviction
+                if owner != persona_id:
+                    continue
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict[str, Any]:
+        entries = self._entries()
+        return {
+            **self._metrics,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+def create_analysis_store(state_dir: Path) -> AnalysisNodeStore | None:
+    """Store under ``state_dir/analysis_cache`` (or ``AGENT_ANALYSIS_CACHE_DIR``).
+
+    Returns ``None`` when ``AGENT_ANALYSIS_CACHE_PERSIST`` is ``0``/``false``;
+    the cache is then memory-only as before.
+    """
+    if os.environ.get("AGENT_ANALYSIS_CACHE_PERSIST", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    root = os.environ.get("AGENT_ANALYSIS_CACHE_DIR", "").strip()
+    return AnalysisNodeStore(Path(root) if root else state_dir / "analysis_cache")
@@ -275,7 +275,7 @@ class DataWatcher:
             import os
             if not os.environ.get("NEO4J_URI"):
                 return  # LightRAG not configured — skip silently
-            from deepagent.workers.kg_worker import _create_rag_instance
+            from deepagent.workers.kg_worker import _create_rag_instance, kg_insert
             rag = _create_rag_instance()
             if rag is None:
                 return
@@ -293,7 +293,7 @@ class DataWatcher:
                     last_line = ch.decode("utf-8", errors="ignore") + last_line
             record = _json.loads(last_line.strip())
             text = record.get("text") or _json.dumps(record)
-            await asyncio.wait_for(rag.ainsert(text), timeout=20.0)
+            await asyncio.wait_for(kg_insert(rag, text), timeout=20.0)
             logger.info("DataWatcher: ingested new %s record into LightRAG", domain)
         except Exception as exc:
             logger.debug("DataWatcher: LightRAG ingest skipped for %s: %s", domain, exc)
@@ -365,7 +365,7 @@ class DataWatcher:
         if not domains:
             return
 
-        cache = get_analysis_cache()
+        cache = get_analysis_cache(self._persona_id)
         if cache is None:
             logger.warning("DataWatcher: AnalysisCache not initialized, skipping re-analysis")
             return
@@ -1,24 +1,130 @@
-"""Concurrent task dispatch for always-on master-worker runtime."""
+"""Concurrent task dispatch for always-on master-worker runtime.
+
+A dispatch cycle runs in three phases so the master lock is only held for
+bookkeeping, never across worker I/O:
+
+1. ``claim``   (under the lock) picks pending tasks, marks them RUNNING and
+   gives each a lease owned by the cycle.
+2. ``execute`` (no lock) runs the claimed worker actions concurrently.
+3. ``commit``  (under the lock) applies results to whatever the runtime state
+   looks like by then, skipping tasks whose lease was lost in the meantime.
+
+Tasks whose lease expires (the process died mid-cycle, or a cycle never
+committed) are returned to PENDING by the next ``claim``.
+
+Failed tasks are retried after an exponential backoff (``not_before``). After
+``CIRCUIT_FAILURE_THRESHOLD`` consecutive failures a worker's circuit opens for
+``CIRCUIT_OPEN_SECONDS``; once that passes it is half-open and lets exactly one
+probe task through, which either closes the circuit or re-opens it.
+"""
 
 from __future__ import annotations
 
 import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
 from typing import Any
 from uuid import uuid4
 
 from deepagent.approval import requires_approval
 from deepagent.workers import build_workers
-from state.models import ApprovalRequest, AgentRuntimeState, CycleSnapshot, TaskStatus, WorkerStatus
+from deepagent.workers.base import WorkerExecution
+from state.event_log import EventLog, append_recent
+from state.models import (
+    ApprovalRequest,
+    AgentRuntimeState,
+    CycleSnapshot,
+    TaskStatus,
+    WorkerBudget,
+    WorkerCircuitState,
+    WorkerStatus,
+)
+from state.task_queue import TaskQueue
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_SECONDS = 300
 
 
 def _prefixed_id(prefix: str) -> str:
     return f"{prefix}{uuid4()}"
 
 
+def retry_delay_seconds(budget: WorkerBudget, retries: int) -> float:
+    """Backoff before retry number ``retries``: exponential from the base, capped, with +/- jitter."""
+    delay = min(budget.backoff_cap_seconds, budget.backoff_base_seconds * 2 ** max(retries - 1, 0))
+    if budget.backoff_jitter > 0:
+        delay *= 1 + budget.backoff_jitter * (2 * random.random() - 1)
+    return max(delay, 0.0)
+
+
+def circuit_is_open(circuit: WorkerCircuitState, now: datetime) -> bool:
+    """True while ``open_until`` is in the future (half-open once it has passed)."""
+    if not circuit.open_until:
+        return False
+    try:
+        return datetime.fromisoformat(circuit.open_until) > now
+    except ValueError:
+        return False
+
+
+@dataclass
+class ClaimedTask:
+    """Snapshot of a claimed task, carried from claim through execute to commit."""
+    task_id: str
+    worker_id: str
+    action: str
+    payload: dict[str, Any]
+    timeout: float
+    max_concurrency: int = 1
+    result: WorkerExecution | None = None
+    error: str | None = None
+    missing_worker: bool = False
+
+
+@dataclass
+class DispatchClaim:
+    """One dispatch cycle. ``tasks`` holds the current wave; the outcome lists accumulate across waves."""
+    cycle_id: str
+    started_at: str
+    tasks: list[ClaimedTask] = field(default_factory=list)
+    approval_waiting: list[str] = field(default_factory=list)
+    executed: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    wave: int = 1
+    # Dependents released by the last commit; another wave can pick them up.
+    unblocked: list[str] = field(default_factory=list)
+    # Runnable tasks left queued this wave because their worker's bulkhead was full.
+    held: list[str] = field(default_factory=list)
+    # The wave took ``max_tasks`` tasks; more due work may be queued behind the cap.
+    capped: bool = False
+
+
 class Dispatcher:
-    def __init__(self) -> None:
+    def __init__(self, event_log: EventLog | None = None, lease_grace_seconds: float | None = None) -> None:
         self.workers = build_workers()
+        self.event_log = event_log
+        self.lease_grace_seconds = (
+            lease_grace_seconds
+            if lease_grace_seconds is not None
+            else float(os.environ.get("AGENT_TASK_LEASE_GRACE_SECONDS", "30"))
+        )
+        # Dependency waves run back to back within one cycle, up to this many.
+        self.max_waves = int(os.environ.get("AGENT_DISPATCH_MAX_WAVES", "4"))
+        # worker_id -> (limit, semaphore); rebuilt when a budget's max_concurrency changes.
+        self._semaphores: dict[str, tuple[int, asyncio.Semaphore]] = {}
+
+    def _semaphore(self, worker_id: str, limit: int) -> asyncio.Semaphore:
+        limit = max(1, limit)
+        current = self._semaphores.get(worker_id)
+        if current is None or current[0] != limit:
+            current = (limit, asyncio.Semaphore(limit))
+            self._semaphores[worker_id] = current
+        return current[1]
 
     def _now(self) -> datetime:
         return datetime.now(UTC)
@@ -33,81 +139,280 @@ class Dispatcher:
             "payload": payload,
             "created_at": self._now_iso(),
         }
-        state.event_history = (state.event_history + [event])[-100:]
+        if self.event_log is not None:
+            self.event_log.append(event)
+        append_recent(state.event_history, event)
+
+    def _request_approval(
+        self,
+        state: AgentRuntimeState,
+        task_id: str,
+        worker_id: str,
+        action: str,
+        payload: dict[str, Any],
+        reason: str,
+    ) -> None:
+        approval = ApprovalRequest(
+            approval_id=_prefixed_id("apprv_"),
+            task_id=task_id,
+            worker_id=worker_id,
+            reason=reason,
+            requested_at=self._now_iso(),
+            payload=payload,
+        )
+        state.approvals.append(approval)
+        self._append_runtime_event(
+            state,
+            event_type="policy_blocked_action",
+            payload={
+                "task_id": task_id,
+                "worker_id": worker_id,
+                "action": action,
+                "reason": approval.reason,
+            },
+        )
 
     async def dispatch_cycle(self, state: AgentRuntimeState, max_tasks: int = 12) -> dict[str, Any]:
-        started_at = self._now_iso()
-        cycle_id = _prefixed_id("cycle_")
+        """Claim, execute and commit in one go (for callers that own ``state`` throughout)."""
+        claim = self.claim(state, max_tasks=max_tasks)
+        while True:
+            await self.execute(claim)
+            result = self.commit(state, claim)
+            if not self.wants_next_wave(claim):
+                return result
+            self.claim(state, max_tasks=max_tasks, claim=claim)
+
+    def wants_next_wave(self, claim: DispatchClaim) -> bool:
+        """True when another pass in this cycle can run more work and the wave budget allows it.
+
+        That is when the last commit released dependents, when the wave hit
+        ``max_tasks``, or when tasks were held by a full bulkhead and this
+        wave's tasks have since freed slots.
+        """
+        return self.has_backlog(claim) and claim.wave < self.max_waves
+
+    @staticmethod
+    def has_backlog(claim: DispatchClaim) -> bool:
+        return bool(claim.unblocked) or claim.capped or bool(claim.held and claim.tasks)
+
+    # ------------------------------------------------------------------
+    # Phase 1: claim (under the master lock)
+    # ------------------------------------------------------------------
+
+    def reclaim_expired(self, state: AgentRuntimeState) -> list[str]:
+        """Return RUNNING tasks whose lease has expired to PENDING."""
+        queue = TaskQueue.of(state)
+        circuit_by_worker = {c.worker_id: c for c in state.circuits}
+        now = self._now()
+        reclaimed: list[str] = []
+        for task in queue.with_status(TaskStatus.RUNNING):
+            if task.lease_expires_at:
+                try:
+                    if datetime.fromisoformat(task.lease_expires_at) > now:
+                        continue
+                except ValueError:
+                    pass
+            queue.set_status(task, TaskStatus.PENDING)
+            task.lease_owner = None
+            task.lease_expires_at = None
+            task.updated_at = self._now_iso()
+            task.result_summary = "Lease expired before the result was committed; re-queued"
+            task.error_code = "lease_expired"
+            circuit = circuit_by_worker.get(task.worker_id)
+            if circuit is not None and circuit.probe_task_id == task.task_id:
+                circuit.probe_task_id = None
+            reclaimed.append(task.task_id)
+            self._append_runtime_event(
+                state,
+                event_type="task_lease_expired",
+                payload={"task_id": task.task_id, "worker_id": task.worker_id, "action": task.action},
+            )
+        if reclaimed:
+            logger.warning("Dispatcher: re-queued %d task(s) with expired leases", len(reclaimed))
+        return reclaimed
+
+    def claim(
+        self,
+        state: AgentRuntimeState,
+        max_tasks: int = 12,
+        claim: DispatchClaim | None = None,
+    ) -> DispatchClaim:
+        """Claim runnable tasks; pass the previous ``claim`` to start its next wave."""
+        if claim is None:
+            claim = DispatchClaim(cycle_id=_prefixed_id("cycle_"), started_at=self._now_iso())
+        else:
+            claim.tasks = []
+            claim.unblocked = []
+            claim.held = []
+            claim.wave += 1
+        self.reclaim_expired(state)
 
         budget_by_worker = {b.worker_id: b for b in state.budgets}
         worker_by_id = {w.worker_id: w for w in state.workers}
         circuit_by_worker = {c.worker_id: c for c in state.circuits}
 
-        pending = [t for t in state.queue if t.status == TaskStatus.PENDING]
-        pending.sort(key=lambda t: (t.priority, t.created_at))
-        scheduled = pending[:max_tasks]
+        queue = TaskQueue.of(state)
+        now = self._now()
+        free_slots: dict[str, int] = {}
+        probes: dict[str, str] = {}
+
+        def _hold(task) -> bool:
+            """True to leave ``task`` queued this cycle (open circuit or saturated worker)."""
+            circuit = circuit_by_worker.get(task.worker_id)
+            if circuit is not None and circuit.open_until:
+                if circuit_is_open(circuit, now):
+                    worker = worker_by_id.get(task.worker_id)
+                    if worker is not None:
+                        worker.status = WorkerStatus.OPEN_CIRCUIT
+                    return True
+                # Half-open: a single probe at a time.
+                if circuit.probe_task_id is not None:
+                    probe = queue.get(circuit.probe_task_id)
+                    if probe is not None and probe.status == TaskStatus.RUNNING:
+                        return True
+                    circuit.probe_task_id = None
+                if task.worker_id in probes:
+                    return True
+                if not requires_approval(task.worker_id, task.action):
+                    probes[task.worker_id] = task.task_id
 
-        scheduled_for_exec = []
-        approval_waiting: list[str] = []
-        executed: list[str] = []
-        failed: list[str] = []
+            # Bulkhead: leave a worker's tasks queued once it has max_concurrency running,
+            # so one busy integration cannot take every slot of the cycle.
+            budget = budget_by_worker.get(task.worker_id)
+            if budget is None or requires_approval(task.worker_id, task.action):
+                return False
+            free = free_slots.get(task.worker_id)
+            if free is None:
+                free = budget.max_concurrency - queue.depth(task.worker_id, statuses=(TaskStatus.RUNNING,))
+            if free <= 0:
+                probes.pop(task.worker_id, None)
+                claim.held.append(task.task_id)
+                return True
+            free_slots[task.worker_id] = free - 1
+            return False
 
-        now = self._now()
-        for task in scheduled:
+        taken = queue.take_pending(max_tasks, skip=_hold, now=now.timestamp())
+        claim.capped = len(taken) >= max_tasks
+        for task in taken:
             worker = worker_by_id.get(task.worker_id)
             circuit = circuit_by_worker.get(task.worker_id)
-            if worker is None or circuit is None:
+            budget = budget_by_worker.get(task.worker_id)
+            if worker is None or circuit is None or budget is None:
+                queue.requeue(task)
                 continue
 
-            if circuit.open_until:
-                try:
-                    open_until = datetime.fromisoformat(circuit.open_until)
-                    if open_until > now:
-                        worker.status = WorkerStatus.OPEN_CIRCUIT
-                        continue
-                except ValueError:
-                    pass
-
             if requires_approval(task.worker_id, task.action):
-                task.status = TaskStatus.WAITING_APPROVAL
+                queue.set_status(task, TaskStatus.WAITING_APPROVAL)
                 task.updated_at = self._now_iso()
                 task.result_summary = "Blocked pending explicit approval (irreversible action)"
                 task.error_code = "requires_approval"
-                approval = ApprovalRequest(
-                    approval_id=_prefixed_id("apprv_"),
+                self._request_approval(
+                    state,
                     task_id=task.task_id,
                     worker_id=task.worker_id,
-                    reason=f"Action '{task.action}' requires approval",
-                    requested_at=self._now_iso(),
+                    action=task.action,
                     payload=task.payload,
+                    reason=f"Action '{task.action}' requires approval",
                 )
-                state.approvals.append(approval)
-                approval_waiting.append(task.task_id)
-                self._append_runtime_event(
-                    state,
-                    event_type="policy_blocked_action",
-                    payload={
-                        "task_id": task.task_id,
-                        "worker_id": task.worker_id,
-                        "action": task.action,
-                        "reason": approval.reason,
-                    },
-                )
+                claim.approval_waiting.append(task.task_id)
                 continue
 
-            task.status = TaskStatus.RUNNING
+            queue.set_status(task, TaskStatus.RUNNING)
+            if probes.get(task.worker_id) == task.task_id:
+                circuit.probe_task_id = task.task_id
             task.updated_at = self._now_iso()
+            task.lease_owner = claim.cycle_id
+            task.lease_expires_at = (
+                now + timedelta(seconds=budget.max_runtime_seconds + self.lease_grace_seconds)
+            ).isoformat()
             worker.status = WorkerStatus.RUNNING
-            scheduled_for_exec.append(task)
+            claim.tasks.append(
+                ClaimedTask(
+                    task_id=task.task_id,
+                    worker_id=task.worker_id,
+                    action=task.action,
+                    payload=self._with_upstream_context(queue, task),
+                    timeout=budget.max_runtime_seconds,
+                    max_concurrency=budget.max_concurrency,
+                )
+            )
+        return claim
+
+    def _with_upstream_context(self, queue: TaskQueue, task) -> dict[str, Any]:
+        """Copy of the task payload with each completed upstream's result as ``<worker>_context``.
+
+        A kg_worker upstream therefore lands in ``payload["kg_context"]``, which
+        the downstream workers already read.
+        """
+        payload = dict(task.payload)
+        for upstream in queue.upstream(task):
+            if upstream.status != TaskStatus.COMPLETED or not upstream.result_data:
+                continue
+            key = f"{upstream.worker_id.removesuffix('_worker')}_context"
+            if not payload.get(key):
+                payload[key] = upstream.result_data
+        return payload
 
-        async def _run_task(task):
-            worker_impl = self.workers.get(task.worker_id)
-            worker = worker_by_id[task.worker_id]
-            circuit = circuit_by_worker[task.worker_id]
-            budget = budget_by_worker[task.worker_id]
+    # ------------------------------------------------------------------
+    # Phase 2: execute (no lock held)
+    # ------------------------------------------------------------------
 
+    async def execute(self, claim: DispatchClaim) -> DispatchClaim:
+        async def _run(claimed: ClaimedTask) -> None:
+            worker_impl = self.workers.get(claimed.worker_id)
             if worker_impl is None:
-                task.status = TaskStatus.FAILED
+                claimed.missing_worker = True
+                return
+            async with self._semaphore(claimed.worker_id, claimed.max_concurrency):
+                try:
+                    claimed.result = await asyncio.wait_for(
+                        worker_impl.execute(claimed.action, claimed.payload),
+                        timeout=claimed.timeout,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    claimed.error = str(exc)
+
+        if claim.tasks:
+            await asyncio.gather(*[_run(claimed) for claimed in claim.tasks])
+        return claim
+
+    # ------------------------------------------------------------------
+    # Phase 3: commit (under the master lock)
+    # ------------------------------------------------------------------
+
+    def commit(self, state: AgentRuntimeState, claim: DispatchClaim) -> dict[str, Any]:
+        budget_by_worker = {b.worker_id: b for b in state.budgets}
+        worker_by_id = {w.worker_id: w for w in state.workers}
+        circuit_by_worker = {c.worker_id: c for c in state.circuits}
+        queue = TaskQueue.of(state)
+
+        approval_waiting = claim.approval_waiting
+        executed = claim.executed
+        failed = claim.failed
+        queue.pop_unblocked()
+
+        for claimed in claim.tasks:
+            task = queue.get(claimed.task_id)
+            worker = worker_by_id.get(claimed.worker_id)
+            circuit = circuit_by_worker.get(claimed.worker_id)
+            budget = budget_by_worker.get(claimed.worker_id)
+            if (
+                task is None
+                or task.status != TaskStatus.RUNNING
+                or task.lease_owner != claim.cycle_id
+                or worker is None
+                or circuit is None
+                or budget is None
+            ):
+                # Re-seeded, reclaimed or otherwise changed while we were executing.
+                logger.info("Dispatcher: dropping result for %s (lease lost)", claimed.task_id)
+                continue
+
+            task.lease_owner = None
+            task.lease_expires_at = None
+
+            if claimed.missing_worker:
+                queue.set_status(task, TaskStatus.FAILED)
                 task.updated_at = self._now_iso()
                 task.finished_at = self._now_iso()
                 worker.status = WorkerStatus.DEGRADED
@@ -115,42 +420,31 @@ class Dispatcher:
                 task.result_summary = "Worker implementation missing"
                 task.error_code = "worker_missing"
                 failed.append(task.task_id)
-                return
+                continue
 
-            try:
-                result = await asyncio.wait_for(
-                    worker_impl.execute(task.action, task.payload),
-                    timeout=budget.max_runtime_seconds,
-                )
+            result = claimed.result
+            error = claimed.error
+            if error is None and result is not None:
                 if result.approval_required:
-                    task.status = TaskStatus.WAITING_APPROVAL
+                    queue.set_status(task, TaskStatus.WAITING_APPROVAL)
                     task.result_summary = "Worker requested approval"
                     task.error_code = "requires_approval"
-                    approval = ApprovalRequest(
-                        approval_id=_prefixed_id("apprv_"),
+                    self._request_approval(
+                        state,
                         task_id=task.task_id,
                         worker_id=task.worker_id,
-                        reason=result.approval_reason or f"Action '{task.action}' requires approval",
-                        requested_at=self._now_iso(),
+                        action=task.action,
                         payload=task.payload,
+                        reason=result.approval_reason or f"Action '{task.action}' requires approval",
                     )
-                    state.approvals.append(approval)
                     approval_waiting.append(task.task_id)
                     worker.status = WorkerStatus.READY
-                    self._append_runtime_event(
-                        state,
-                        event_type="policy_blocked_action",
-                        payload={
-                            "task_id": task.task_id,
-                            "worker_id": task.worker_id,
-                            "action": task.action,
-                            "reason": approval.reason,
-                        },
-                    )
-                    return
+                    continue
 
                 if result.ok:
-                    task.status = TaskStatus.COMPLETED
+                    if queue.has_dependents(task.task_id) and isinstance(result.data, dict):
+                        task.result_data = result.data
+                    queue.set_status(task, TaskStatus.COMPLETED)
                     task.updated_at = self._now_iso()
                     task.finished_at = self._now_iso()
                     worker.status = WorkerStatus.READY
@@ -158,63 +452,67 @@ class Dispatcher:
                     circuit.failure_streak = 0
                     circuit.open_until = None
                     circuit.last_error = None
+                    circuit.probe_task_id = None
                     task.result_summary = result.message
                     links = result.data.get("external_links", {}) if isinstance(result.data, dict) else {}
                     task.external_links = links if isinstance(links, dict) else {}
                     task.error_code = None
                     executed.append(task.task_id)
-                    return
+                    continue
 
-                raise RuntimeError(result.message or "worker returned failure")
-            except Exception as exc:  # noqa: BLE001
-                task.retries += 1
-                task.updated_at = self._now_iso()
-                task.finished_at = self._now_iso()
-                circuit.failure_streak += 1
-                circuit.last_error = str(exc)
-                worker.last_error = str(exc)
-                task.result_summary = str(exc)
-                task.error_code = "execution_error"
-
-                if task.retries <= budget.max_retries:
-                    task.status = TaskStatus.PENDING
-                    worker.status = WorkerStatus.DEGRADED
-                else:
-                    task.status = TaskStatus.FAILED
-                    failed.append(task.task_id)
-                    worker.status = WorkerStatus.DEGRADED
-
-                if circuit.failure_streak >= 3:
-                    circuit.open_until = (self._now() + timedelta(minutes=5)).isoformat()
-                    worker.status = WorkerStatus.OPEN_CIRCUIT
-
-        if scheduled_for_exec:
-            await asyncio.gather(*[_run_task(task) for task in scheduled_for_exec])
+                error = result.message or "worker returned failure"
+
+            task.retries += 1
+            task.updated_at = self._now_iso()
+            task.finished_at = self._now_iso()
+            circuit.failure_streak += 1
+            circuit.last_error = error
+            worker.last_error = error
+            task.result_summary = error
+            task.error_code = "execution_error"
+
+            if task.retries <= budget.max_retries:
+                task.not_before = (
+                    self._now() + timedelta(seconds=retry_delay_seconds(budget, task.retries))
+                ).isoformat()
+                queue.set_status(task, TaskStatus.PENDING)
+                worker.status = WorkerStatus.DEGRADED
+            else:
+                queue.set_status(task, TaskStatus.FAILED)
+                failed.append(task.task_id)
+                worker.status = WorkerStatus.DEGRADED
+
+            probe_failed = circuit.probe_task_id == task.task_id
+            if probe_failed or circuit.failure_streak >= CIRCUIT_FAILURE_THRESHOLD:
+                circuit.open_until = (self._now() + timedelta(seconds=CIRCUIT_OPEN_SECONDS)).isoformat()
+                circuit.probe_task_id = None
+                worker.status = WorkerStatus.OPEN_CIRCUIT
 
         for worker in state.workers:
-            worker.queue_depth = len(
-                [t for t in state.queue if t.worker_id == worker.worker_id and t.status in {TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.WAITING_APPROVAL}]
-            )
+            worker.queue_depth = queue.depth(worker.worker_id)
 
-        state.cycle_history = (
-            state.cycle_history
-            + [
-                CycleSnapshot(
-                    cycle_id=cycle_id,
-                    trigger="dispatch",
-                    started_at=started_at,
-                    finished_at=self._now_iso(),
-                    executed_tasks=executed,
-                    failed_tasks=failed,
-                )
-            ]
-        )[-50:]
+        claim.unblocked = queue.pop_unblocked()
+
+        snapshot = CycleSnapshot(
+            cycle_id=claim.cycle_id,
+            trigger="dispatch",
+            started_at=claim.started_at,
+            finished_at=self._now_iso(),
+            executed_tasks=list(executed),
+            failed_tasks=list(failed),
+        )
+        if state.cycle_history and state.cycle_history[-1].cycle_id == claim.cycle_id:
+            # Later wave of the same cycle: update its snapshot in place.
+            state.cycle_history[-1] = snapshot
+        else:
+            state.cycle_history = (state.cycle_history + [snapshot])[-50:]
 
         return {
-            "cycle_id": cycle_id,
-            "executed_tasks": executed,
-            "failed_tasks": failed,
-            "approval_waiting": approval_waiting,
-            "started_at": started_at,
+            "cycle_id": claim.cycle_id,
+            "executed_tasks": list(executed),
+            "failed_tasks": list(failed),
+            "approval_waiting": list(approval_waiting),
+            "started_at": claim.started_at,
             "finished_at": self._now_iso(),
+            "waves": claim.wave,
         }
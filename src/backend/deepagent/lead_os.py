@@ -403,6 +403,7 @@ def build_pod_snapshot(
     cfg: dict[str, Any],
     recommendations: list[dict[str, Any]],
     runtime_queue: list[dict[str, Any]] | None = None,
+    worker_queue_depth: int | None = None,
 ) -> dict[str, Any]:
     pods = cfg.get("pods", {})
     if not isinstance(pods, dict):
@@ -419,8 +420,8 @@ def build_pod_snapshot(
         if owner in rec_counts:
             rec_counts[owner] += 1
 
-    queued_notion = 0
-    if isinstance(runtime_queue, list):
+    queued_notion = worker_queue_depth or 0
+    if worker_queue_depth is None and isinstance(runtime_queue, list):
         queued_notion = len(
             [
                 task
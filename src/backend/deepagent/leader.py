@@ -0,0 +1,242 @@
+"""Lease-based leader election among processes on one host.
+
+Every uvicorn worker builds an :class:`LeaderElection` on the same SQLite file.
+The process holding the unexpired lease is the leader: it runs the master's
+scheduler, the DataWatcher and background re-analysis. The others are
+followers that serve reads and write through the shared state store. Followers
+forward cycle requests to the leader through a ``wakeups`` table instead of
+dispatching themselves.
+
+The leader renews the lease every ``ttl / 3`` seconds and releases it on
+shutdown. If it dies, a follower takes over once the lease lapses
+(``AGENT_LEADER_TTL_SECONDS``, default 15), or right away when the holder was
+a process on this host that no longer exists.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "always_on_master"
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        path: Path,
+        holder_id: str | None = None,
+        ttl_seconds: float | None = None,
+        poll_seconds: float | None = None,
+    ) -> None:
+        self.path = path
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None else float(os.environ.get("AGENT_LEADER_TTL_SECONDS", "15"))
+        )
+        # How often forwarded wakeups are drained; the lease is renewed every ttl / 3.
+        self.poll_seconds = (
+            poll_seconds if poll_seconds is not None else int(os.environ.get("AGENT_LEADER_POLL_MS", "200")) / 1000
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lease ("
+            "name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL, term INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS wakeups ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, trigger TEXT NOT NULL, origin TEXT NOT NULL, requested_at REAL NOT NULL)"
+        )
+        self.is_leader = False
+        self.leader_id: str | None = None
+        self.term = 0
+        self.lease_expires_at = 0.0
+        self.transitions = 0
+        self.changed_at: str | None = None
+        self._last_renew = 0.0
+        self._on_change: list[Callable[[bool], Awaitable[None]]] = []
+        self._on_wakeup: Callable[[list[str]], Awaitable[None]] | None = None
+        self._task: asyncio.Task | None = None
+
+    def on_change(self, callback: Callable[[bool], Awaitable[None]]) -> None:
+        """Register ``callback(is_leader)``, awaited whenever this process gains or loses leadership."""
+        self._on_change.append(callback)
+
+    def on_wakeup(self, callback: Callable[[list[str]], Awaitable[None]]) -> None:
+        """Register the leader's handler for cycle triggers forwarded by followers."""
+        self._on_wakeup = callback
+
+    # ------------------------------------------------------------------
+    # Lease
+    # ------------------------------------------------------------------
+
+    def try_acquire(self, now: float | None = None) -> bool:
+        """Take the lease if it is free or expired, renew it if we hold it; returns leadership."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT holder, expires_at, term FROM lease WHERE name = ?", (LEASE_NAME,)
+                ).fetchone()
+                if row is None or row[0] == self.holder_id or row[1] <= now or not _holder_alive(row[0]):
+                    term = 1 if row is None else row[2] + (row[0] != self.holder_id)
+                    self._conn.execute(
+                        "INSERT INTO lease (name, holder, expires_at, term) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, "
+                        "expires_at = excluded.expires_at, term = excluded.term",
+                        (LEASE_NAME, self.holder_id, now + self.ttl_seconds, term),
+                    )
+                    self.leader_id, self.term, self.lease_expires_at = self.holder_id, term, now + self.ttl_seconds
+                else:
+                    self.leader_id, self.term, self.lease_expires_at = row[0], row[2], row[1]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._last_renew = now
+        return self.leader_id == self.holder_id
+
+    def release(self) -> None:
+        """Give up the lease so a follower can take over without waiting for it to expire."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE lease SET expires_at = 0 WHERE name = ? AND holder = ?", (LEASE_NAME, self.holder_id)
+            )
+
+    async def check(self, now: float | None = None) -> bool:
+        """Acquire or renew the lease and fire :meth:`on_change` callbacks on a transition."""
+        try:
+            # busy_timeout can block for seconds while another process holds the database.
+            leader = await asyncio.to_thread(self.try_acquire, now)
+        except sqlite3.Error:
+            logger.exception("LeaderElection: lease check failed; stepping down")
+            leader = False
+        if leader != self.is_leader:
+            self.is_leader = leader
+            self.transitions += 1
+            self.changed_at = datetime.now(UTC).isoformat()
+            logger.info("LeaderElection: %s is now %s (term %s)", self.holder_id, self.role, self.term)
+            for callback in self._on_change:
+                await callback(leader)
+        return leader
+
+    @property
+    def role(self) -> str:
+        return "leader" if self.is_leader else "follower"
+
+    # ------------------------------------------------------------------
+    # Forwarded wakeups
+    # ------------------------------------------------------------------
+
+    def forward(self, trigger: str) -> None:
+        """Ask the leader to run a cycle for ``trigger`` (follower side)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO wakeups (trigger, origin, requested_at) VALUES (?, ?, ?)",
+                (trigger, self.holder_id, time.time()),
+            )
+
+    def drain_wakeups(self) -> list[str]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT id, trigger FROM wakeups ORDER BY id").fetchall()
+                if rows:
+                    self._conn.execute("DELETE FROM wakeups WHERE id <= ?", (rows[-1][0],))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [trigger for _, trigger in rows]
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        await self.check()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="leader-election")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            if time.time() - self._last_renew >= self.ttl_seconds / 3:
+                await self.check()
+            if self.is_leader and self._on_wakeup is not None:
+                try:
+                    triggers = await asyncio.to_thread(self.drain_wakeups)
+                    if triggers:
+                        await self._on_wakeup(triggers)
+                except Exception:  # noqa: BLE001
+                    logger.exception("LeaderElection: wakeup handling failed")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self.is_leader:
+            await asyncio.to_thread(self.release)
+            self.is_leader = False
+        with self._lock:
+            self._conn.close()
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "role": self.role,
+            "holder_id": self.holder_id,
+            "leader_id": self.leader_id,
+            "term": self.term,
+            "lease_expires_at": datetime.fromtimestamp(self.lease_expires_at, UTC).isoformat()
+            if self.lease_expires_at
+            else None,
+            "transitions": self.transitions,
+            "changed_at": self.changed_at,
+        }
+
+
+def _holder_alive(holder_id: str) -> bool:
+    """False only when ``holder_id`` names a process on this host that no longer exists."""
+    host, _, rest = holder_id.partition(":")
+    pid_text = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid_text.isdigit():
+        return True
+    try:
+        os.kill(int(pid_text), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def create_leader_election(state_path: Path) -> LeaderElection | None:
+    """Election on ``runtime_leader.db`` next to the state file (or ``AGENT_LEADER_DB_PATH``).
+
+    Returns ``None`` when ``AGENT_LEADER_ELECTION`` is ``0``/``false``; the
+    process then always leads, as in a single-worker deployment.
+    """
+    if os.environ.get("AGENT_LEADER_ELECTION", "1").strip().lower() in {"0", "false", "no", "off"}:
+        return None
+    db_path = os.environ.get("AGENT_LEADER_DB_PATH", "").strip()
+    return LeaderElection(Path(db_path) if db_path else state_path.parent / "runtime_leader.db")
@@ -8,6 +8,7 @@ import logging
 import os
 import re
 import time
+from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
@@ -28,11 +29,14 @@ from deepagent.demo_artifacts import (
     make_draft_reply,
 )
 from deepagent.dispatcher import Dispatcher
-from deepagent.stream import StreamBroker
+from deepagent.stream import create_stream_broker
 from integrations.notion_leads_service import get_notion_leads_service, normalize_lead_payload
 from integrations.notion_mirror import write_notion_mirror_snapshots
+from state.event_log import EventLog, append_recent, event_log_dir
 from state.models import ActiveScenarioState, AgentRuntimeState, ArchivedScenarioState, TaskStatus, WorkerTask
-from state.store import JsonStateStore
+from state.store import StateStore, create_state_store
+from state.task_queue import QueueAdmissionError, TaskQueue, task_dedupe_key
+from state.write_behind import WriteBehindStateStore
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +45,12 @@ def _prefixed_id(prefix: str) -> str:
     return f"{prefix}{uuid4()}"
 
 
+# AgentRuntimeState sections a dispatch cycle can modify.
+_CYCLE_SECTIONS = frozenset(
+    {"queue", "approvals", "workers", "circuits", "cycle_history", "event_history"}
+)
+
+
 _UUID_RE = re.compile(
     r"^[0-9a-fA-F]{32}$|^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
 )
@@ -51,15 +61,37 @@ def _looks_like_uuid(value: str | None) -> bool:
 
 
 class AlwaysOnMaster:
-    def __init__(self, state_path: Path, tick_seconds: int = 900) -> None:
-        self.store = JsonStateStore(state_path)
-        self.dispatcher = Dispatcher()
-        self.stream = StreamBroker()
+    def __init__(
+        self,
+        state_path: Path,
+        tick_seconds: int = 900,
+        store: StateStore | None = None,
+        coalesce_seconds: float | None = None,
+    ) -> None:
+        self.store = store or WriteBehindStateStore(create_state_store(state_path))
+        self.events = EventLog(event_log_dir(state_path))
+        self.dispatcher = Dispatcher(event_log=self.events)
+        self.stream = create_stream_broker(state_path)
         self.tick_seconds = tick_seconds
+        # Cycle requests arriving within this window share one dispatch cycle.
+        self.coalesce_seconds = (
+            coalesce_seconds
+            if coalesce_seconds is not None
+            else int(os.environ.get("AGENT_CYCLE_COALESCE_MS", "50")) / 1000
+        )
         self._lock = asyncio.Lock()
+        # One dispatch cycle at a time, however it was requested.
+        self._cycle_lock = asyncio.Lock()
         self._tick_task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._pending_triggers: list[str] = []
+        # (future, task_id): with a task id the future waits until that task has run.
+        self._cycle_waiters: list[tuple[asyncio.Future, str | None]] = []
         self._running = False
         self._data_watcher: Any | None = None
+        # False in a follower process: no scheduler, cycle requests go to the leader.
+        self.is_leader = True
+        self._forward_cycle: Callable[[str], None] | None = None
 
     def _now(self) -> datetime:
         return datetime.now(UTC)
@@ -70,23 +102,170 @@ class AlwaysOnMaster:
     def set_data_watcher(self, watcher: Any | None) -> None:
         self._data_watcher = watcher
 
-    async def start(self) -> None:
+    def set_cycle_forwarder(self, forward: Callable[[str], None] | None) -> None:
+        """How a follower hands cycle triggers to the leader (see :mod:`deepagent.leader`)."""
+        self._forward_cycle = forward
+
+    async def start(self, lead: bool = True) -> None:
         if self._running:
             return
         self._running = True
-        self._tick_task = asyncio.create_task(self._tick_loop(), name="always-on-master-tick")
-
-    async def stop(self) -> None:
-        self._running = False
+        if self.events.last_seq == 0:
+            # First run with an event log: carry over the inline history from runtime state.
+            self.events.extend(self.store.load().event_history)
+        await self.stream.start()
+        self.is_leader = lead
+        if lead:
+            self._start_scheduler()
+
+    async def set_leader(self, leader: bool) -> None:
+        """Start the scheduler on promotion; stop it on demotion, forwarding queued triggers."""
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        if not self._running:
+            return
+        if leader:
+            self._start_scheduler()
+            return
+        await self._stop_scheduler()
+        triggers, self._pending_triggers = self._pending_triggers, []
+        waiters, self._cycle_waiters = self._cycle_waiters, []
+        for trigger in triggers:
+            self._forward(trigger)
+        for waiter, _ in waiters:
+            if not waiter.done():
+                waiter.set_result(self._forwarded(triggers[0] if triggers else "event"))
+
+    def _start_scheduler(self) -> None:
+        if self._tick_task is None or self._tick_task.done():
+            self._tick_task = asyncio.create_task(self._scheduler_loop(), name="always-on-master-scheduler")
+
+    async def _stop_scheduler(self) -> None:
         if self._tick_task and not self._tick_task.done():
             self._tick_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self._tick_task
+        self._tick_task = None
+
+    async def stop(self) -> None:
+        self._running = False
+        await self._stop_scheduler()
+        waiters, self._cycle_waiters = self._cycle_waiters, []
+        self._pending_triggers = []
+        for waiter, _ in waiters:
+            waiter.cancel()
+        self.store.close()
+        self.events.close()
+        await self.stream.close()
+
+    def request_cycle(self, trigger: str = "event", task_id: str | None = None) -> asyncio.Future:
+        """Ask for a dispatch cycle; resolves with the first cycle that starts after this call.
+
+        With ``task_id`` it resolves instead with the first cycle after which
+        that task has run (see :meth:`_task_settled`); a cycle that did not get
+        to it (``max_tasks`` cap, full bulkhead) leaves the caller waiting for
+        the next one.
+
+        While the scheduler is running, requests made within ``coalesce_seconds``
+        of each other share one cycle. Without it (master not started) cycles
+        run right away, one at a time. In a follower the trigger is forwarded to
+        the leader and the future resolves immediately with ``{"forwarded": True}``.
+        """
+        if not self.is_leader and self._forward_cycle is not None:
+            self._forward(trigger)
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(self._forwarded(trigger))
+            return future
+        if self._tick_task is None or self._tick_task.done():
+            return asyncio.ensure_future(self._run_cycles_inline(trigger, task_id))
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending_triggers.append(trigger)
+        self._cycle_waiters.append((waiter, task_id))
+        self._wake.set()
+        return waiter
+
+    async def _run_cycles_inline(self, trigger: str, task_id: str | None) -> dict[str, Any]:
+        """Without the scheduler: cycle until ``task_id`` has run or no runnable backlog is left."""
+        while True:
+            result = await self.run_cycle(trigger=trigger)
+            if task_id is None or not result["backlog"] or self._task_settled(task_id):
+                return result
+            trigger = "backlog"
+
+    def _task_settled(self, task_id: str) -> bool:
+        """True once ``task_id`` has run: finished, waiting for approval, backing off to a retry, or gone."""
+        task = TaskQueue.of(self.store.load()).get(task_id)
+        if task is None or task.status not in (TaskStatus.PENDING, TaskStatus.RUNNING):
+            return True
+        return task.status == TaskStatus.PENDING and task.retries > 0 and task.not_before is not None
 
-    async def _tick_loop(self) -> None:
+    def _forward(self, trigger: str) -> None:
+        if self._forward_cycle is None:
+            logger.warning("AlwaysOnMaster: dropping cycle trigger %s (follower without a forwarder)", trigger)
+            return
+        # The leader reads our writes from the backing store; get them there before it wakes.
+        try:
+            self.store.flush()
+        except Exception:  # noqa: BLE001
+            logger.exception("AlwaysOnMaster: could not flush state before forwarding %s", trigger)
+        try:
+            self._forward_cycle(trigger)
+        except Exception:  # noqa: BLE001
+            logger.exception("AlwaysOnMaster: could not forward cycle trigger %s to the leader", trigger)
+
+    @staticmethod
+    def _forwarded(trigger: str) -> dict[str, Any]:
+        return {"forwarded": True, "trigger": trigger}
+
+    def _seconds_until_due(self) -> float | None:
+        """Time until the next delayed retry or half-open circuit lets work through."""
+        state = self.store.load()
+        candidates: list[float] = []
+        due = TaskQueue.of(state).next_due()
+        if due is not None:
+            candidates.append(due)
+        for circuit in state.circuits:
+            if circuit.open_until:
+                with contextlib.suppress(ValueError):
+                    candidates.append(datetime.fromisoformat(circuit.open_until).timestamp())
+        now = time.time()
+        upcoming = [c - now for c in candidates if c > now]
+        return min(upcoming) if upcoming else None
+
+    async def _scheduler_loop(self) -> None:
         while self._running:
-            await asyncio.sleep(self.tick_seconds)
-            await self.run_cycle(trigger="tick")
+            until_due = self._seconds_until_due()
+            timeout = self.tick_seconds if until_due is None else min(self.tick_seconds, until_due)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except TimeoutError:
+                self._pending_triggers.append("tick" if timeout >= self.tick_seconds else "retry_due")
+            if self.coalesce_seconds > 0:
+                await asyncio.sleep(self.coalesce_seconds)
+
+            self._wake.clear()
+            triggers, self._pending_triggers = self._pending_triggers, []
+            waiters, self._cycle_waiters = self._cycle_waiters, []
+            if not triggers:
+                self._cycle_waiters[:0] = waiters
+                continue
+            try:
+                result = await self.run_cycle(trigger=triggers[0], coalesced=len(triggers))
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("AlwaysOnMaster: scheduled cycle failed (triggers=%s)", triggers)
+                for waiter, _ in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+                continue
+            for waiter, task_id in waiters:
+                if waiter.done():
+                    continue
+                if task_id is not None and not self._task_settled(task_id):
+                    # This cycle did not get to it; a later one (backlog, retry, tick) will.
+                    self._cycle_waiters.append((waiter, task_id))
+                else:
+                    waiter.set_result(result)
 
     async def _append_event(self, state: AgentRuntimeState, event_type: str, payload: dict[str, Any] | None = None) -> dict[str, Any]:
         payload = payload or {}
@@ -96,7 +275,8 @@ class AlwaysOnMaster:
             "payload": payload,
             "created_at": self._now_iso(),
         }
-        state.event_history = (state.event_history + [event])[-100:]
+        self.events.append(event)
+        append_recent(state.event_history, event)
         return event
 
     def _seed_scenario_tasks(
@@ -117,10 +297,11 @@ class AlwaysOnMaster:
         created = self._now_iso()
 
         # Keep waiting approval tasks from previous cycle but clear stale pending/running tasks.
-        state.queue = [
-            t for t in state.queue if t.status == TaskStatus.WAITING_APPROVAL
-        ]
+        queue = TaskQueue.of(state)
+        queue.retain(lambda t: t.status == TaskStatus.WAITING_APPROVAL)
 
+        # Downstream workers wait on the KG task and receive its result as kg_context.
+        kg_task_id: str | None = None
         for worker_id, action, priority in seeded:
             task_payload = {
                 "scenario_id": scenario.scenario_id,
@@ -147,10 +328,15 @@ class AlwaysOnMaster:
                 action=action,
                 priority=priority,
                 payload=task_payload,
+                depends_on=[kg_task_id] if kg_task_id else [],
+                dedupe_key=task_dedupe_key(worker_id, action, task_payload),
                 created_at=created,
                 updated_at=created,
             )
-            state.queue.append(task)
+            # A retained task awaiting approval may already cover this work.
+            task = queue.merge_duplicate(task) or queue.add(task)
+            if worker_id == "kg_worker":
+                kg_task_id = task.task_id
 
     async def activate_scenario(
         self,
@@ -195,27 +381,34 @@ class AlwaysOnMaster:
             self.store.save(state)
 
         await self.stream.publish(event)
-        cycle = await self.run_cycle(trigger="scenario_activated")
+        cycle = await self.request_cycle(trigger="scenario_activated")
         return {
             "ok": True,
             "active_scenario": active.model_dump(mode="json"),
-            "seeded_tasks": len([t for t in self.store.load().queue if t.status == TaskStatus.PENDING]),
+            "seeded_tasks": TaskQueue.of(self.store.load()).count(TaskStatus.PENDING),
             "cycle": cycle,
         }
 
-    async def run_cycle(self, trigger: str = "event") -> dict[str, Any]:
+    async def run_cycle(self, trigger: str = "event", coalesced: int = 1) -> dict[str, Any]:
+        # Cycles never overlap: a re-seed's queue.retain must not drop tasks another
+        # cycle has claimed but not yet committed.
+        async with self._cycle_lock:
+            return await self._run_cycle(trigger, coalesced)
+
+    async def _run_cycle(self, trigger: str, coalesced: int) -> dict[str, Any]:
         start = time.perf_counter()
         async with self._lock:
             state = self.store.load()
-            event = await self._append_event(state, event_type="cycle_start", payload={"trigger": trigger})
+            event = await self._append_event(
+                state,
+                event_type="cycle_start",
+                payload={"trigger": trigger, "coalesced_triggers": coalesced},
+            )
 
             # Re-seed tasks if active scenario exists but queue has no pending/running work.
             # This keeps the daemon alive across ticks without requiring manual re-activation.
             if state.active_scenario is not None:
-                busy = any(
-                    t.status in {TaskStatus.PENDING, TaskStatus.RUNNING}
-                    for t in state.queue
-                )
+                busy = TaskQueue.of(state).count(TaskStatus.PENDING, TaskStatus.RUNNING) > 0
                 if not busy:
                     has_llm = bool(
                         os.environ.get("OPENAI_API_KEY")
@@ -228,29 +421,67 @@ class AlwaysOnMaster:
                         state.active_scenario.title, trigger,
                     )
 
-            result = await self.dispatcher.dispatch_cycle(state)
-            cycle_duration_ms = int((time.perf_counter() - start) * 1000)
-            cycle_end = await self._append_event(
-                state,
-                event_type="cycle_end",
-                payload={
-                    "trigger": trigger,
-                    "cycle_id": result["cycle_id"],
-                    "executed": len(result["executed_tasks"]),
-                    "failed": len(result["failed_tasks"]),
-                    "approval_waiting": len(result["approval_waiting"]),
-                    "cycle_duration_ms": cycle_duration_ms,
-                },
-            )
-            self.store.save(state)
+            claim = self.dispatcher.claim(state)
+            self.store.save(state, sections=_CYCLE_SECTIONS)
 
         await self.stream.publish(event)
+
+        while True:
+            # Worker I/O runs without the master lock so webhooks, approvals and
+            # workflow updates are not queued behind slow integrations.
+            await self.dispatcher.execute(claim)
+
+            async with self._lock:
+                state = self.store.load()
+                result = self.dispatcher.commit(state, claim)
+                if self.dispatcher.wants_next_wave(claim):
+                    # Tasks unblocked by this wave (e.g. waiting on KG context) run in the same cycle.
+                    self.dispatcher.claim(state, claim=claim)
+                    self.store.save(state, sections=_CYCLE_SECTIONS)
+                    continue
+                cycle_duration_ms = int((time.perf_counter() - start) * 1000)
+                cycle_end = await self._append_event(
+                    state,
+                    event_type="cycle_end",
+                    payload={
+                        "trigger": trigger,
+                        "cycle_id": result["cycle_id"],
+                        "executed": len(result["executed_tasks"]),
+                        "failed": len(result["failed_tasks"]),
+                        "approval_waiting": len(result["approval_waiting"]),
+                        "waves": claim.wave,
+                        "cycle_duration_ms": cycle_duration_ms,
+                    },
+                )
+                self.store.save(state, sections=_CYCLE_SECTIONS)
+                break
+
         await self.stream.publish(cycle_end)
+        backlog = self.dispatcher.has_backlog(claim)
+        if backlog and self._tick_task is not None and not self._tick_task.done():
+            # Out of waves with work still runnable (e.g. bulkhead-held tasks): go again
+            # instead of leaving it until the next tick.
+            self._pending_triggers.append("backlog")
+            self._wake.set()
         result["cycle_duration_ms"] = cycle_duration_ms
+        result["coalesced_triggers"] = coalesced
+        result["backlog"] = backlog
         return result
 
-    async def ingest_event(self, event_type: str, payload: dict[str, Any] | None = None) -> dict[str, Any]:
+    async def ingest_event(
+        self,
+        event_type: str,
+        payload: dict[str, Any] | None = None,
+        dispatch: bool = True,
+    ) -> dict[str, Any]:
+        """Record an event (optionally enqueueing a task) and wait for the cycle that picks it up.
+
+        With ``dispatch=False`` no cycle is requested; batch callers ingest
+        everything first and then await a single ``request_cycle()``.
+        """
         payload = payload or {}
+        rejected: QueueAdmissionError | None = None
+        queued: WorkerTask | None = None
         async with self._lock:
             state = self.store.load()
             event = await self._append_event(state, event_type=event_type, payload=payload)
@@ -262,15 +493,73 @@ class AlwaysOnMaster:
                     action=payload.get("action", "search"),
                     priority=int(payload.get("priority", 50)),
                     payload=payload.get("task_payload", {}),
+                    dedupe_key=payload.get("dedupe_key"),
                     created_at=self._now_iso(),
                     updated_at=self._now_iso(),
                 )
-                state.queue.append(t)
+                try:
+                    queued = await self._admit(state, t)
+                except QueueAdmissionError as exc:
+                    rejected = exc
             self.store.save(state)
 
         await self.stream.publish(event)
-        result = await self.run_cycle(trigger=event_type)
-        return {"ok": True, "event": event, "cycle": result}
+        if rejected is not None:
+            raise rejected
+        task_id = queued.task_id if queued is not None else None
+        result = await self.request_cycle(trigger=event_type, task_id=task_id) if dispatch else None
+        response: dict[str, Any] = {"ok": True, "event": event, "cycle": result}
+        if queued is not None:
+            response["task_id"] = queued.task_id
+            response["deduplicated"] = queued is not t
+        return response
+
+    async def _admit(self, state: AgentRuntimeState, task: WorkerTask, strict: bool = True) -> WorkerTask | None:
+        """Enqueue ``task`` subject to dedupe and its worker's ``max_queue_items``.
+
+        A task without a ``dedupe_key`` gets one from its worker, action and
+        payload; if an active task already holds that key the new one merges
+        into it (``task_deduplicated`` event) and the existing task is returned.
+        Rejections and shed tasks are counted on the worker node and recorded as
+        events. ``strict`` re-raises :class:`QueueAdmissionError`; internal
+        enqueues pass ``strict=False`` and get ``None`` back.
+        """
+        queue = TaskQueue.of(state)
+        if task.dedupe_key is None:
+            task.dedupe_key = task_dedupe_key(task.worker_id, task.action, task.payload)
+        existing = queue.merge_duplicate(task)
+        if existing is not None:
+            await self._append_event(
+                state,
+                event_type="task_deduplicated",
+                payload={"worker_id": task.worker_id, "action": task.action, "task_id": existing.task_id},
+            )
+            return existing
+        budget = next((b for b in state.budgets if b.worker_id == task.worker_id), None)
+        worker = next((w for w in state.workers if w.worker_id == task.worker_id), None)
+        try:
+            shed = queue.admit(task, budget)
+        except QueueAdmissionError as exc:
+            if worker is not None:
+                worker.rejected_tasks += 1
+            await self._append_event(
+                state,
+                event_type="task_rejected",
+                payload={"worker_id": task.worker_id, "action": task.action, "code": exc.code, "limit": exc.limit},
+            )
+            if strict:
+                raise
+            logger.warning("AlwaysOnMaster: %s", exc)
+            return None
+        if shed is not None:
+            if worker is not None:
+                worker.shed_tasks += 1
+            await self._append_event(
+                state,
+                event_type="task_shed",
+                payload={"worker_id": shed.worker_id, "task_id": shed.task_id, "admitted_task_id": task.task_id},
+            )
+        return task
 
     async def _handle_demo_event(
         self,
@@ -358,7 +647,8 @@ class AlwaysOnMaster:
             duration = int(ev.get("duration_minutes", 60))
             end_dt = start_dt + timedelta(minutes=duration)
 
-            state.queue.append(
+            await self._admit(
+                state,
                 WorkerTask(
                     task_id=_prefixed_id("task_"),
                     worker_id="calendar_worker",
@@ -373,10 +663,12 @@ class AlwaysOnMaster:
                     },
                     created_at=created,
                     updated_at=created,
-                )
+                ),
+                strict=False,
             )
 
-        state.queue.append(
+        await self._admit(
+            state,
             WorkerTask(
                 task_id=_prefixed_id("task_"),
                 worker_id="notion_leads_worker",
@@ -389,9 +681,11 @@ class AlwaysOnMaster:
                 },
                 created_at=created,
                 updated_at=created,
-            )
+            ),
+            strict=False,
         )
-        state.queue.append(
+        await self._admit(
+            state,
             WorkerTask(
                 task_id=_prefixed_id("task_"),
                 worker_id="notion_opportunity_worker",
@@ -403,9 +697,11 @@ class AlwaysOnMaster:
                 },
                 created_at=created,
                 updated_at=created,
-            )
+            ),
+            strict=False,
         )
-        state.queue.append(
+        await self._admit(
+            state,
             WorkerTask(
                 task_id=_prefixed_id("task_"),
                 worker_id="notion_opportunity_worker",
@@ -423,12 +719,14 @@ class AlwaysOnMaster:
                 },
                 created_at=created,
                 updated_at=created,
-            )
+            ),
+            strict=False,
         )
 
         file_key = payload.get("figma_file_key", "")
         if file_key:
-            state.queue.append(
+            await self._admit(
+                state,
                 WorkerTask(
                     task_id=_prefixed_id("task_"),
                     worker_id="figma_worker",
@@ -441,7 +739,8 @@ class AlwaysOnMaster:
                     },
                     created_at=created,
                     updated_at=created,
-                )
+                ),
+                strict=False,
             )
 
     async def _handle_figma_webhook(
@@ -678,9 +977,12 @@ class AlwaysOnMaster:
             )
             lead_os_cfg = reconcile_leads(lead_os_cfg, leads, now_iso=now_iso)
             recommendations = build_recommendations(lead_os_cfg, top_n=12)
-            runtime_queue = [task.model_dump(mode="json") for task in state.queue]
             lead_os_cfg["recommended_actions"] = recommendations
-            lead_os_cfg["pods"] = build_pod_snapshot(lead_os_cfg, recommendations, runtime_queue)
+            lead_os_cfg["pods"] = build_pod_snapshot(
+                lead_os_cfg,
+                recommendations,
+                worker_queue_depth=TaskQueue.of(state).depth("notion_leads_worker"),
+            )
             lead_os_cfg["sustainability"] = sustainability_snapshot(lead_os_cfg)
             lead_os_cfg["last_tick_at"] = now_iso
             lead_os_cfg["last_notion_event_id"] = event_id
@@ -841,22 +1143,23 @@ class AlwaysOnMaster:
             approval.decision = decision
             approval.resolved_at = self._now_iso()
 
-            task = next((t for t in state.queue if t.task_id == approval.task_id), None)
+            queue = TaskQueue.of(state)
+            task = queue.get(approval.task_id)
             if task is not None:
                 task.updated_at = self._now_iso()
-                task.status = TaskStatus.PENDING if decision == "approved" else TaskStatus.FAILED
+                queue.set_status(task, TaskStatus.PENDING if decision == "approved" else TaskStatus.FAILED)
 
             event = await self._append_event(
                 state,
                 event_type="approval_resolved",
                 payload={"approval_id": approval_id, "decision": decision, "task_id": approval.task_id},
             )
-            self.store.save(state)
+            self.store.save(state, sections={"approvals", "queue", "event_history"})
 
         await self.stream.publish(event)
         cycle_result = None
         if decision == "approved":
-            cycle_result = await self.run_cycle(trigger="approval")
+            cycle_result = await self.request_cycle(trigger="approval", task_id=approval.task_id)
 
         return {"ok": True, "approval_id": approval_id, "decision": decision, "cycle": cycle_result}
 
@@ -866,8 +1169,7 @@ class AlwaysOnMaster:
 
     async def get_workflow_key(self, key: str) -> dict[str, Any]:
         async with self._lock:
-            state = self.store.load()
-            value = state.workflow_state.get(key, {})
+            value = self.store.get_workflow_key(key)
             return value if isinstance(value, dict) else {}
 
     async def update_workflow_key(
@@ -877,23 +1179,54 @@ class AlwaysOnMaster:
         merge: bool = True,
     ) -> dict[str, Any]:
         async with self._lock:
-            state = self.store.load()
-            current = state.workflow_state.get(key, {})
+            current = self.store.get_workflow_key(key) or {}
             if merge and isinstance(current, dict):
                 merged = dict(current)
                 merged.update(payload)
             else:
                 merged = dict(payload)
-            state.workflow_state[key] = merged
-            self.store.save(state)
+            self.store.put_workflow_key(key, merged)
             return merged
 
+    async def get_worker_stats(self) -> dict[str, dict[str, Any]]:
+        """Per-worker concurrency and admission counters (served on /v1/workers)."""
+        state = self.store.load()
+        queue = TaskQueue.of(state)
+        budgets = {b.worker_id: b for b in state.budgets}
+        circuits = {c.worker_id: c for c in state.circuits}
+        now_iso = self._now_iso()
+        stats: dict[str, dict[str, Any]] = {}
+        for worker in state.workers:
+            budget = budgets.get(worker.worker_id)
+            circuit = circuits.get(worker.worker_id)
+            limit = budget.max_concurrency if budget else 0
+            if circuit is None or not circuit.open_until:
+                circuit_state = "closed"
+            elif circuit.open_until > now_iso:
+                circuit_state = "open"
+            else:
+                circuit_state = "half_open"
+            effective = {"closed": limit, "open": 0, "half_open": min(limit, 1)}[circuit_state]
+            stats[worker.worker_id] = {
+                "concurrency": {
+                    "limit": limit,
+                    "effective": effective,
+                    "circuit": circuit_state,
+                    "in_flight": queue.depth(worker.worker_id, statuses=(TaskStatus.RUNNING,)),
+                },
+                "admission": {
+                    "max_queue_items": budget.max_queue_items if budget else None,
+                    "overflow_policy": budget.overflow_policy if budget else None,
+                    "pending": queue.depth(worker.worker_id, statuses=(TaskStatus.PENDING,)),
+                    "rejected": worker.rejected_tasks,
+                    "shed": worker.shed_tasks,
+                },
+            }
+        return stats
+
     async def get_map(self) -> dict[str, Any]:
         state = self.store.load()
-        worker_queue: dict[str, int] = {}
-        for task in state.queue:
-            if task.status in {TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.WAITING_APPROVAL}:
-                worker_queue[task.worker_id] = worker_queue.get(task.worker_id, 0) + 1
+        queue = TaskQueue.of(state)
 
         nodes = [
             {
@@ -901,7 +1234,7 @@ class AlwaysOnMaster:
                 "label": "AlwaysOnMaster",
                 "type": "master",
                 "status": "running" if self._running else "stopped",
-                "queue_depth": len([t for t in state.queue if t.status in {TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.WAITING_APPROVAL}]),
+                "queue_depth": queue.depth(),
             }
         ]
         for worker in state.workers:
@@ -911,7 +1244,7 @@ class AlwaysOnMaster:
                     "label": worker.label,
                     "type": "worker",
                     "status": worker.status,
-                    "queue_depth": worker_queue.get(worker.worker_id, 0),
+                    "queue_depth": queue.depth(worker.worker_id),
                     "last_error": worker.last_error,
                 }
             )
@@ -0,0 +1,191 @@
+"""Token-budgeted chat prompt assembly.
+
+Wraps :func:`build_system_prompt` so the system prompt plus the chat history
+fit a per-model token budget. When they do not, the packer gives up, in order:
+
+1. the oldest history turns, a user turn together with the replies that
+   follow it, so the kept history still opens on a user turn (the latest
+   turn is always kept),
+2. the lowest-ranked KG snippets (LightRAG returns them best first),
+3. action details (rationale / grounding), last action first.
+
+Each snippet and action's details are counted once up front and subtracted as
+they are dropped; the trimmed system prompt is rebuilt and recounted exactly
+once at the end (again only if that exact count is still over budget).
+
+Tokens are counted with tiktoken; encoders are cached per model. If an
+encoding cannot be loaded (unknown model, or offline before the BPE files are
+cached) the count falls back to ~4 characters per token.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from deepagent.persona.prompt_builder import build_system_prompt
+
+logger = logging.getLogger(__name__)
+
+# Prompt budgets (system + history), well under each context window to bound latency and cost.
+MODEL_PROMPT_BUDGETS: dict[str, int] = {
+    "gpt-4o": 12000,
+    "gpt-4o-mini": 12000,
+    "gpt-4.1-mini": 12000,
+    "qwen3:8b": 6000,
+}
+DEFAULT_PROMPT_BUDGET = 8000
+
+# Per-message framing overhead in the chat format, plus the reply primer.
+_TOKENS_PER_MESSAGE = 4
+_REPLY_PRIMER = 3
+
+
+@functools.lru_cache(maxsize=16)
+def get_encoder(model: str) -> Any | None:
+    """Cached tiktoken encoder for ``model``; ``None`` if none can be loaded."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Non-OpenAI models (e.g. Ollama): a modern BPE is a close enough estimate.
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:  # noqa: BLE001 - BPE download failures surface as assorted errors
+        logger.warning("Prompt packer: no tiktoken encoding for %s (%s); estimating tokens", model, e)
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    if not text:
+        return 0
+    encoder = get_encoder(model)
+    if encoder is None:
+        return math.ceil(len(text) / 4)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def prompt_budget(model: str) -> int:
+    """``AGENT_CHAT_PROMPT_TOKENS`` if set, else the model's entry in :data:`MODEL_PROMPT_BUDGETS`."""
+    override = os.environ.get("AGENT_CHAT_PROMPT_TOKENS", "").strip()
+    if override:
+        return int(override)
+    return MODEL_PROMPT_BUDGETS.get(model, DEFAULT_PROMPT_BUDGET)
+
+
+def _role(message: Any) -> str | None:
+    return message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
+
+
+@dataclass
+class ActionItem:
+    label: str
+    details: list[str] = field(default_factory=list)
+
+
+def format_actions(actions: list[ActionItem], detailed: int) -> str:
+    """Numbered action list; only the first ``detailed`` actions keep their detail lines."""
+    lines = []
+    for i, action in enumerate(actions, 1):
+        lines.append(f"{i:02d}. {action.label}")
+        if i <= detailed:
+            lines.extend(f"    {d}" for d in action.details)
+    return "\n".join(lines)
+
+
+@dataclass
+class PackedPrompt:
+    system_prompt: str
+    messages: list[Any]
+    usage: dict[str, Any]
+
+
+def pack_prompt(
+    model: str,
+    messages: list[Any],
+    text_of: Any,
+    context: str | None = None,
+    intent: str = "casual",
+    scenario: str | None = None,
+    actions: list[ActionItem] | None = None,
+    budget: int | None = None,
+) -> PackedPrompt:
+    """Fit the system prompt and ``messages`` into ``budget`` tokens.
+
+    ``text_of(message)`` returns a message's text. ``usage`` reports the token
+    counts sent and what was dropped.
+    """
+    budget = budget if budget is not None else prompt_budget(model)
+    actions = actions or []
+    snippets = [s.strip() for s in (context or "").split("\n\n") if s.strip()]
+    message_tokens = [count_tokens(text_of(m), model) + _TOKENS_PER_MESSAGE for m in messages]
+    # What each piece adds to the system prompt, joiners included.
+    snippet_tokens = [count_tokens("\n\n" + s, model) for s in snippets]
+    detail_tokens = [count_tokens("".join(f"\n    {d}" for d in a.details), model) for a in actions]
+    keep_snippets = len(snippets)
+    detailed = len(actions)
+    first_turn = 0
+    last_turn = len(messages) - 1
+
+    def system() -> str:
+        return build_system_prompt(
+            context="\n\n".join(snippets[:keep_snippets]) or None,
+            intent=intent,
+            scenario=scenario,
+            actions=format_actions(actions, detailed) or None,
+        )
+
+    system_prompt = system()
+    system_tokens = count_tokens(system_prompt, model) + _TOKENS_PER_MESSAGE
+    history_tokens = sum(message_tokens)
+    built = (keep_snippets, detailed)
+
+    while True:
+        while system_tokens + history_tokens + _REPLY_PRIMER > budget:
+            if first_turn < last_turn:
+                # Drop the oldest user turn with the replies to it.
+                history_tokens -= message_tokens[first_turn]
+                first_turn += 1
+                while first_turn < last_turn and _role(messages[first_turn]) != "user":
+                    history_tokens -= message_tokens[first_turn]
+                    first_turn += 1
+                continue
+            if keep_snippets > 0:
+                keep_snippets -= 1
+                system_tokens -= snippet_tokens[keep_snippets]
+            elif detailed > 0 and any(a.details for a in actions[:detailed]):
+                detailed -= 1
+                system_tokens -= detail_tokens[detailed]
+            else:
+                break
+        if (keep_snippets, detailed) == built:
+            break
+        # Per-piece counts can miss by a token at the joins; settle on the exact count.
+        system_prompt = system()
+        system_tokens = count_tokens(system_prompt, model) + _TOKENS_PER_MESSAGE
+        built = (keep_snippets, detailed)
+
+    total = system_tokens + history_tokens + _REPLY_PRIMER
+    return PackedPrompt(
+        system_prompt=system_prompt,
+        messages=messages[first_turn:],
+        usage={
+            "model": model,
+            "budget": budget,
+            "prompt_tokens": total,
+            "system_tokens": system_tokens,
+            "history_tokens": history_tokens,
+            "over_budget": total > budget,
+            "dropped_turns": first_turn,
+            "dropped_snippets": len(snippets) - keep_snippets,
+            "trimmed_action_details": len(actions) - detailed,
+            "estimated": get_encoder(model) is None,
+        },
+    )
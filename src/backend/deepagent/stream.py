@@ -1,32 +1,311 @@
-"""In-memory event stream broker for frontend realtime updates."""
+"""In-memory event stream broker for frontend realtime updates.
+
+Every published event gets a sequence number, is encoded to an SSE frame once,
+and is kept in a bounded ring buffer, so a reconnecting SSE client can resume
+from its ``Last-Event-ID``. If that id has already been evicted (or predates a
+restart) the replay starts with a ``stream_gap`` event telling the client to
+resync from ``/v1/runtime``.
+
+Subscribers may filter by event type and by quest; the broker keeps a
+type -> subscribers index so an event is only offered to interested queues.
+
+Each subscriber has a bounded queue and a slow-consumer policy for when it
+fills up (``AGENT_STREAM_SLOW_CONSUMER``, overridable per subscriber):
+
+* ``drop_oldest`` -- discard the oldest queued frame,
+* ``coalesce`` -- replace a queued frame of the same type for the types in
+  ``AGENT_STREAM_COALESCE_TYPES`` (only the latest ``analysis_running``
+  matters), falling back to dropping the oldest,
+* ``disconnect`` -- discard the backlog and end the stream with a
+  ``stream_closed`` event whose ``resume_from`` is the last delivered id.
+
+Drops, coalesces, disconnects and queue-depth high-water marks are counted for
+``/v1/health``.
+
+This broker only reaches subscribers in its own process; see
+:func:`create_stream_broker` for the SQLite backend shared across workers.
+"""
 
 from __future__ import annotations
 
 import asyncio
+import json
+import os
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
 from itertools import count
+from pathlib import Path
+from typing import Any, NamedTuple
+
+STREAM_BACKENDS = ("memory", "sqlite")
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+STREAM_CLOSED = "stream_closed"
+
+
+class StreamFrame(NamedTuple):
+    seq: int | None
+    event: dict
+    # Encoded ``id:``/``data:`` frame, shared by every subscriber; do not mutate ``event``.
+    data: bytes
+    type: str
+    quest: str | None
+
+
+class SubscriberQueue:
+    """Bounded frame queue for one subscriber that applies its slow-consumer policy on overflow."""
+
+    def __init__(self, maxsize: int, policy: str, coalesce_types: frozenset[str]) -> None:
+        self.maxsize = maxsize
+        self.policy = policy
+        self.coalesce_types = coalesce_types
+        self._items: deque[StreamFrame] = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.high_water = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.delivered_seq = 0
+
+    def offer(self, frame: StreamFrame) -> str:
+        """Queue ``frame``; returns ``"queued"``, ``"dropped"``, ``"coalesced"`` or ``"disconnect"``."""
+        if self.closed:
+            return "disconnect"
+        outcome = "queued"
+        if self.policy == "coalesce" and frame.type in self.coalesce_types and self._items:
+            stale = next((f for f in self._items if f.type == frame.type), None)
+            if stale is not None:
+                self._items.remove(stale)
+                self.coalesced += 1
+                outcome = "coalesced"
+        if len(self._items) >= self.maxsize:
+            if self.policy == "disconnect":
+                self._close()
+                return "disconnect"
+            self._items.popleft()
+            self.dropped += 1
+            outcome = "dropped"
+        self._items.append(frame)
+        self.high_water = max(self.high_water, len(self._items))
+        self._ready.set()
+        return outcome
+
+    def _close(self) -> None:
+        self._items.clear()
+        closed = {
+            "type": STREAM_CLOSED,
+            "payload": {"reason": "slow_consumer", "resume_from": self.delivered_seq},
+        }
+        # No id: line, so the client's Last-Event-ID stays at the last frame it actually got.
+        self._items.append(StreamFrame(None, closed, encode_frame(None, closed), STREAM_CLOSED, None))
+        self.closed = True
+        self._ready.set()
+
+    async def get(self) -> StreamFrame:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        frame = self._items.popleft()
+        if frame.seq is not None:
+            self.delivered_seq = frame.seq
+        return frame
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+
+@dataclass
+class _Subscriber:
+    queue: SubscriberQueue
+    types: frozenset[str] | None
+    quest: str | None
+
+    def wants(self, frame: StreamFrame) -> bool:
+        if self.types is not None and frame.type not in self.types:
+            return False
+        return self.quest is None or frame.quest == self.quest
+
+
+def event_quest(event: dict) -> str | None:
+    """Quest (or scenario) an event belongs to, if it says."""
+    payload = event.get("payload") if isinstance(event.get("payload"), dict) else {}
+    return event.get("quest_id") or payload.get("quest_id") or payload.get("scenario_id")
+
+
+def encode_frame(seq: int | None, event: dict) -> bytes:
+    eid = event.get("event_id")
+    if isinstance(eid, str) and not eid.startswith("evt_"):
+        event = {**event, "event_id": f"evt_{eid}"}
+    id_line = f"id: {seq}\n" if seq is not None else ""
+    return f"{id_line}data: {json.dumps(event, default=str)}\n\n".encode()
+
+
+def _env_policy() -> str:
+    policy = os.environ.get("AGENT_STREAM_SLOW_CONSUMER", "drop_oldest").strip().lower()
+    return policy if policy in SLOW_CONSUMER_POLICIES else "drop_oldest"
 
 
 class StreamBroker:
-    def __init__(self) -> None:
-        self._subscribers: dict[int, asyncio.Queue] = {}
+    def __init__(
+        self,
+        buffer_size: int | None = None,
+        queue_size: int | None = None,
+        policy: str | None = None,
+        coalesce_types: list[str] | None = None,
+    ) -> None:
+        self.queue_size = queue_size or int(os.environ.get("AGENT_STREAM_QUEUE_SIZE", "200"))
+        self.policy = policy or _env_policy()
+        if coalesce_types is None:
+            raw = os.environ.get("AGENT_STREAM_COALESCE_TYPES", "analysis_running")
+            coalesce_types = [t.strip() for t in raw.split(",") if t.strip()]
+        self.coalesce_types = frozenset(coalesce_types)
+        self._metrics = {"published": 0, "dropped": 0, "coalesced": 0, "disconnected": 0, "high_water": 0}
+        self._subscribers: dict[int, _Subscriber] = {}
+        # event type -> subscriber ids filtering on it; _any_type holds unfiltered ones.
+        self._by_type: dict[str, set[int]] = {}
+        self._any_type: set[int] = set()
         self._ids = count(1)
+        if buffer_size is None:
+            buffer_size = int(os.environ.get("AGENT_STREAM_BUFFER_SIZE", "1000"))
+        self._buffer: deque[StreamFrame] = deque(maxlen=max(1, buffer_size))
+        self._seq = 0
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    async def start(self) -> None:
+        """Begin receiving events from other processes (no-op for the in-process broker)."""
+
+    async def close(self) -> None:
+        pass
 
     async def publish(self, event: dict) -> None:
+        self._seq += 1
+        self._fan_out(self._seq, event)
+
+    def _fan_out(self, seq: int, event: dict) -> None:
+        """Buffer the event as ``seq`` and offer it to matching subscribers."""
+        self._seq = max(self._seq, seq)
+        event_type = str(event.get("type", ""))
+        frame = StreamFrame(seq, event, encode_frame(seq, event), event_type, event_quest(event))
+        self._buffer.append(frame)
+        self._metrics["published"] += 1
         stale: list[int] = []
-        for sid, queue in self._subscribers.items():
-            try:
-                queue.put_nowait(event)
-            except asyncio.QueueFull:
+        for sid in self._any_type | self._by_type.get(event_type, set()):
+            subscriber = self._subscribers[sid]
+            if not subscriber.wants(frame):
+                continue
+            queue = subscriber.queue
+            dropped, coalesced = queue.dropped, queue.coalesced
+            if queue.offer(frame) == "disconnect":
                 stale.append(sid)
+            self._metrics["dropped"] += queue.dropped - dropped
+            self._metrics["coalesced"] += queue.coalesced - coalesced
+            self._metrics["high_water"] = max(self._metrics["high_water"], queue.high_water)
 
         for sid in stale:
-            self._subscribers.pop(sid, None)
+            self._metrics["disconnected"] += 1
+            self.unsubscribe(sid)
 
-    def subscribe(self) -> tuple[int, asyncio.Queue]:
+    def subscribe(
+        self,
+        types: list[str] | None = None,
+        quest: str | None = None,
+        policy: str | None = None,
+    ) -> tuple[int, SubscriberQueue]:
+        """Register a subscriber; its queue yields :class:`StreamFrame` for matching events from now on."""
+        if policy is not None and policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
         sid = next(self._ids)
-        queue: asyncio.Queue = asyncio.Queue(maxsize=200)
-        self._subscribers[sid] = queue
+        queue = SubscriberQueue(self.queue_size, policy or self.policy, self.coalesce_types)
+        queue.delivered_seq = self._seq
+        wanted = frozenset(types) if types else None
+        self._subscribers[sid] = _Subscriber(queue=queue, types=wanted, quest=quest)
+        if wanted is None:
+            self._any_type.add(sid)
+        else:
+            for event_type in wanted:
+                self._by_type.setdefault(event_type, set()).add(sid)
         return sid, queue
 
     def unsubscribe(self, sid: int) -> None:
-        self._subscribers.pop(sid, None)
+        subscriber = self._subscribers.pop(sid, None)
+        if subscriber is None:
+            return
+        self._any_type.discard(sid)
+        for event_type in subscriber.types or ():
+            sids = self._by_type.get(event_type)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_type[event_type]
+
+    def stats(self) -> dict[str, Any]:
+        """Fan-out counters for the health endpoint."""
+        queues = [sub.queue for sub in self._subscribers.values()]
+        return {
+            **self._metrics,
+            "subscribers": len(queues),
+            "queue_size": self.queue_size,
+            "buffer_size": self._buffer.maxlen,
+            "buffered": len(self._buffer),
+            "policy": self.policy,
+            "max_queue_depth": max((q.qsize() for q in queues), default=0),
+            "backend": "memory",
+        }
+
+    def _oldest_seq(self) -> int:
+        return self._buffer[0].seq if self._buffer else self._seq + 1
+
+    def _frames_after(self, last_seq: int) -> Iterable[StreamFrame]:
+        return (frame for frame in self._buffer if frame.seq > last_seq)
+
+    def replay(self, last_seq: int, sid: int | None = None) -> list[StreamFrame]:
+        """Buffered frames after ``last_seq`` (matching ``sid``'s filters), led by a gap frame if some were lost.
+
+        Call right after :meth:`subscribe` (without awaiting in between) so the
+        replay and the live queue neither overlap nor leave a hole.
+        """
+        subscriber = self._subscribers.get(sid) if sid is not None else None
+        oldest = self._oldest_seq()
+        frames: list[StreamFrame] = []
+        if last_seq > self._seq or last_seq < oldest - 1:
+            # Evicted, or an id from before a restart (sequence numbers reset).
+            gap = {
+                "type": "stream_gap",
+                "payload": {
+                    "last_event_id": last_seq,
+                    "oldest_available": oldest,
+                    "reason": "reset" if last_seq > self._seq else "evicted",
+                },
+            }
+            frames.append(StreamFrame(oldest - 1, gap, encode_frame(oldest - 1, gap), "stream_gap", None))
+            last_seq = oldest - 1
+        frames.extend(
+            frame for frame in self._frames_after(last_seq)
+            if subscriber is None or subscriber.wants(frame)
+        )
+        return frames
+
+
+def create_stream_broker(state_path: Path, backend: str | None = None) -> StreamBroker:
+    """Build the configured broker.
+
+    ``memory`` (default) serves only this process. ``sqlite`` shares one
+    stream between all processes on the host through ``runtime_stream.db``
+    next to the state file (or ``AGENT_STREAM_DB_PATH``), so SSE clients see
+    the same events whichever uvicorn worker they hit.
+    """
+    backend = (backend or os.environ.get("AGENT_STREAM_BACKEND") or "memory").strip().lower()
+    if backend == "memory":
+        return StreamBroker()
+    if backend == "sqlite":
+        from deepagent.stream_sqlite import SqliteStreamBroker
+
+        db_path = os.environ.get("AGENT_STREAM_DB_PATH", "").strip()
+        return SqliteStreamBroker(Path(db_path) if db_path else state_path.parent / "runtime_stream.db")
+    raise ValueError(f"Unknown AGENT_STREAM_BACKEND '{backend}' (expected one of {', '.join(STREAM_BACKENDS)})")
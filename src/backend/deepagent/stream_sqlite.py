@@ -0,0 +1,120 @@
+"""SQLite-backed :class:`StreamBroker` shared by every process on one host.
+
+``publish`` appends the event to a WAL-mode table whose ``AUTOINCREMENT`` key
+is the stream sequence number, so ids are global across uvicorn workers. Each
+process pumps rows it has not seen yet into its local fan-out, right after its
+own publishes and on a short poll (``AGENT_STREAM_POLL_MS``) for everyone
+else's. Replay reads from the table, so a client can resume on a different
+worker than the one it was connected to. The table keeps the newest
+``buffer_size`` rows.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from deepagent.stream import StreamBroker, StreamFrame, encode_frame, event_quest
+
+logger = logging.getLogger(__name__)
+
+# Trim the table once every this many local publishes.
+_TRIM_EVERY = 100
+
+
+class SqliteStreamBroker(StreamBroker):
+    def __init__(self, path: Path, poll_seconds: float | None = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_seconds = (
+            poll_seconds
+            if poll_seconds is not None
+            else int(os.environ.get("AGENT_STREAM_POLL_MS", "50")) / 1000
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stream (seq INTEGER PRIMARY KEY AUTOINCREMENT, event TEXT NOT NULL)"
+        )
+        # Only events published after this process started are fanned out live.
+        row = self._conn.execute("SELECT MAX(seq) FROM stream").fetchone()
+        self._seq = row[0] or 0
+        self._published = 0
+        self._poll_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll_loop(), name="stream-broker-poll")
+
+    async def close(self) -> None:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._poll_task
+            self._poll_task = None
+        with self._lock:
+            self._conn.close()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                self.pump()
+            except sqlite3.Error:
+                logger.exception("SqliteStreamBroker: poll failed")
+
+    async def publish(self, event: dict) -> None:
+        with self._lock:
+            self._conn.execute("INSERT INTO stream (event) VALUES (?)", (json.dumps(event, default=str),))
+            self._published += 1
+            if self._published % _TRIM_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM stream WHERE seq <= (SELECT MAX(seq) FROM stream) - ?", (self._buffer.maxlen,)
+                )
+        # Deliver everything up to and including our own row, in sequence order.
+        self.pump()
+
+    def pump(self) -> int:
+        """Fan out rows other processes (or this one) appended since the last pump."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, event FROM stream WHERE seq > ? ORDER BY seq", (self._seq,)
+            ).fetchall()
+        for seq, raw in rows:
+            self._fan_out(seq, json.loads(raw))
+        return len(rows)
+
+    def subscribe(self, *args: Any, **kwargs: Any):
+        # Catch up first so a replay right after this call lines up with the live queue.
+        self.pump()
+        return super().subscribe(*args, **kwargs)
+
+    def stats(self) -> dict[str, Any]:
+        return {**super().stats(), "backend": "sqlite"}
+
+    def _oldest_seq(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(seq) FROM stream").fetchone()
+        return row[0] if row[0] is not None else self._seq + 1
+
+    def _frames_after(self, last_seq: int) -> Iterable[StreamFrame]:
+        # Capped at our own cursor so replay and the live queue do not overlap.
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, event FROM stream WHERE seq > ? AND seq <= ? ORDER BY seq", (last_seq, self._seq)
+            ).fetchall()
+        for seq, raw in rows:
+            event = json.loads(raw)
+            yield StreamFrame(seq, event, encode_frame(seq, event), str(event.get("type", "")), event_quest(event))
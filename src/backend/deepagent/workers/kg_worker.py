@@ -16,8 +16,14 @@ Output contract (from SKILL.md):
 
 from __future__ import annotations
 
+import copy
 import logging
 import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Any
 
 from deepagent.workers.base import BaseWorker, WorkerExecution
@@ -200,6 +206,125 @@ def _create_rag_instance(working_dir: str | None = None):
         return None
 
 
+# ---------------------------------------------------------------------------
+# Retrieval cache
+# ---------------------------------------------------------------------------
+
+_TRAILING_PUNCT = re.compile(r"[\s?!.,;:]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query."""
+    q = unicodedata.normalize("NFKC", query).lower().strip()
+    return _TRAILING_PUNCT.sub("", _WHITESPACE.sub(" ", q))
+
+
+@dataclass
+class _CachedRetrieval:
+    execution: WorkerExecution
+    expires_at: float
+    version: int
+    cost_seconds: float  # how long the retrieval took, i.e. what a hit saves
+
+
+class KgRetrievalCache:
+    """TTL + LRU cache of KG search results keyed by normalized query, intent and mode.
+
+    Every write to the KG goes through :func:`kg_insert`, which bumps
+    :attr:`version`; entries from an older version are never served.
+    Bounds come from ``AGENT_KG_CACHE_SIZE`` (default 256, 0 disables) and
+    ``AGENT_KG_CACHE_TTL_SECONDS`` (default 300).
+    """
+
+    def __init__(self, max_entries: int | None = None, ttl_seconds: float | None = None) -> None:
+        self.max_entries = (
+            max_entries if max_entries is not None else int(os.environ.get("AGENT_KG_CACHE_SIZE", "256"))
+        )
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None else float(os.environ.get("AGENT_KG_CACHE_TTL_SECONDS", "300"))
+        )
+        self.version = 0
+        self._entries: OrderedDict[tuple, _CachedRetrieval] = OrderedDict()
+        self._metrics = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidations": 0}
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def key(query: str, intent: str, mode: str | None) -> tuple:
+        return (normalize_query(query), intent, mode)
+
+    def get(self, key: tuple, now: float | None = None) -> WorkerExecution | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._metrics["misses"] += 1
+            return None
+        now = time.monotonic() if now is None else now
+        if entry.version != self.version or entry.expires_at <= now:
+            del self._entries[key]
+            self._metrics["expired"] += 1
+            self._metrics["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._metrics["hits"] += 1
+        self._saved_seconds += entry.cost_seconds
+        return copy.deepcopy(entry.execution)
+
+    def put(
+        self, key: tuple, execution: WorkerExecution, cost_seconds: float, version: int, now: float | None = None
+    ) -> None:
+        """Store a result computed against KG ``version``; dropped if the KG changed meanwhile."""
+        if self.max_entries <= 0 or version != self.version:
+            return
+        now = time.monotonic() if now is None else now
+        self._entries[key] = _CachedRetrieval(copy.deepcopy(execution), now + self.ttl_seconds, version, cost_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics["evicted"] += 1
+
+    def bump_version(self) -> int:
+        """Invalidate every cached retrieval after a KG write."""
+        self.version += 1
+        self._entries.clear()
+        self._metrics["invalidations"] += 1
+        return self.version
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._metrics["hits"] + self._metrics["misses"]
+        return {
+            **self._metrics,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "version": self.version,
+            "hit_ratio": round(self._metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self._saved_seconds, 3),
+        }
+
+
+_retrieval_cache: KgRetrievalCache | None = None
+
+
+def get_retrieval_cache() -> KgRetrievalCache:
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        _retrieval_cache = KgRetrievalCache()
+    return _retrieval_cache
+
+
+async def kg_insert(rag: Any, text: str) -> None:
+    """Insert ``text`` into LightRAG and invalidate cached retrievals.
+
+    All KG writes should go through here so chat never serves context that
+    predates them.
+    """
+    try:
+        await rag.ainsert(text)
+    finally:
+        # Bump even on failure or timeout: part of the insert may have landed.
+        get_retrieval_cache().bump_version()
+
+
 # ---------------------------------------------------------------------------
 # KG Worker
 # ---------------------------------------------------------------------------
@@ -314,6 +439,21 @@ class KgWorker(BaseWorker):
                 },
             )
 
+        cache = get_retrieval_cache()
+        cache_key = cache.key(query, intent, mode)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("KG search: cache hit for query=%r", query[:80])
+            return cached
+
+        version = cache.version
+        started = time.monotonic()
+        execution = await self._query_kg(rag, query, intent, mode)
+        if execution.ok and execution.data.get("snippets"):
+            cache.put(cache_key, execution, time.monotonic() - started, version)
+        return execution
+
+    async def _query_kg(self, rag: Any, query: str, intent: str, mode: str) -> WorkerExecution:
         try:
             from lightrag import QueryParam
 
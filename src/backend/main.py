@@ -17,10 +17,12 @@ from app.middleware.errors import (
     ApiException,
     api_exception_handler,
     generic_exception_handler,
+    queue_admission_exception_handler,
 )
 from app.middleware.idempotency import IdempotencyMiddleware
 from deepagent.contracts import ProfileScores, QuestContext, QuestMemory, PersonaConfig  # noqa: F401
 from deepagent.factory import create_master
+from state.task_queue import QueueAdmissionError
 from utils import (
     ClientMessage,
     ClientMessagePart,  # noqa: F401 — re-exported for Pydantic schema discovery
@@ -69,19 +71,21 @@ _rag = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global _rag
+    state_path = Path(__file__).parent / "state" / "runtime_state.json"
     master = create_master(
-        state_path=Path(__file__).parent / "state" / "runtime_state.json",
+        state_path=state_path,
         tick_seconds=int(os.environ.get("AGENT_TICK_SECONDS", "900")),
     )
-    await master.start()
     app.state.always_on_master = master
 
-    # Init AnalysisCache (shared singleton — used by both DataWatcher and HTTP routes)
+    # Init the AnalysisCache registry (one cache per persona — shared by DataWatcher and HTTP routes)
     from daemon.analysis_cache import init_analysis_cache
-    _data_dir = Path(__file__).parent.parent.parent / "data" / "all_personas" / "persona_p05"
-    init_analysis_cache(data_dir=_data_dir, persona_id="p05")
+    from daemon.analysis_store import create_analysis_store
+    _personas_root = Path(__file__).parent.parent.parent / "data" / "all_personas"
+    init_analysis_cache(data_root=_personas_root, store=create_analysis_store(state_path.parent))
+    _data_dir = _personas_root / "persona_p05"
 
-    # Start DataWatcher — polls Theo's JSONL files and publishes SSE events on change
+    # DataWatcher — polls Theo's JSONL files and publishes SSE events on change
     from daemon.watcher import DataWatcher
     data_watcher = DataWatcher(
         master=master,
@@ -89,15 +93,51 @@ async def lifespan(app: FastAPI):
         persona_id="p05",
         poll_interval=float(os.environ.get("DATA_WATCHER_INTERVAL", "3.0")),
     )
-    master.set_data_watcher(data_watcher)
-    await data_watcher.start()
-    app.state.data_watcher = data_watcher
+
+    # With several uvicorn workers only the elected leader runs the scheduler,
+    # the watcher and re-analysis; followers serve reads and forward cycles.
+    from deepagent.leader import create_leader_election
+    election = create_leader_election(state_path)
+    app.state.leader_election = election
+
+    async def _on_leadership(leader: bool) -> None:
+        await master.set_leader(leader)
+        if leader:
+            master.set_data_watcher(data_watcher)
+            await data_watcher.start()
+            app.state.data_watcher = data_watcher
+        else:
+            app.state.data_watcher = None
+            master.set_data_watcher(None)
+            await data_watcher.stop()
+
+    async def _on_wakeup(triggers: list[str]) -> None:
+        for trigger in triggers:
+            # Not awaited: the election loop must keep renewing the lease while cycles run.
+            master.request_cycle(trigger=trigger).add_done_callback(
+                lambda f: f.cancelled() or f.exception()
+            )
+
+    if election is None:
+        await master.start()
+        await _on_leadership(True)
+    else:
+        master.set_cycle_forwarder(election.forward)
+        election.on_change(_on_leadership)
+        election.on_wakeup(_on_wakeup)
+        await master.start(lead=False)
+        app.state.data_watcher = None
+        await election.start()
 
     logger.info("Skipping eager LightRAG startup; KG is lazy-initialized when needed")
     yield
+    if election is not None:
+        await election.stop()
     await data_watcher.stop()
     master.set_data_watcher(None)
     await master.stop()
+    from pipeline.extractor import shutdown_extraction_pool
+    shutdown_extraction_pool()
     if _rag is not None:
         try:
             if hasattr(_rag, "close"):
@@ -111,6 +151,7 @@ async def lifespan(app: FastAPI):
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(IdempotencyMiddleware)
 app.add_exception_handler(ApiException, api_exception_handler)
+app.add_exception_handler(QueueAdmissionError, queue_admission_exception_handler)
 app.add_exception_handler(Exception, generic_exception_handler)
 app.include_router(v1_router)
 app.include_router(agent_router)
@@ -3,12 +3,30 @@
 No LLM calls here. Output must stay under ~8k tokens.
 
 Per-domain functions are exported so AnalysisCache can re-extract a single
-domain without re-reading all files.
+domain without re-reading all files. AnalysisCache goes one step further with
+:class:`IncrementalExtractor`, which keeps each domain's running aggregates and
+only parses lines appended since its last read.
+
+Full extractions (a persona's first load, or ``extract_persona_data(...,
+parallel=True)``) fan the domains out over a shared process pool, sized by
+``AGENT_EXTRACT_PROCESSES`` (default ``min(4, cpu_count)``; ``0`` extracts
+inline). Workers are started with ``forkserver`` (``spawn`` where that is
+unavailable), never forked from the threaded server process.
 """
+import asyncio
+import heapq
 import json
+import logging
+import multiprocessing
+import os
 from collections import defaultdict
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
 
 
 def _data_root(persona_id: str) -> Path:
@@ -62,12 +80,42 @@ def extract_profile(persona_id: str) -> dict:
     }
 
 
-def extract_transactions(persona_id: str) -> tuple[dict, list]:
-    """Returns (transactions_summary, raw_records)."""
-    root = _data_root(persona_id)
-    transactions = _read_jsonl(root / "transactions.jsonl")
-    weekly_spend: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
-    for t in transactions:
+# ---------------------------------------------------------------------------
+# Running aggregates — one per domain, fed record by record so the full and
+# the incremental extractors produce identical summaries.
+# ---------------------------------------------------------------------------
+
+class _RecentN:
+    """Newest ``n`` records by ``ts``, as ``sorted(records, key=ts, reverse=True)[:n]`` would pick."""
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self._heap: list[tuple[tuple, dict]] = []
+        self._seen = 0
+
+    def add(self, record: dict) -> None:
+        # Ties keep file order, like the stable sort: earlier records rank higher.
+        key = (record.get("ts", ""), -self._seen)
+        self._seen += 1
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, (key, record))
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (key, record))
+
+    def items(self) -> list[dict]:
+        return [record for _, record in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+
+
+def _float_counter() -> defaultdict:
+    return defaultdict(float)
+
+
+class _TransactionsAgg:
+    def __init__(self) -> None:
+        # Module-level factory, not a lambda: aggregates are pickled back from the process pool.
+        self.weekly_spend: dict[str, dict[str, float]] = defaultdict(_float_counter)
+
+    def add(self, t: dict) -> None:
         ts = t.get("ts", "")
         tags = t.get("tags", [])
         text = t.get("text", "")
@@ -82,90 +130,88 @@ def extract_transactions(persona_id: str) -> tuple[dict, list]:
                 dt = datetime.fromisoformat(ts)
                 week_key = dt.strftime("%Y-W%V")
                 category = tags[0]
-                weekly_spend[week_key][category] += amount
+                self.weekly_spend[week_key][category] += amount
             except ValueError:
                 pass
-    sorted_weeks = sorted(weekly_spend.keys(), reverse=True)[:12]
-    summary = {w: dict(weekly_spend[w]) for w in sorted_weeks}
-    return summary, transactions
 
+    def summary(self) -> dict:
+        sorted_weeks = sorted(self.weekly_spend.keys(), reverse=True)[:12]
+        return {w: dict(self.weekly_spend[w]) for w in sorted_weeks}
 
-def extract_calendar_data(persona_id: str) -> tuple[dict, list]:
-    """Returns (calendar_summary, raw_records). Named to avoid shadowing stdlib calendar."""
-    root = _data_root(persona_id)
-    calendar_records = _read_jsonl(root / "calendar.jsonl")
-    cal_tag_freq: dict[str, int] = defaultdict(int)
-    weekly_event_count: dict[str, int] = defaultdict(int)
-    for ev in calendar_records:
+
+class _CalendarAgg:
+    def __init__(self) -> None:
+        self.tag_freq: dict[str, int] = defaultdict(int)
+        self.weekly_event_count: dict[str, int] = defaultdict(int)
+
+    def add(self, ev: dict) -> None:
         ts = ev.get("ts", "")
-        tags = ev.get("tags", [])
-        for tag in tags:
-            cal_tag_freq[tag] += 1
+        for tag in ev.get("tags", []):
+            self.tag_freq[tag] += 1
         if ts:
             try:
                 dt = datetime.fromisoformat(ts)
                 week_key = dt.strftime("%Y-W%V")
-                weekly_event_count[week_key] += 1
+                self.weekly_event_count[week_key] += 1
             except ValueError:
                 pass
-    top_cal_tags = sorted(cal_tag_freq.items(), key=lambda x: x[1], reverse=True)[:5]
-    sorted_cal_weeks = sorted(weekly_event_count.keys(), reverse=True)[:12]
-    summary = {
-        "weekly_event_counts": {w: weekly_event_count[w] for w in sorted_cal_weeks},
-        "top_tags": dict(top_cal_tags),
-    }
-    return summary, calendar_records
 
+    def summary(self) -> dict:
+        top_cal_tags = sorted(self.tag_freq.items(), key=lambda x: x[1], reverse=True)[:5]
+        sorted_cal_weeks = sorted(self.weekly_event_count.keys(), reverse=True)[:12]
+        return {
+            "weekly_event_counts": {w: self.weekly_event_count[w] for w in sorted_cal_weeks},
+            "top_tags": dict(top_cal_tags),
+        }
 
-def extract_lifelog(persona_id: str) -> tuple[dict, list]:
-    """Returns (lifelog_summary, raw_records)."""
-    root = _data_root(persona_id)
-    lifelog = _read_jsonl(root / "lifelog.jsonl")
-    ll_tag_freq: dict[str, int] = defaultdict(int)
-    for entry in lifelog:
+
+class _LifelogAgg:
+    def __init__(self) -> None:
+        self.tag_freq: dict[str, int] = defaultdict(int)
+        self.recent = _RecentN(5)
+
+    def add(self, entry: dict) -> None:
         for tag in entry.get("tags", []):
-            ll_tag_freq[tag] += 1
-    top_ll_tags = sorted(ll_tag_freq.items(), key=lambda x: x[1], reverse=True)[:10]
-    recent_lifelog = sorted(lifelog, key=lambda x: x.get("ts", ""), reverse=True)[:5]
-    summary = {
-        "top_tags": dict(top_ll_tags),
-        "recent": [
-            {"id": e["id"], "text": e["text"], "tags": e.get("tags", [])}
-            for e in recent_lifelog
-        ],
-    }
-    return summary, lifelog
+            self.tag_freq[tag] += 1
+        self.recent.add(entry)
+
+    def summary(self) -> dict:
+        top_ll_tags = sorted(self.tag_freq.items(), key=lambda x: x[1], reverse=True)[:10]
+        return {
+            "top_tags": dict(top_ll_tags),
+            "recent": [
+                {"id": e["id"], "text": e["text"], "tags": e.get("tags", [])}
+                for e in self.recent.items()
+            ],
+        }
 
 
-def extract_social(persona_id: str) -> tuple[list, list]:
-    """Returns (social_summary, raw_records)."""
-    root = _data_root(persona_id)
-    social = _read_jsonl(root / "social_posts.jsonl")
-    recent_social = sorted(social, key=lambda x: x.get("ts", ""), reverse=True)[:5]
-    summary = [
-        {"id": p["id"], "text": p["text"], "tags": p.get("tags", [])}
-        for p in recent_social
-    ]
-    return summary, social
+class _SocialAgg:
+    def __init__(self) -> None:
+        self.recent = _RecentN(5)
 
+    def add(self, post: dict) -> None:
+        self.recent.add(post)
+
+    def summary(self) -> list:
+        return [
+            {"id": p["id"], "text": p["text"], "tags": p.get("tags", [])}
+            for p in self.recent.items()
+        ]
 
-def extract_notion_leads(persona_id: str) -> tuple[dict, list]:
-    """Returns (notion_leads_summary, raw_records)."""
-    root = _data_root(persona_id)
-    leads = _read_jsonl(root / "notion_leads.jsonl")
-    today = _today()
 
-    status_counts: dict[str, int] = defaultdict(int)
-    open_pipeline_value = 0.0
-    due_followups: list[dict] = []
-    top_leads: list[dict] = []
+class _NotionLeadsAgg:
+    def __init__(self) -> None:
+        self.status_counts: dict[str, int] = defaultdict(int)
+        self.open_pipeline_value = 0.0
+        self.items: list[tuple[dict, date | None]] = []
 
-    for lead in leads:
+    def add(self, lead: dict) -> None:
         status = str(lead.get("status", "")).strip() or "Lead"
-        status_counts[status] += 1
+        self.status_counts[status] += 1
         deal_size = float(lead.get("deal_size", 0) or 0)
         if status not in {"Won", "Lost"}:
-            open_pipeline_value += deal_size
+            self.open_pipeline_value += deal_size
         follow_up = _parse_iso_date(str(lead.get("next_follow_up_date", "")).strip())
         lead_item = {
             "id": str(lead.get("id", "")).strip(),
@@ -176,47 +222,48 @@ def extract_notion_leads(persona_id: str) -> tuple[dict, list]:
             "next_follow_up_date": follow_up.isoformat() if follow_up else "",
             "text": str(lead.get("text", "")).strip(),
         }
-        top_leads.append(lead_item)
-        if follow_up is not None and follow_up <= (today + timedelta(days=7)) and status not in {"Won", "Lost"}:
-            due_followups.append(lead_item)
-
-    due_followups.sort(
-        key=lambda item: (
-            item["next_follow_up_date"] or "9999-12-31",
-            -(item["deal_size"] or 0),
+        self.items.append((lead_item, follow_up))
+
+    def summary(self) -> dict:
+        # Due dates are relative to today, so this part is recomputed on every call.
+        today = _today()
+        due_followups = [
+            item for item, follow_up in self.items
+            if follow_up is not None and follow_up <= (today + timedelta(days=7))
+            and item["status"] not in {"Won", "Lost"}
+        ]
+        top_leads = [item for item, _ in self.items]
+        due_followups.sort(
+            key=lambda item: (
+                item["next_follow_up_date"] or "9999-12-31",
+                -(item["deal_size"] or 0),
+            )
         )
-    )
-    top_leads.sort(key=lambda item: (-(item["deal_size"] or 0), item["name"]))
-
-    summary = {
-        "status_counts": dict(status_counts),
-        "open_pipeline_value": round(open_pipeline_value, 2),
-        "due_followups": due_followups[:5],
-        "top_leads": top_leads[:5],
-        "open_lead_count": sum(
-            count for status, count in status_counts.items() if status not in {"Won", "Lost"}
-        ),
-    }
-    return summary, leads
+        top_leads.sort(key=lambda item: (-(item["deal_size"] or 0), item["name"]))
+        return {
+            "status_counts": dict(self.status_counts),
+            "open_pipeline_value": round(self.open_pipeline_value, 2),
+            "due_followups": due_followups[:5],
+            "top_leads": top_leads[:5],
+            "open_lead_count": sum(
+                count for status, count in self.status_counts.items() if status not in {"Won", "Lost"}
+            ),
+        }
 
 
-def extract_time_commitments(persona_id: str) -> tuple[dict, list]:
-    """Returns (time_commitments_summary, raw_records)."""
-    root = _data_root(persona_id)
-    commitments = _read_jsonl(root / "time_commitments.jsonl")
-    today = _today()
-
-    status_counts: dict[str, int] = defaultdict(int)
-    total_minutes_open = 0
-    due_soon: list[dict] = []
-    blocked: list[dict] = []
+class _TimeCommitmentsAgg:
+    def __init__(self) -> None:
+        self.status_counts: dict[str, int] = defaultdict(int)
+        self.total_minutes_open = 0
+        self.items: list[tuple[dict, date | None]] = []
+        self.blocked: list[dict] = []
 
-    for item in commitments:
+    def add(self, item: dict) -> None:
         status = str(item.get("status", "")).strip() or "Inbox"
-        status_counts[status] += 1
+        self.status_counts[status] += 1
         estimated = int(item.get("estimated_minutes", 0) or 0)
         if status not in {"Done", "Dropped"}:
-            total_minutes_open += estimated
+            self.total_minutes_open += estimated
         due_date = _parse_iso_date(str(item.get("due_date", "")).strip())
         commitment = {
             "id": str(item.get("id", "")).strip(),
@@ -228,47 +275,45 @@ def extract_time_commitments(persona_id: str) -> tuple[dict, list]:
             "text": str(item.get("text", "")).strip(),
         }
         if status == "Blocked":
-            blocked.append(commitment)
-        if due_date is not None and due_date <= (today + timedelta(days=7)) and status not in {"Done", "Dropped"}:
-            due_soon.append(commitment)
-
-    due_soon.sort(key=lambda item: (item["due_date"] or "9999-12-31", -(item["estimated_minutes"] or 0)))
-    blocked.sort(key=lambda item: (item["due_date"] or "9999-12-31", item["title"]))
-
-    summary = {
-        "status_counts": dict(status_counts),
-        "total_minutes_open": total_minutes_open,
-        "due_soon": due_soon[:5],
-        "blocked": blocked[:5],
-        "open_commitment_count": sum(
-            count for status, count in status_counts.items() if status not in {"Done", "Dropped"}
-        ),
-    }
-    return summary, commitments
-
+            self.blocked.append(commitment)
+        if status not in {"Done", "Dropped"}:
+            self.items.append((commitment, due_date))
+
+    def summary(self) -> dict:
+        today = _today()
+        due_soon = [c for c, due in self.items if due is not None and due <= (today + timedelta(days=7))]
+        blocked = list(self.blocked)
+        due_soon.sort(key=lambda item: (item["due_date"] or "9999-12-31", -(item["estimated_minutes"] or 0)))
+        blocked.sort(key=lambda item: (item["due_date"] or "9999-12-31", item["title"]))
+        return {
+            "status_counts": dict(self.status_counts),
+            "total_minutes_open": self.total_minutes_open,
+            "due_soon": due_soon[:5],
+            "blocked": blocked[:5],
+            "open_commitment_count": sum(
+                count for status, count in self.status_counts.items() if status not in {"Done", "Dropped"}
+            ),
+        }
 
-def extract_budget_commitments(persona_id: str) -> tuple[dict, list]:
-    """Returns (budget_commitments_summary, raw_records)."""
-    root = _data_root(persona_id)
-    budgets = _read_jsonl(root / "budget_commitments.jsonl")
-    today = _today()
 
-    status_counts: dict[str, int] = defaultdict(int)
-    inflow_open = 0.0
-    outflow_open = 0.0
-    high_pressure: list[dict] = []
-    due_soon: list[dict] = []
+class _BudgetCommitmentsAgg:
+    def __init__(self) -> None:
+        self.status_counts: dict[str, int] = defaultdict(int)
+        self.inflow_open = 0.0
+        self.outflow_open = 0.0
+        self.items: list[tuple[dict, date | None]] = []
+        self.high_pressure: list[dict] = []
 
-    for item in budgets:
+    def add(self, item: dict) -> None:
         status = str(item.get("status", "")).strip() or "Planned"
-        status_counts[status] += 1
+        self.status_counts[status] += 1
         amount = float(item.get("amount", 0) or 0)
         direction = str(item.get("direction", "")).strip() or "outflow"
         if status not in {"Paid", "Cancelled"}:
             if direction == "inflow":
-                inflow_open += amount
+                self.inflow_open += amount
             else:
-                outflow_open += amount
+                self.outflow_open += amount
         due_date = _parse_iso_date(str(item.get("due_date", "")).strip())
         budget = {
             "id": str(item.get("id", "")).strip(),
@@ -281,61 +326,326 @@ def extract_budget_commitments(persona_id: str) -> tuple[dict, list]:
             "text": str(item.get("text", "")).strip(),
         }
         if budget["pressure_level"] in {"high", "critical"}:
-            high_pressure.append(budget)
-        if due_date is not None and due_date <= (today + timedelta(days=7)) and status not in {"Paid", "Cancelled"}:
-            due_soon.append(budget)
-
-    due_soon.sort(key=lambda item: (item["due_date"] or "9999-12-31", -(item["amount"] or 0)))
-    high_pressure.sort(key=lambda item: (item["pressure_level"] != "critical", -(item["amount"] or 0)))
-
-    summary = {
-        "status_counts": dict(status_counts),
-        "open_inflow_total": round(inflow_open, 2),
-        "open_outflow_total": round(outflow_open, 2),
-        "net_open_pressure": round(inflow_open - outflow_open, 2),
-        "due_soon": due_soon[:5],
-        "high_pressure": high_pressure[:5],
-    }
-    return summary, budgets
+            self.high_pressure.append(budget)
+        if status not in {"Paid", "Cancelled"}:
+            self.items.append((budget, due_date))
+
+    def summary(self) -> dict:
+        today = _today()
+        due_soon = [b for b, due in self.items if due is not None and due <= (today + timedelta(days=7))]
+        high_pressure = list(self.high_pressure)
+        due_soon.sort(key=lambda item: (item["due_date"] or "9999-12-31", -(item["amount"] or 0)))
+        high_pressure.sort(key=lambda item: (item["pressure_level"] != "critical", -(item["amount"] or 0)))
+        return {
+            "status_counts": dict(self.status_counts),
+            "open_inflow_total": round(self.inflow_open, 2),
+            "open_outflow_total": round(self.outflow_open, 2),
+            "net_open_pressure": round(self.inflow_open - self.outflow_open, 2),
+            "due_soon": due_soon[:5],
+            "high_pressure": high_pressure[:5],
+        }
+
+
+# Domain name (as used by AnalysisCache) → (JSONL filename, aggregate)
+DOMAIN_AGGREGATES: dict[str, tuple[str, type]] = {
+    "finance": ("transactions.jsonl", _TransactionsAgg),
+    "calendar": ("calendar.jsonl", _CalendarAgg),
+    "lifelog": ("lifelog.jsonl", _LifelogAgg),
+    "social": ("social_posts.jsonl", _SocialAgg),
+    "notion_leads": ("notion_leads.jsonl", _NotionLeadsAgg),
+    "time_commitments": ("time_commitments.jsonl", _TimeCommitmentsAgg),
+    "budget_commitments": ("budget_commitments.jsonl", _BudgetCommitmentsAgg),
+}
+
+
+def _extract_full(persona_id: str, domain: str):
+    filename, agg_cls = DOMAIN_AGGREGATES[domain]
+    records = _read_jsonl(_data_root(persona_id) / filename)
+    agg = agg_cls()
+    for record in records:
+        agg.add(record)
+    return agg.summary(), records
+
+
+def extract_transactions(persona_id: str) -> tuple[dict, list]:
+    """Returns (transactions_summary, raw_records)."""
+    return _extract_full(persona_id, "finance")
+
+
+def extract_calendar_data(persona_id: str) -> tuple[dict, list]:
+    """Returns (calendar_summary, raw_records). Named to avoid shadowing stdlib calendar."""
+    return _extract_full(persona_id, "calendar")
+
+
+def extract_lifelog(persona_id: str) -> tuple[dict, list]:
+    """Returns (lifelog_summary, raw_records)."""
+    return _extract_full(persona_id, "lifelog")
+
+
+def extract_social(persona_id: str) -> tuple[list, list]:
+    """Returns (social_summary, raw_records)."""
+    return _extract_full(persona_id, "social")
+
+
+def extract_notion_leads(persona_id: str) -> tuple[dict, list]:
+    """Returns (notion_leads_summary, raw_records)."""
+    return _extract_full(persona_id, "notion_leads")
+
+
+def extract_time_commitments(persona_id: str) -> tuple[dict, list]:
+    """Returns (time_commitments_summary, raw_records)."""
+    return _extract_full(persona_id, "time_commitments")
+
+
+def extract_budget_commitments(persona_id: str) -> tuple[dict, list]:
+    """Returns (budget_commitments_summary, raw_records)."""
+    return _extract_full(persona_id, "budget_commitments")
+
+
+# ---------------------------------------------------------------------------
+# Incremental extractor — parses only lines appended since the last call
+# ---------------------------------------------------------------------------
+
+# Bytes just before the read offset, compared on every read to catch in-place rewrites.
+_SIGNATURE_BYTES = 64
+
+
+class JsonlTail:
+    """Follows one JSONL file by byte offset and inode.
+
+    :meth:`read` returns the records appended since the previous call, or the
+    whole file with ``reset=True`` when the file was replaced (new inode),
+    truncated, or rewritten in place (the bytes before the offset changed).
+    A trailing line without a newline is only consumed once it parses.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.inode: int | None = None
+        self.offset = 0
+        self._signature = b""
+
+    def read(self) -> tuple[list[dict], bool]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            had_data = self.inode is not None
+            self.inode, self.offset, self._signature = None, 0, b""
+            return [], had_data
+
+        with self.path.open("rb") as f:
+            reset = self.inode != st.st_ino or st.st_size < self.offset
+            if not reset and self.offset:
+                f.seek(max(0, self.offset - _SIGNATURE_BYTES))
+                reset = f.read(self.offset - f.tell()) != self._signature
+            if reset:
+                self.offset, self._signature = 0, b""
+            f.seek(self.offset)
+            data = f.read()
+
+        end = data.rfind(b"\n") + 1
+        records = _parse_lines(data[:end])
+        rest = data[end:].strip()
+        if rest:
+            try:
+                records.append(json.loads(rest))
+                end = len(data)
+            except json.JSONDecodeError:
+                pass  # probably a half-written line; picked up on the next read
+
+        consumed = data[:end]
+        self.inode = st.st_ino
+        self.offset += len(consumed)
+        self._signature = (self._signature + consumed)[-_SIGNATURE_BYTES:]
+        return records, reset
+
+
+def _parse_lines(data: bytes) -> list[dict]:
+    records = []
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        line = line.strip()
+        if line:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return records
+
+
+@dataclass
+class _TailState:
+    tail: JsonlTail
+    agg: Any
+    raw: list = field(default_factory=list)
+
+
+def _build_tail_state(path: Path, domain: str) -> _TailState:
+    """Read ``path`` from the start into a fresh state; runs in the process pool."""
+    state = _TailState(tail=JsonlTail(path), agg=DOMAIN_AGGREGATES[domain][1]())
+    records, _ = state.tail.read()
+    for record in records:
+        state.agg.add(record)
+    state.raw.extend(records)
+    return state
+
+
+_extraction_pool: ProcessPoolExecutor | None = None
+
+
+def get_extraction_pool() -> Executor | None:
+    """Shared process pool for full extractions; ``None`` when disabled."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        workers = int(os.environ.get("AGENT_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+        if workers < 1:
+            return None
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _extraction_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+    return _extraction_pool
+
+
+def _discard_broken_pool(pool: Executor, exc: BaseException) -> None:
+    """Drop the shared pool after a worker crash so the next full extraction builds a fresh one."""
+    if isinstance(exc, BrokenExecutor) and pool is _extraction_pool:
+        shutdown_extraction_pool()
+
+
+def shutdown_extraction_pool() -> None:
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=False, cancel_futures=True)
+        _extraction_pool = None
+
+
+class IncrementalExtractor:
+    """Per-persona extractor whose cost is proportional to what was appended.
+
+    ``extract(domain)`` returns the same ``(summary, raw_records)`` as the
+    matching ``extract_*`` function, but keeps each domain's aggregates and
+    only parses new lines; a replaced, truncated or rewritten file triggers a
+    full rebuild of that domain. The returned raw list is updated in place.
+    """
+
+    def __init__(self, persona_id: str) -> None:
+        self.persona_id = persona_id
+        self._states: dict[str, _TailState] = {}
+        self.metrics = {"lines_parsed": 0, "full_rebuilds": 0, "incremental_reads": 0}
+
+    def extract(self, domain: str) -> tuple[Any, list]:
+        filename, agg_cls = DOMAIN_AGGREGATES[domain]
+        path = _data_root(self.persona_id) / filename
+        state = self._states.get(domain)
+        if state is None or state.tail.path != path:
+            state = self._states[domain] = _TailState(tail=JsonlTail(path), agg=agg_cls())
+
+        records, reset = state.tail.read()
+        if reset:
+            state.agg = agg_cls()
+            state.raw = []
+            self.metrics["full_rebuilds"] += 1
+        else:
+            self.metrics["incremental_reads"] += 1
+        for record in records:
+            state.agg.add(record)
+        state.raw.extend(records)
+        self.metrics["lines_parsed"] += len(records)
+        return state.agg.summary(), state.raw
+
+    def bytes_loaded(self) -> int:
+        """JSONL bytes read into the tracked domains; a proxy for the memory their raw records hold."""
+        return sum(state.tail.offset for state in self._states.values())
+
+    def untracked(self, domains: set[str] | list[str]) -> list[str]:
+        """Domains in ``domains`` that have never been extracted."""
+        return sorted(d for d in domains if d in DOMAIN_AGGREGATES and d not in self._states)
+
+    def prime(self, domains: set[str] | list[str], pool: Executor | None = None) -> None:
+        """Fully load every domain in ``domains`` that has no state yet, in parallel on ``pool``.
+
+        Domains already tracked are left to :meth:`extract`. Without a pool
+        (or if it fails) nothing is primed and :meth:`extract` reads inline.
+
+        Each worker sends its domain's raw records back, because the caller
+        keeps them for data refs, so the parent still pays to unpickle every
+        record. The win is that JSON parsing and aggregation run in parallel;
+        a domain too small to be worth that round trip is better extracted
+        inline.
+        """
+        root = _data_root(self.persona_id)
+        pending = self.untracked(domains)
+        if pool is None or not pending:
+            return
+        futures = {d: pool.submit(_build_tail_state, root / DOMAIN_AGGREGATES[d][0], d) for d in pending}
+        for domain, future in futures.items():
+            try:
+                state = future.result()
+            except Exception as exc:  # noqa: BLE001 - e.g. a broken pool; extract() falls back inline
+                logger.warning("IncrementalExtractor: pooled extract of %s failed: %s", domain, exc)
+                _discard_broken_pool(pool, exc)
+                continue
+            self._states[domain] = state
+            self.metrics["full_rebuilds"] += 1
+            self.metrics["lines_parsed"] += len(state.raw)
 
 
 # ---------------------------------------------------------------------------
 # Full extractor (backward-compatible, calls per-domain functions)
 # ---------------------------------------------------------------------------
 
-def extract_persona_data(persona_id: str = "p01") -> dict:
-    profile = extract_profile(persona_id)
-    transactions_summary, transactions = extract_transactions(persona_id)
-    calendar_summary, calendar_records = extract_calendar_data(persona_id)
-    lifelog_summary, lifelog = extract_lifelog(persona_id)
-    social_summary, social = extract_social(persona_id)
-    notion_leads_summary, notion_leads = extract_notion_leads(persona_id)
-    time_commitments_summary, time_commitments = extract_time_commitments(persona_id)
-    budget_commitments_summary, budget_commitments = extract_budget_commitments(persona_id)
+# Result key → per-domain extractor, in data_refs order (later ids win).
+_FULL_EXTRACTORS: dict[str, Any] = {
+    "calendar": extract_calendar_data,
+    "transactions": extract_transactions,
+    "lifelog": extract_lifelog,
+    "social": extract_social,
+    "notion_leads": extract_notion_leads,
+    "time_commitments": extract_time_commitments,
+    "budget_commitments": extract_budget_commitments,
+}
+
+
+def _extract_with_refs(key: str, persona_id: str) -> tuple[Any, dict[str, str]]:
+    """One domain's summary and ``{id: text}`` refs, without the raw records."""
+    summary, records = _FULL_EXTRACTORS[key](persona_id)
+    return summary, {r["id"]: r.get("text", "") for r in records if r.get("id")}
+
+
+def extract_persona_data(persona_id: str = "p01", parallel: bool = False) -> dict:
+    """Extract every domain; ``parallel=True`` runs them on the shared process pool.
+
+    Pooled workers return only summaries and refs, so the raw records never
+    cross the process boundary. If the pool fails (a worker crashed, the pool
+    broke) the extraction is redone inline.
+    """
+    pool = get_extraction_pool() if parallel else None
+    results = None
+    if pool is not None:
+        try:
+            futures = {key: pool.submit(_extract_with_refs, key, persona_id) for key in _FULL_EXTRACTORS}
+            results = {key: future.result() for key, future in futures.items()}
+        except Exception as exc:  # noqa: BLE001 - e.g. BrokenProcessPool; extract inline instead
+            logger.warning("extract_persona_data: pooled extraction failed (%s); extracting inline", exc)
+            _discard_broken_pool(pool, exc)
+    if results is None:
+        results = {key: _extract_with_refs(key, persona_id) for key in _FULL_EXTRACTORS}
 
     data_refs: dict[str, str] = {}
-    for records in [
-        calendar_records,
-        transactions,
-        lifelog,
-        social,
-        notion_leads,
-        time_commitments,
-        budget_commitments,
-    ]:
-        for r in records:
-            rid = r.get("id")
-            if rid:
-                data_refs[rid] = r.get("text", "")
+    for _, refs in results.values():
+        data_refs.update(refs)
 
     return {
-        "profile": profile,
-        "transactions": transactions_summary,
-        "calendar": calendar_summary,
-        "lifelog": lifelog_summary,
-        "social": social_summary,
-        "notion_leads": notion_leads_summary,
-        "time_commitments": time_commitments_summary,
-        "budget_commitments": budget_commitments_summary,
+        "profile": extract_profile(persona_id),
+        "transactions": results["transactions"][0],
+        "calendar": results["calendar"][0],
+        "lifelog": results["lifelog"][0],
+        "social": results["social"][0],
+        "notion_leads": results["notion_leads"][0],
+        "time_commitments": results["time_commitments"][0],
+        "budget_commitments": results["budget_commitments"][0],
         "data_refs": data_refs,
     }
+
+
+async def aextract_persona_data(persona_id: str = "p01") -> dict:
+    """:func:`extract_persona_data` in full-refresh mode, off the event loop."""
+    return await asyncio.to_thread(extract_persona_data, persona_id, parallel=True)
@@ -0,0 +1,111 @@
+"""Concurrent chat-stream capacity: sync iterators (threadpool) vs async iterators.
+
+Drives Starlette's StreamingResponse directly over N concurrent simulated LLM
+streams. Each stream yields ``--tokens`` deltas ``--token-ms`` apart; the sync
+variant blocks like the sync OpenAI/Ollama clients (so Starlette iterates it in
+the anyio threadpool, 40 threads by default), the async variant awaits like
+AsyncOpenAI / ollama.AsyncClient. No network or API key is needed.
+
+Usage:
+  uv run python scripts/bench_chat_streams.py
+  uv run python scripts/bench_chat_streams.py --streams 10 100 400 --tokens 20 --token-ms 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from fastapi.responses import StreamingResponse  # noqa: E402
+
+from utils import TextDelta, wrap_stream  # noqa: E402
+
+
+def sync_events(tokens: int, delay: float):
+    for idx in range(tokens):
+        time.sleep(delay)
+        yield TextDelta(text=f"t{idx} ")
+
+
+async def async_events(tokens: int, delay: float):
+    for idx in range(tokens):
+        await asyncio.sleep(delay)
+        yield TextDelta(text=f"t{idx} ")
+
+
+async def serve_one(body_iter) -> int:
+    """Run one StreamingResponse through ASGI and return the number of body chunks sent."""
+    chunks = 0
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal chunks
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks += 1
+
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "POST", "headers": []}
+    await StreamingResponse(body_iter, media_type="text/event-stream")(scope, receive, send)
+    return chunks
+
+
+async def run(mode: str, streams: int, tokens: int, delay: float) -> dict:
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample_threads())
+    started = time.perf_counter()
+    make = sync_events if mode == "sync" else async_events
+    await asyncio.gather(*(serve_one(wrap_stream(make(tokens, delay))) for _ in range(streams)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+    ideal = tokens * delay
+    return {
+        "mode": mode,
+        "streams": streams,
+        "seconds": elapsed,
+        # Streams that could be served in the time one stream needs on its own.
+        "effective_concurrency": streams * ideal / elapsed,
+        "peak_threads": peak_threads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    delay = args.token_ms / 1000
+
+    print(f"{args.tokens} tokens x {args.token_ms:.0f} ms per stream (ideal {args.tokens * delay:.2f}s each)")
+    print(f"{'mode':<6} {'streams':>7} {'seconds':>8} {'concurrency':>11} {'threads':>7}")
+    for streams in args.streams:
+        for mode in ("sync", "async"):
+            row = asyncio.run(run(mode, streams, args.tokens, delay))
+            print(
+                f"{row['mode']:<6} {row['streams']:>7} {row['seconds']:>8.2f} "
+                f"{row['effective_concurrency']:>11.1f} {row['peak_threads']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Import runtime_state.json into the SQLite state backend.
+
+Usage:
+  uv run python scripts/migrate_runtime_state.py
+  uv run python scripts/migrate_runtime_state.py --json state/runtime_state.json --db state/runtime_state.db
+
+Afterwards run the server with AGENT_STATE_BACKEND=sqlite. The SQLite backend also
+imports the JSON file automatically when it opens an empty database, so this is
+only needed to force a re-import over an existing database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+from state.sqlite_store import SqliteStateStore  # noqa: E402
+
+
+def main() -> None:
+    default_json = BACKEND_ROOT / "state" / "runtime_state.json"
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", type=Path, default=default_json, help="Source runtime_state.json")
+    parser.add_argument("--db", type=Path, default=None, help="Target SQLite database (default: alongside --json)")
+    args = parser.parse_args()
+
+    if not args.json.exists():
+        parser.error(f"{args.json} does not exist")
+
+    db_path = args.db or args.json.with_suffix(".db")
+    store = SqliteStateStore(db_path)
+    state = store.import_json(args.json)
+    store.close()
+    print(
+        f"Imported {args.json} -> {db_path}: "
+        f"{len(state.queue)} tasks, {len(state.approvals)} approvals, "
+        f"{len(state.event_history)} events, {len(state.cycle_history)} cycles, "
+        f"{len(state.workflow_state)} workflow keys"
+    )
+
+
+if __name__ == "__main__":
+    main()
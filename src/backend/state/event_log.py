@@ -0,0 +1,408 @@
+"""Append-only, segmented on-disk log of runtime events.
+
+Every event gets a monotonic ``seq`` and is appended as one JSON line to the
+active segment (``events-<first seq>.jsonl``). Segments roll over at
+``segment_bytes``; whole segments are dropped once the log exceeds
+``retention_bytes`` or their newest event is older than ``retention_seconds``.
+
+An in-memory offset index (seq, byte offset, created_at, type per event) is
+rebuilt from the segments on open. It gives O(log n) seek by seq or timestamp,
+O(1) lookup of an event id, and lets type-filtered reads skip non-matching
+lines without parsing them.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Size of AgentRuntimeState.event_history, the recent window kept inline in runtime state.
+RECENT_EVENT_WINDOW = 100
+
+_SEGMENT_PREFIX = "events-"
+_SEGMENT_SUFFIX = ".jsonl"
+
+
+def append_recent(history: list[dict[str, Any]], event: dict[str, Any], limit: int = RECENT_EVENT_WINDOW) -> None:
+    """Append ``event`` to an inline history list in place, keeping the last ``limit`` items."""
+    history.append(event)
+    overflow = len(history) - limit
+    if overflow > 0:
+        del history[:overflow]
+
+
+def event_log_dir(state_path: Path) -> Path:
+    configured = os.environ.get("AGENT_EVENT_LOG_DIR", "").strip()
+    return Path(configured) if configured else state_path.parent / "runtime_events"
+
+
+@dataclass
+class _Segment:
+    path: Path
+    first_seq: int
+    seqs: array = field(default_factory=lambda: array("q"))
+    offsets: array = field(default_factory=lambda: array("q"))
+    timestamps: list[str] = field(default_factory=list)
+    types: list[str] = field(default_factory=list)
+    size: int = 0
+
+    @property
+    def last_seq(self) -> int:
+        return self.seqs[-1] if self.seqs else self.first_seq - 1
+
+
+class EventLog:
+    def __init__(
+        self,
+        directory: Path,
+        segment_bytes: int | None = None,
+        retention_bytes: int | None = None,
+        retention_seconds: float | None = None,
+    ) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = (
+            segment_bytes
+            if segment_bytes is not None
+            else int(os.environ.get("AGENT_EVENT_SEGMENT_BYTES", str(1024 * 1024)))
+        )
+        self.retention_bytes = (
+            retention_bytes
+            if retention_bytes is not None
+            else int(os.environ.get("AGENT_EVENT_RETENTION_BYTES", str(64 * 1024 * 1024)))
+        )
+        self.retention_seconds = (
+            retention_seconds
+            if retention_seconds is not None
+            else float(os.environ.get("AGENT_EVENT_RETENTION_DAYS", "14")) * 86400
+        )
+        self._lock = threading.Lock()
+        self._segments: list[_Segment] = []
+        self._by_id: dict[str, int] = {}
+        self._handle = None
+        self._lock_file = None
+        self._last_seq = 0
+        # Opening may cut off a torn tail; hold the flock so it is never a line another process is mid-way through.
+        with self._dir_lock():
+            self._open()
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _segment_paths(self) -> list[tuple[int, Path]]:
+        found = []
+        for path in self.directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            try:
+                found.append((int(path.name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)]), path))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def _open(self, repair: bool = True) -> None:
+        self._segments = []
+        self._by_id = {}
+        self._last_seq = 0
+        for first_seq, path in self._segment_paths():
+            segment = _Segment(path=path, first_seq=first_seq)
+            self._index_segment(segment, repair)
+            self._segments.append(segment)
+        if self._segments:
+            self._last_seq = max(self._segments[-1].last_seq, self._segments[-1].first_seq - 1)
+
+    def _index_segment(self, segment: _Segment, repair: bool = True) -> None:
+        """Index ``segment`` from ``segment.size`` (what is already indexed) to its end.
+
+        An unterminated last line is truncated when ``repair`` is set (callers
+        then hold the directory lock, so it is a torn write from a crash);
+        otherwise it may be an append in progress and is left for later.
+        """
+        offset = segment.size
+        with segment.path.open("rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                length = len(line)
+                if not line.endswith(b"\n"):
+                    if repair:
+                        # Torn write from a crash: cut it off so the next append starts clean.
+                        with segment.path.open("r+b") as trunc:
+                            trunc.truncate(offset)
+                        logger.warning("EventLog: truncated partial record in %s", segment.path.name)
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    offset += length
+                    continue
+                self._index_record(segment, record, offset)
+                offset += length
+        segment.size = offset
+
+    def _index_record(self, segment: _Segment, record: dict[str, Any], offset: int) -> None:
+        seq = int(record["seq"])
+        segment.seqs.append(seq)
+        segment.offsets.append(offset)
+        segment.timestamps.append(str(record.get("created_at", "")))
+        segment.types.append(str(record.get("type", "")))
+        event_id = record.get("event_id")
+        if event_id:
+            self._by_id[str(event_id)] = seq
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, event: dict[str, Any]) -> int:
+        """Append ``event`` and return its sequence number."""
+        with self._lock, self._dir_lock():
+            self._catch_up()
+            seq = self._last_seq + 1
+            record = {"seq": seq, **event}
+            line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or (segment.size and segment.size + len(line) > self.segment_bytes):
+                segment = self._roll(seq)
+
+            handle = self._writer(segment)
+            handle.write(line)
+            handle.flush()
+            self._index_record(segment, record, segment.size)
+            segment.size += len(line)
+            self._last_seq = seq
+            return seq
+
+    @contextlib.contextmanager
+    def _dir_lock(self):
+        """Serialize appends from other processes sharing this directory."""
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = (self.directory / ".lock").open("a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _catch_up(self, repair: bool = True) -> None:
+        """Index what other processes appended, rolled or dropped since we last looked.
+
+        Only the unseen tail of the active segment and segments created since
+        are read, so this costs O(new records), not O(log).
+        """
+        on_disk = self._segment_paths()
+        if not self._segments:
+            if on_disk:
+                self._close_handle()
+                self._open(repair)
+            return
+        active = self._segments[-1]
+        try:
+            size = active.path.stat().st_size
+        except FileNotFoundError:
+            size = -1
+        if size < active.size:
+            # Truncated or dropped under us: rare enough to rebuild from scratch.
+            self._close_handle()
+            self._open(repair)
+            return
+
+        # Segments listed above were rolled after the active one was sealed, so
+        # finishing the active tail first cannot miss records.
+        self._index_segment(active, repair)
+        for first_seq, path in on_disk:
+            if first_seq > active.first_seq:
+                segment = _Segment(path=path, first_seq=first_seq)
+                self._index_segment(segment, repair)
+                self._segments.append(segment)
+
+        # Drop segments another process removed for retention.
+        present = {path for _, path in on_disk}
+        while len(self._segments) > 1 and self._segments[0].path not in present:
+            dropped = self._segments.pop(0)
+            self._by_id = {eid: seq for eid, seq in self._by_id.items() if seq > dropped.last_seq}
+
+        last = self._segments[-1]
+        self._last_seq = max(self._last_seq, last.last_seq, last.first_seq - 1)
+
+    def extend(self, events: Iterable[dict[str, Any]]) -> None:
+        for event in events:
+            self.append(event)
+
+    def _roll(self, first_seq: int) -> _Segment:
+        self._close_handle()
+        segment = _Segment(
+            path=self.directory / f"{_SEGMENT_PREFIX}{first_seq:012d}{_SEGMENT_SUFFIX}",
+            first_seq=first_seq,
+        )
+        segment.path.touch(exist_ok=False)
+        self._segments.append(segment)
+        self._enforce_retention()
+        return segment
+
+    def _writer(self, segment: _Segment):
+        if self._handle is None or self._handle.name != str(segment.path):
+            self._close_handle()
+            self._handle = segment.path.open("ab")
+        return self._handle
+
+    def _close_handle(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _enforce_retention(self) -> None:
+        """Drop whole sealed segments that are over the size or age budget."""
+        cutoff = datetime.now(UTC).timestamp() - self.retention_seconds
+        total = sum(s.size for s in self._segments)
+        while len(self._segments) > 1:
+            oldest = self._segments[0]
+            too_big = total > self.retention_bytes
+            too_old = bool(oldest.timestamps) and _epoch(oldest.timestamps[-1]) < cutoff
+            if not (too_big or too_old):
+                break
+            self._segments.pop(0)
+            total -= oldest.size
+            self._by_id = {eid: seq for eid, seq in self._by_id.items() if seq > oldest.last_seq}
+            oldest.path.unlink(missing_ok=True)
+            logger.info("EventLog: dropped segment %s (retention)", oldest.path.name)
+
+    def enforce_retention(self) -> None:
+        with self._lock:
+            self._enforce_retention()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_handle()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    @property
+    def first_seq(self) -> int:
+        for segment in self._segments:
+            if segment.seqs:
+                return segment.seqs[0]
+        return self._last_seq + 1
+
+    def seq_for_id(self, event_id: str) -> int | None:
+        with self._lock:
+            self._catch_up(repair=False)
+            return self._by_id.get(event_id)
+
+    def seq_at_or_after(self, created_at: str) -> int:
+        """First seq whose ``created_at`` is >= ``created_at`` (``last_seq + 1`` if none)."""
+        with self._lock:
+            self._catch_up(repair=False)
+            segments = [s for s in self._segments if s.timestamps]
+            firsts = [s.timestamps[0] for s in segments]
+            idx = max(bisect_right(firsts, created_at) - 1, 0)
+            for segment in segments[idx:]:
+                pos = bisect_left(segment.timestamps, created_at)
+                if pos < len(segment.seqs):
+                    return segment.seqs[pos]
+            return self._last_seq + 1
+
+    def read(
+        self,
+        after_seq: int = 0,
+        limit: int = 20,
+        types: Iterable[str] | None = None,
+        before_seq: int | None = None,
+        descending: bool = False,
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """Return up to ``limit`` events with ``after_seq < seq < before_seq`` and a has_more flag.
+
+        Events come oldest first, or newest first (walking back from
+        ``before_seq``) when ``descending`` is set.
+        """
+        wanted = set(types) if types else None
+        located: list[tuple[_Segment, int]] = []
+        with self._lock:
+            # Pick up events other processes appended; no flock, so a line still
+            # being written is skipped rather than repaired.
+            self._catch_up(repair=False)
+            upper = before_seq if before_seq is not None else self._last_seq + 1
+            firsts = [s.first_seq for s in self._segments]
+            if descending:
+                idx = max(bisect_left(firsts, upper) - 1, 0)
+                segments = self._segments[idx::-1] if self._segments else []
+            else:
+                idx = max(bisect_right(firsts, after_seq) - 1, 0)
+                segments = self._segments[idx:]
+            for segment in segments:
+                lo = bisect_right(segment.seqs, after_seq)
+                hi = bisect_left(segment.seqs, upper)
+                positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+                for i in positions:
+                    if wanted is not None and segment.types[i] not in wanted:
+                        continue
+                    located.append((segment, segment.offsets[i]))
+                    if len(located) > limit:
+                        break
+                if len(located) > limit or (descending and segment.first_seq <= after_seq):
+                    break
+
+        has_more = len(located) > limit
+        events: list[dict[str, Any]] = []
+        handles: dict[Path, Any] = {}
+        try:
+            for segment, offset in located[:limit]:
+                fh = handles.get(segment.path)
+                if fh is None:
+                    try:
+                        fh = handles[segment.path] = segment.path.open("rb")
+                    except FileNotFoundError:
+                        continue  # dropped by retention after we located it
+                fh.seek(offset)
+                events.append(json.loads(fh.readline()))
+        finally:
+            for fh in handles.values():
+                fh.close()
+        return events, has_more
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "bytes": sum(s.size for s in self._segments),
+                "first_seq": self.first_seq,
+                "last_seq": self._last_seq,
+            }
+
+
+def _epoch(created_at: str) -> float:
+    try:
+        dt = datetime.fromisoformat(created_at)
+    except ValueError:
+        return float("inf")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt.timestamp()
@@ -5,7 +5,7 @@ from __future__ import annotations
 from enum import StrEnum
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class WorkerStatus(StrEnum):
@@ -44,6 +44,14 @@ class WorkerBudget(BaseModel):
     max_runtime_seconds: int = 60
     max_retries: int = 2
     max_queue_items: int = 10
+    max_concurrency: int = 2
+    # What to do when max_queue_items PENDING tasks are already queued:
+    # "reject" the new task, or "shed_lowest" to fail the lowest-priority pending task instead.
+    overflow_policy: str = "reject"
+    # Retry delay: min(cap, base * 2**(retries - 1)), randomized by +/- jitter (a fraction).
+    backoff_base_seconds: float = 5.0
+    backoff_cap_seconds: float = 300.0
+    backoff_jitter: float = 0.2
 
 
 class WorkerCircuitState(BaseModel):
@@ -51,6 +59,8 @@ class WorkerCircuitState(BaseModel):
     failure_streak: int = 0
     open_until: str | None = None
     last_error: str | None = None
+    # Once open_until passes the circuit is half-open: this task is the single probe let through.
+    probe_task_id: str | None = None
 
 
 class WorkerTask(BaseModel):
@@ -67,6 +77,17 @@ class WorkerTask(BaseModel):
     result_summary: str | None = None
     external_links: dict[str, Any] = Field(default_factory=dict)
     error_code: str | None = None
+    # Set while a dispatch cycle has the task claimed (RUNNING); an expired lease returns it to PENDING.
+    lease_owner: str | None = None
+    lease_expires_at: str | None = None
+    # Earliest time the task may be dispatched (set by retry backoff).
+    not_before: str | None = None
+    # Upstream task ids that must settle first; their result_data is injected into this payload.
+    depends_on: list[str] = Field(default_factory=list)
+    result_data: dict[str, Any] = Field(default_factory=dict)
+    # Identity of the work; enqueueing a task whose key matches an active one merges into it.
+    dedupe_key: str | None = None
+    merged_count: int = 0
     created: int = 0
     metadata: dict[str, str] = Field(default_factory=dict)
 
@@ -99,6 +120,8 @@ class WorkerNode(BaseModel):
     status: WorkerStatus = WorkerStatus.READY
     queue_depth: int = 0
     last_error: str | None = None
+    rejected_tasks: int = 0
+    shed_tasks: int = 0
 
 
 class AgentRuntimeState(BaseModel):
@@ -117,6 +140,9 @@ class AgentRuntimeState(BaseModel):
     workflow_state: dict[str, Any] = Field(default_factory=dict)
     updated_at: str
 
+    # Cached state.task_queue.TaskQueue over ``queue``; never serialized.
+    _task_queue: Any = PrivateAttr(default=None)
+
 
 def default_worker_catalog() -> list[tuple[str, str]]:
     return [
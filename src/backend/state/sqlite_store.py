@@ -0,0 +1,245 @@
+"""SQLite (WAL) backend for always-on runtime state.
+
+Tasks, approvals, events, cycles and workflow keys live in their own tables,
+one row per item, so a save only rewrites rows whose content changed since the
+last load/save. Scalar sections (active scenario, workers, budgets, circuits,
+demo artifacts, ...) are stored as JSON values in a ``meta`` table.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from state.models import AgentRuntimeState
+from state.store import JsonStateStore, StateStore
+
+# state field -> (table, id field, indexed columns copied out of the row)
+ROW_TABLES: dict[str, tuple[str, str, tuple[str, ...]]] = {
+    "queue": ("tasks", "task_id", ("worker_id", "status")),
+    "approvals": ("approvals", "approval_id", ("task_id", "decision")),
+    "event_history": ("events", "event_id", ("type", "created_at")),
+    "cycle_history": ("cycles", "cycle_id", ("trigger", "started_at")),
+}
+
+KEYED_TABLES = ("meta", "workflow")
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+class SqliteStateStore(StateStore):
+    def __init__(self, path: Path, json_path: Path | None = None) -> None:
+        super().__init__(path)
+        self.json_path = json_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._create_schema()
+        # table -> {row key -> encoded value} as last read from / written to disk.
+        self._snapshot: dict[str, dict[str, str]] = {}
+        self._bootstrapped = False
+
+    def _create_schema(self) -> None:
+        for table in KEYED_TABLES:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        for table, _, columns in ROW_TABLES.values():
+            extra = "".join(f", {col} TEXT" for col in columns)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"seq INTEGER PRIMARY KEY AUTOINCREMENT, row_id TEXT NOT NULL UNIQUE, data TEXT NOT NULL{extra})"
+            )
+            for col in columns:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table} ({col})")
+
+    # ------------------------------------------------------------------
+    # Bootstrap / migration
+    # ------------------------------------------------------------------
+
+    def _ensure_bootstrapped(self) -> None:
+        if self._bootstrapped:
+            return
+        self._bootstrapped = True
+        with self._lock:
+            has_state = self._conn.execute("SELECT 1 FROM meta LIMIT 1").fetchone() is not None
+        if has_state:
+            return
+        if self.json_path is not None and self.json_path.exists():
+            self.import_json(self.json_path)
+        else:
+            self.save(self._default_state())
+
+    def import_json(self, json_path: Path) -> AgentRuntimeState:
+        """Replace the database contents with the state held in ``json_path``."""
+        state = JsonStateStore(json_path).load()
+        self._bootstrapped = True
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in (*KEYED_TABLES, *(t for t, _, _ in ROW_TABLES.values())):
+                    self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._snapshot = {table: {} for table in (*KEYED_TABLES, *(t for t, _, _ in ROW_TABLES.values()))}
+        self.save(state)
+        return state
+
+    # ------------------------------------------------------------------
+    # Whole-state API
+    # ------------------------------------------------------------------
+
+    def load(self) -> AgentRuntimeState:
+        self._ensure_bootstrapped()
+        snapshot: dict[str, dict[str, str]] = {}
+        with self._lock:
+            data: dict[str, Any] = {}
+            for table in KEYED_TABLES:
+                rows = self._conn.execute(f"SELECT key, value FROM {table}").fetchall()
+                snapshot[table] = dict(rows)
+            for field, (table, _, _) in ROW_TABLES.items():
+                rows = self._conn.execute(f"SELECT row_id, data FROM {table} ORDER BY seq").fetchall()
+                snapshot[table] = dict(rows)
+                data[field] = [json.loads(value) for _, value in rows]
+            self._snapshot = snapshot
+
+        data.update({key: json.loads(value) for key, value in snapshot["meta"].items()})
+        data["workflow_state"] = {key: json.loads(value) for key, value in snapshot["workflow"].items()}
+        return self._hydrate_catalog(AgentRuntimeState(**data))
+
+    def save(self, state: AgentRuntimeState, sections: Iterable[str] | None = None) -> None:
+        state.updated_at = self._now()
+        wanted = set(sections) | {"updated_at"} if sections is not None else set(type(state).model_fields)
+        dumped = state.model_dump(mode="json", include=wanted)
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for field, (table, id_field, columns) in ROW_TABLES.items():
+                    if field in dumped:
+                        snapshot[table] = self._sync_rows(table, id_field, columns, dumped.pop(field))
+                if "workflow_state" in dumped:
+                    workflow = {key: _encode(value) for key, value in dumped.pop("workflow_state").items()}
+                    snapshot["workflow"] = self._sync_keyed("workflow", workflow)
+                meta = {key: _encode(value) for key, value in dumped.items()}
+                snapshot["meta"] = self._sync_keyed("meta", meta, partial=sections is not None)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._snapshot = snapshot
+
+    def _sync_rows(
+        self,
+        table: str,
+        id_field: str,
+        columns: tuple[str, ...],
+        items: list[dict[str, Any]],
+    ) -> dict[str, str]:
+        previous = self._previous(table)
+        current: dict[str, str] = {}
+        upserts: list[tuple[Any, ...]] = []
+        for item in items:
+            encoded = _encode(item)
+            row_id = str(item.get(id_field) or "") or f"anon:{hashlib.sha1(encoded.encode()).hexdigest()}"
+            current[row_id] = encoded
+            if previous.get(row_id) != encoded:
+                upserts.append((row_id, encoded, *[_column_value(item.get(col)) for col in columns]))
+
+        if upserts:
+            cols = ", ".join(("row_id", "data", *columns))
+            marks = ", ".join("?" for _ in range(2 + len(columns)))
+            updates = ", ".join(f"{col}=excluded.{col}" for col in ("data", *columns))
+            self._conn.executemany(
+                f"INSERT INTO {table} ({cols}) VALUES ({marks}) ON CONFLICT(row_id) DO UPDATE SET {updates}",
+                upserts,
+            )
+        removed = [(row_id,) for row_id in previous.keys() - current.keys()]
+        if removed:
+            self._conn.executemany(f"DELETE FROM {table} WHERE row_id = ?", removed)
+        return current
+
+    def _previous(self, table: str) -> dict[str, str]:
+        """Rows last seen on disk; read from the database if this process has not loaded yet."""
+        if table not in self._snapshot:
+            key_col, value_col = ("key", "value") if table in KEYED_TABLES else ("row_id", "data")
+            rows = self._conn.execute(f"SELECT {key_col}, {value_col} FROM {table}").fetchall()
+            self._snapshot[table] = dict(rows)
+        return self._snapshot[table]
+
+    def _sync_keyed(self, table: str, values: dict[str, str], partial: bool = False) -> dict[str, str]:
+        previous = self._previous(table)
+        changed = [(key, value) for key, value in values.items() if previous.get(key) != value]
+        if changed:
+            self._conn.executemany(
+                f"INSERT INTO {table} (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                changed,
+            )
+        if partial:
+            return {**previous, **values}
+        removed = [(key,) for key in previous.keys() - values.keys()]
+        if removed:
+            self._conn.executemany(f"DELETE FROM {table} WHERE key = ?", removed)
+        return values
+
+    # ------------------------------------------------------------------
+    # Row-level API
+    # ------------------------------------------------------------------
+
+    def get_workflow_key(self, key: str) -> Any:
+        self._ensure_bootstrapped()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM workflow WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_workflow_key(self, key: str, value: Any) -> None:
+        self._ensure_bootstrapped()
+        encoded = _encode(value)
+        updated_at = _encode(self._now())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO workflow (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                    (key, encoded),
+                )
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('updated_at', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                    (updated_at,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if "workflow" in self._snapshot:
+                self._snapshot["workflow"][key] = encoded
+            if "meta" in self._snapshot:
+                self._snapshot["meta"]["updated_at"] = updated_at
+
+    def fingerprint(self) -> Any:
+        # data_version only moves when *another* connection commits.
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        super().close()
+
+
+def _column_value(value: Any) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
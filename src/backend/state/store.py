@@ -2,18 +2,38 @@
 
 from __future__ import annotations
 
+import contextlib
 import json
+import os
 import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 
 from state.models import AgentRuntimeState, WorkerBudget, WorkerCircuitState, WorkerNode, default_worker_catalog
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows; a single process owns the state there
+    fcntl = None
+
+STATE_BACKENDS = ("json", "sqlite")
+
+
+class StateStore(ABC):
+    """Base for runtime state backends.
+
+    ``load()``/``save()`` move the whole ``AgentRuntimeState``; the
+    workflow-key helpers let backends with row-level storage read or write a
+    single key without touching the rest of the state.
+    """
 
-class JsonStateStore:
     def __init__(self, path: Path) -> None:
         self.path = path
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = None
 
     def _now(self) -> str:
         return datetime.now(timezone.utc).isoformat()
@@ -53,6 +73,66 @@ class JsonStateStore:
         state.circuits = [circuits_by_id[wid] for wid in catalog]
         return state
 
+    @abstractmethod
+    def load(self) -> AgentRuntimeState:
+        """Return the current runtime state, bootstrapping defaults if missing."""
+
+    @abstractmethod
+    def save(self, state: AgentRuntimeState, sections: Iterable[str] | None = None) -> None:
+        """Persist ``state`` durably.
+
+        ``sections`` optionally names the ``AgentRuntimeState`` fields that
+        changed; backends that store sections separately may skip the rest.
+        """
+
+    def fingerprint(self) -> Any:
+        """Cheap token that changes whenever the backing storage is written.
+
+        Used by the write-behind cache to notice writes made outside this
+        process. ``None`` means external writes cannot be detected.
+        """
+        return None
+
+    def get_workflow_key(self, key: str) -> Any:
+        return self.load().workflow_state.get(key)
+
+    def put_workflow_key(self, key: str, value: Any) -> None:
+        state = self.load()
+        state.workflow_state[key] = value
+        self.save(state)
+
+    @contextlib.contextmanager
+    def write_lock(self):
+        """Exclusive across processes sharing this store (flock on ``<path>.lock``).
+
+        Hold it around a read-modify-write of the stored state so a write from
+        another process cannot land between the read and the write.
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = self.path.with_name(f"{self.path.name}.lock").open("a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def flush(self) -> bool:
+        """Make earlier saves visible to other processes; True if a write happened.
+
+        Backends that write through on ``save`` have nothing to do.
+        """
+        return False
+
+    def close(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class JsonStateStore(StateStore):
     def load(self) -> AgentRuntimeState:
         if not self.path.exists():
             state = self._default_state()
@@ -61,15 +141,9 @@ class JsonStateStore:
 
         data = json.loads(self.path.read_text())
         state = AgentRuntimeState(**data)
-        if not state.budgets:
-            state.budgets = [WorkerBudget(worker_id=wid) for wid, _ in default_worker_catalog()]
-        if not state.circuits:
-            state.circuits = [WorkerCircuitState(worker_id=wid) for wid, _ in default_worker_catalog()]
-        if not state.workers:
-            state.workers = [WorkerNode(worker_id=wid, label=label) for wid, label in default_worker_catalog()]
         return self._hydrate_catalog(state)
 
-    def save(self, state: AgentRuntimeState) -> None:
+    def save(self, state: AgentRuntimeState, sections: Iterable[str] | None = None) -> None:
         state.updated_at = self._now()
         content = json.dumps(state.model_dump(mode="json"), indent=2)
         with tempfile.NamedTemporaryFile(
@@ -82,3 +156,28 @@ class JsonStateStore:
             tmp.write(content)
             tmp_path = Path(tmp.name)
         tmp_path.replace(self.path)
+
+    def fingerprint(self) -> Any:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def create_state_store(path: Path, backend: str | None = None) -> StateStore:
+    """Build the configured state backend.
+
+    ``path`` is the JSON state file. The SQLite backend keeps its database next
+    to it (``runtime_state.db``, or ``AGENT_STATE_DB_PATH``) and imports the
+    JSON file on first open.
+    """
+    backend = (backend or os.environ.get("AGENT_STATE_BACKEND") or "json").strip().lower()
+    if backend == "json":
+        return JsonStateStore(path)
+    if backend == "sqlite":
+        from state.sqlite_store import SqliteStateStore
+
+        db_path = os.environ.get("AGENT_STATE_DB_PATH", "").strip()
+        return SqliteStateStore(Path(db_path) if db_path else path.with_suffix(".db"), json_path=path)
+    raise ValueError(f"Unknown AGENT_STATE_BACKEND '{backend}' (expected one of {', '.join(STATE_BACKENDS)})")
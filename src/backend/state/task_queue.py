@@ -0,0 +1,364 @@
+"""Indexed view over ``AgentRuntimeState.queue``.
+
+``state.queue`` stays the persisted form (a plain list of ``WorkerTask``
+rows); ``TaskQueue`` keeps secondary indexes next to it:
+
+* a min-heap of PENDING tasks keyed on ``(priority, created_at)`` so picking
+  the next ``k`` tasks is O(k log n) instead of filtering and sorting the list,
+* per-status buckets and per-(worker, status) counters so busy checks and
+  queue depths are O(1),
+* a second heap ordered by ``not_before`` holding PENDING tasks that are not
+  due yet (retry backoff); they move to the priority heap once due, so the
+  scheduler never scans them,
+* a dependency index: PENDING tasks whose ``depends_on`` upstreams have not
+  settled (COMPLETED/FAILED) are held out of both heaps and released when the
+  last upstream settles,
+* a ``dedupe_key`` -> task map over active tasks so an enqueue that repeats
+  pending or in-flight work merges into it instead of adding a second task.
+
+Status changes must go through :meth:`TaskQueue.set_status` to keep the
+indexes in step. The index is cached on the state object and rebuilt when the
+list is replaced or grows behind its back (e.g. after a reload).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import itertools
+import json
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime
+from typing import Any
+
+from state.models import AgentRuntimeState, TaskStatus, WorkerBudget, WorkerTask
+
+ACTIVE_STATUSES = frozenset({TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.WAITING_APPROVAL})
+SETTLED_STATUSES = frozenset({TaskStatus.COMPLETED, TaskStatus.FAILED})
+
+
+class QueueAdmissionError(Exception):
+    """A worker's queue is full and the new task was not admitted."""
+
+    code = "queue_full"
+
+    def __init__(self, worker_id: str, limit: int) -> None:
+        self.worker_id = worker_id
+        self.limit = limit
+        super().__init__(f"Worker '{worker_id}' already has {limit} pending tasks (max_queue_items).")
+
+
+def task_dedupe_key(worker_id: str, action: str, payload: dict[str, Any] | None = None) -> str:
+    """Stable key for "the same work": worker, action and the payload with keys sorted."""
+    canonical = json.dumps(
+        [worker_id, action, payload or {}],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class TaskQueue:
+    def __init__(self, tasks: list[WorkerTask]) -> None:
+        self.tasks = tasks
+        self._rebuild()
+
+    @classmethod
+    def of(cls, state: AgentRuntimeState) -> TaskQueue:
+        """Return the index for ``state.queue``, building it on first use."""
+        index = state._task_queue
+        if not isinstance(index, cls) or index.tasks is not state.queue or index._synced_len != len(state.queue):
+            index = cls(state.queue)
+            state._task_queue = index
+        return index
+
+    def _rebuild(self) -> None:
+        self._by_id: dict[str, WorkerTask] = {}
+        self._status: dict[str, TaskStatus] = {}
+        self._by_status: dict[TaskStatus, dict[str, WorkerTask]] = {status: {} for status in TaskStatus}
+        self._worker_counts: Counter[tuple[str, TaskStatus]] = Counter()
+        self._heap: list[tuple[int, str, int, str]] = []
+        self._delayed: list[tuple[float, int, str]] = []
+        self._in_heap: dict[str, int] = {}
+        self._counter = itertools.count()
+        # task_id -> upstream ids still unsettled, and upstream id -> waiting task ids.
+        self._waiting_on: dict[str, set[str]] = {}
+        self._dependents: dict[str, set[str]] = {}
+        # Task ids released by an upstream settling, drained by pop_unblocked().
+        self._unblocked: list[str] = []
+        # dedupe_key -> task_id, active tasks only.
+        self._by_key: dict[str, str] = {}
+        # Index everything before scheduling so dependencies resolve regardless of list order.
+        for task in self.tasks:
+            self._index(task, schedule=False)
+        for task in self._by_status[TaskStatus.PENDING].values():
+            self._push(task)
+        self._synced_len = len(self.tasks)
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _index(self, task: WorkerTask, schedule: bool = True) -> None:
+        previous = self._by_id.get(task.task_id)
+        if previous is not None:
+            self._unindex(previous)
+        status = TaskStatus(task.status)
+        self._by_id[task.task_id] = task
+        self._status[task.task_id] = status
+        self._by_status[status][task.task_id] = task
+        self._worker_counts[(task.worker_id, status)] += 1
+        self._index_key(task, status)
+        if status == TaskStatus.PENDING and schedule:
+            self._push(task)
+        elif status in SETTLED_STATUSES and schedule:
+            self._release_dependents(task.task_id)
+
+    def _unindex(self, task: WorkerTask) -> None:
+        status = self._status.pop(task.task_id)
+        self._by_id.pop(task.task_id, None)
+        self._by_status[status].pop(task.task_id, None)
+        self._worker_counts[(task.worker_id, status)] -= 1
+        self._in_heap.pop(task.task_id, None)
+        self._waiting_on.pop(task.task_id, None)
+        if task.dedupe_key and self._by_key.get(task.dedupe_key) == task.task_id:
+            del self._by_key[task.dedupe_key]
+
+    def _index_key(self, task: WorkerTask, status: TaskStatus) -> None:
+        if not task.dedupe_key:
+            return
+        if status in ACTIVE_STATUSES:
+            self._by_key.setdefault(task.dedupe_key, task.task_id)
+        elif self._by_key.get(task.dedupe_key) == task.task_id:
+            del self._by_key[task.dedupe_key]
+
+    def _push(self, task: WorkerTask, now: float | None = None) -> None:
+        unmet = {
+            dep for dep in task.depends_on
+            if dep in self._status and self._status[dep] not in SETTLED_STATUSES
+        }
+        if unmet:
+            self._in_heap.pop(task.task_id, None)
+            self._waiting_on[task.task_id] = unmet
+            for dep in unmet:
+                self._dependents.setdefault(dep, set()).add(task.task_id)
+            return
+        self._waiting_on.pop(task.task_id, None)
+        token = next(self._counter)
+        self._in_heap[task.task_id] = token
+        due = _epoch(task.not_before)
+        if due > (time.time() if now is None else now):
+            heapq.heappush(self._delayed, (due, token, task.task_id))
+        else:
+            heapq.heappush(self._heap, (task.priority, task.created_at, token, task.task_id))
+        if len(self._heap) + len(self._delayed) > 2 * len(self._in_heap) + 64:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop stale heap entries left behind by lazy deletion."""
+        self._heap = [entry for entry in self._heap if self._in_heap.get(entry[3]) == entry[2]]
+        heapq.heapify(self._heap)
+        self._delayed = [entry for entry in self._delayed if self._in_heap.get(entry[2]) == entry[1]]
+        heapq.heapify(self._delayed)
+
+    def _release_dependents(self, upstream_id: str) -> None:
+        for task_id in self._dependents.pop(upstream_id, ()):
+            waiting = self._waiting_on.get(task_id)
+            if waiting is None:
+                continue
+            waiting.discard(upstream_id)
+            if not waiting:
+                del self._waiting_on[task_id]
+                task = self._by_id.get(task_id)
+                if task is not None and self._status.get(task_id) == TaskStatus.PENDING:
+                    self._push(task)
+                    self._unblocked.append(task_id)
+
+    def _promote_due(self, now: float) -> None:
+        while self._delayed and self._delayed[0][0] <= now:
+            _, token, task_id = heapq.heappop(self._delayed)
+            if self._in_heap.get(task_id) != token:
+                continue
+            task = self._by_id[task_id]
+            self._push(task, now=now)
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(self, task: WorkerTask) -> WorkerTask:
+        self.tasks.append(task)
+        self._synced_len += 1
+        self._index(task)
+        return task
+
+    def set_status(self, task: WorkerTask, status: TaskStatus) -> None:
+        current = self._status.get(task.task_id)
+        task.status = status
+        if current is None:
+            self._index(task)
+            return
+        if current != status:
+            self._by_status[current].pop(task.task_id, None)
+            self._by_status[status][task.task_id] = task
+            self._worker_counts[(task.worker_id, current)] -= 1
+            self._worker_counts[(task.worker_id, status)] += 1
+            self._status[task.task_id] = status
+            if current == TaskStatus.PENDING:
+                self._in_heap.pop(task.task_id, None)
+                self._waiting_on.pop(task.task_id, None)
+            self._index_key(task, status)
+            if status in SETTLED_STATUSES:
+                self._release_dependents(task.task_id)
+        if status == TaskStatus.PENDING and task.task_id not in self._in_heap:
+            self._push(task)
+
+    def admit(self, task: WorkerTask, budget: WorkerBudget | None) -> WorkerTask | None:
+        """Add ``task`` if its worker has room under ``budget.max_queue_items``.
+
+        When the worker is full, ``overflow_policy="shed_lowest"`` fails the
+        lowest-priority pending task (if it ranks below ``task``) to make room
+        and returns it; otherwise :class:`QueueAdmissionError` is raised.
+        """
+        if budget is None or self.depth(task.worker_id, statuses=(TaskStatus.PENDING,)) < budget.max_queue_items:
+            self.add(task)
+            return None
+        if budget.overflow_policy == "shed_lowest":
+            victim = max(
+                (t for t in self._by_status[TaskStatus.PENDING].values() if t.worker_id == task.worker_id),
+                key=lambda t: (t.priority, t.created_at),
+                default=None,
+            )
+            if victim is not None and (victim.priority, victim.created_at) > (task.priority, task.created_at):
+                self.set_status(victim, TaskStatus.FAILED)
+                victim.error_code = "shed"
+                victim.result_summary = f"Shed to admit higher-priority task {task.task_id}"
+                self.add(task)
+                return victim
+        raise QueueAdmissionError(task.worker_id, budget.max_queue_items)
+
+    def merge_duplicate(self, task: WorkerTask) -> WorkerTask | None:
+        """Fold ``task`` into the active task with the same ``dedupe_key``, if there is one.
+
+        The existing task keeps its id and place; it takes the higher of the two
+        priorities and counts the merge. Returns the existing task, or ``None``
+        when ``task`` is new work and should be added.
+        """
+        task_id = self._by_key.get(task.dedupe_key) if task.dedupe_key else None
+        existing = self._by_id.get(task_id) if task_id else None
+        if existing is None or existing.task_id == task.task_id:
+            return None
+        existing.merged_count += 1
+        existing.updated_at = task.updated_at
+        if task.priority < existing.priority:
+            existing.priority = task.priority
+            if self._status[existing.task_id] == TaskStatus.PENDING and existing.task_id in self._in_heap:
+                self._push(existing)  # re-keys the heap entry; the old one goes stale
+        return existing
+
+    def requeue(self, task: WorkerTask) -> None:
+        """Put a task taken with :meth:`take_pending` but not started back in line."""
+        self.set_status(task, TaskStatus.PENDING)
+
+    def retain(self, keep: Callable[[WorkerTask], bool]) -> None:
+        """Drop tasks for which ``keep`` is false (in place; O(n), meant for re-seeding)."""
+        self.tasks[:] = [task for task in self.tasks if keep(task)]
+        self._rebuild()
+
+    def take_pending(
+        self,
+        limit: int,
+        skip: Callable[[WorkerTask], bool] | None = None,
+        now: float | None = None,
+    ) -> list[WorkerTask]:
+        """Pop up to ``limit`` due PENDING tasks in ``(priority, created_at)`` order.
+
+        Taken tasks stay PENDING until the caller moves them on with
+        :meth:`set_status`, or hands them back with :meth:`requeue`. Tasks for
+        which ``skip`` returns true are passed over (and stay queued) without
+        counting towards ``limit``. Tasks whose ``not_before`` is after ``now``
+        are not considered.
+        """
+        now = time.time() if now is None else now
+        self._promote_due(now)
+        taken: list[WorkerTask] = []
+        skipped: list[WorkerTask] = []
+        while self._heap and len(taken) < limit:
+            _, _, token, task_id = heapq.heappop(self._heap)
+            if self._in_heap.get(task_id) != token:
+                continue
+            del self._in_heap[task_id]
+            task = self._by_id[task_id]
+            if task.status != TaskStatus.PENDING:
+                # Status was changed without going through set_status; resync it.
+                self._index(task)
+                continue
+            if task.not_before and _epoch(task.not_before) > now:
+                self._push(task, now=now)  # moves it to the delayed heap
+                continue
+            if skip is not None and skip(task):
+                skipped.append(task)
+                continue
+            taken.append(task)
+        for task in skipped:
+            self._push(task, now=now)
+        return taken
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def pop_unblocked(self) -> list[str]:
+        """Task ids that became schedulable because an upstream settled since the last call."""
+        unblocked, self._unblocked = self._unblocked, []
+        return unblocked
+
+    def has_dependents(self, task_id: str) -> bool:
+        return bool(self._dependents.get(task_id))
+
+    def upstream(self, task: WorkerTask) -> list[WorkerTask]:
+        return [self._by_id[dep] for dep in task.depends_on if dep in self._by_id]
+
+    def next_due(self) -> float | None:
+        """Epoch seconds at which the earliest delayed task becomes due, if any."""
+        while self._delayed:
+            due, token, task_id = self._delayed[0]
+            if self._in_heap.get(task_id) == token:
+                return due
+            heapq.heappop(self._delayed)
+        return None
+
+    def get(self, task_id: str) -> WorkerTask | None:
+        return self._by_id.get(task_id)
+
+    def find_by_key(self, dedupe_key: str) -> WorkerTask | None:
+        """The active task holding ``dedupe_key``, if any."""
+        task_id = self._by_key.get(dedupe_key)
+        return self._by_id.get(task_id) if task_id else None
+
+    def with_status(self, status: TaskStatus) -> Iterator[WorkerTask]:
+        return iter(list(self._by_status[status].values()))
+
+    def count(self, *statuses: TaskStatus) -> int:
+        return sum(len(self._by_status[status]) for status in statuses)
+
+    def depth(self, worker_id: str | None = None, statuses: Iterable[TaskStatus] = ACTIVE_STATUSES) -> int:
+        """Number of tasks in ``statuses`` (default: active), overall or for one worker."""
+        if worker_id is None:
+            return self.count(*statuses)
+        return sum(self._worker_counts[(worker_id, status)] for status in statuses)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
+def _epoch(value: str | None) -> float:
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return 0.0
@@ -0,0 +1,279 @@
+"""In-memory write-behind cache in front of a StateStore.
+
+The always-on master owns runtime state within a process, so it keeps a single
+authoritative ``AgentRuntimeState`` in memory and only flushes it to the
+backing store after a short debounce window (or once the oldest unflushed
+change reaches ``max_dirty_age``). A burst of events therefore costs a handful
+of disk writes instead of one full rewrite per event.
+
+Writes made to the backing store by someone else (another worker process,
+tests resetting the file, an operator editing it) are detected through
+``StateStore.fingerprint()`` and merged three-way into the in-memory state,
+against a snapshot taken at the last sync: a section changed on one side
+only takes that side's version, and list sections keyed by id (queue,
+approvals, cycle and event history) changed on both sides are merged item by
+item, so neither side's tasks or events are lost. Any other section changed
+on both sides takes the external version. A flush holds the backing store's
+cross-process ``write_lock()`` from that check through the write, so two
+processes flushing at once cannot overwrite each other's changes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from state.event_log import RECENT_EVENT_WINDOW
+from state.models import AgentRuntimeState
+from state.store import StateStore
+
+logger = logging.getLogger(__name__)
+
+ALL_SECTIONS = frozenset(AgentRuntimeState.model_fields)
+
+# List sections merged item by item on an external write: section -> (id field, version field).
+# When both sides changed an item, the one with the greater version wins (ties keep ours).
+_KEYED_SECTIONS: dict[str, tuple[str, str | None]] = {
+    "queue": ("task_id", "updated_at"),
+    "approvals": ("approval_id", "resolved_at"),
+    "cycle_history": ("cycle_id", "finished_at"),
+    "event_history": ("event_id", None),
+}
+# Merged histories are re-sorted by this field and trimmed to the window their writers keep.
+_HISTORY_ORDER: dict[str, tuple[str, int]] = {
+    "cycle_history": ("started_at", 50),
+    "event_history": ("created_at", RECENT_EVENT_WINDOW),
+}
+
+
+def _field(item: Any, name: str) -> Any:
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+
+class WriteBehindStateStore(StateStore):
+    def __init__(
+        self,
+        inner: StateStore,
+        flush_delay: float | None = None,
+        max_dirty_age: float | None = None,
+    ) -> None:
+        super().__init__(inner.path)
+        self.inner = inner
+        self.flush_delay = (
+            flush_delay
+            if flush_delay is not None
+            else float(os.environ.get("AGENT_STATE_FLUSH_DELAY", "0.5"))
+        )
+        self.max_dirty_age = (
+            max_dirty_age
+            if max_dirty_age is not None
+            else float(os.environ.get("AGENT_STATE_MAX_DIRTY_AGE", "2.0"))
+        )
+        self._lock = threading.RLock()
+        self._state: AgentRuntimeState | None = None
+        self._fingerprint: Any = None
+        # Per-section copies of the state as of the last sync with the backing
+        # store (merge base); a flush refreshes only the sections it wrote.
+        self._base: dict[str, Any] = {}
+        self._dirty: set[str] = set()
+        self._dirty_since: float | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_loop: asyncio.AbstractEventLoop | None = None
+        self._stats = {"saves": 0, "flushes": 0, "external_reloads": 0, "merges": 0}
+
+    # ------------------------------------------------------------------
+    # StateStore API
+    # ------------------------------------------------------------------
+
+    def load(self) -> AgentRuntimeState:
+        with self._lock:
+            if self._state is None:
+                self._reload()
+            elif self._changed_externally():
+                self._stats["external_reloads"] += 1
+                if self._dirty:
+                    self._merge_external()
+                else:
+                    self._reload()
+            return self._state
+
+    def save(self, state: AgentRuntimeState, sections: Iterable[str] | None = None) -> None:
+        with self._lock:
+            # An external write since the caller loaded is merged in on flush.
+            state.updated_at = self._now()
+            self._state = state
+            self._stats["saves"] += 1
+            self._mark_dirty(sections)
+            self._schedule_flush()
+
+    def get_workflow_key(self, key: str) -> Any:
+        return self.load().workflow_state.get(key)
+
+    def put_workflow_key(self, key: str, value: Any) -> None:
+        with self._lock:
+            state = self.load()
+            state.workflow_state[key] = value
+            self.save(state, sections={"workflow_state"})
+
+    def fingerprint(self) -> Any:
+        return self.inner.fingerprint()
+
+    def close(self) -> None:
+        self.flush()
+        self.inner.close()
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def flush(self) -> bool:
+        """Write dirty state through to the backing store now. Returns True if a write happened."""
+        with self._lock:
+            self._cancel_timer()
+            if not self._dirty or self._state is None:
+                return False
+            # Held from the external-change check through the write, across processes.
+            with self.inner.write_lock():
+                if self._changed_externally():
+                    # Someone else wrote the backing store since our last sync; fold
+                    # their changes in rather than clobbering them.
+                    self._stats["external_reloads"] += 1
+                    self._merge_external()
+                sections = None if self._dirty >= ALL_SECTIONS else set(self._dirty)
+                self.inner.save(self._state, sections=sections)
+                self._fingerprint = self.inner.fingerprint()
+            self._snapshot(self._dirty)
+            self._clear_dirty()
+            self._stats["flushes"] += 1
+            return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "dirty_sections": sorted(self._dirty),
+                "dirty_age_ms": int((time.monotonic() - self._dirty_since) * 1000) if self._dirty_since else 0,
+                "flush_delay_seconds": self.flush_delay,
+                "max_dirty_age_seconds": self.max_dirty_age,
+            }
+
+    def _reload(self) -> None:
+        self._fingerprint = self.inner.fingerprint()
+        self._state = self.inner.load()
+        self._base = {}
+        self._snapshot(ALL_SECTIONS)
+        self._clear_dirty()
+
+    def _snapshot(self, sections: Iterable[str]) -> None:
+        for section in sections:
+            self._base[section] = copy.deepcopy(getattr(self._state, section))
+
+    def _merge_external(self) -> None:
+        """Fold the backing store's newer state into ``self._state`` in place, keeping unflushed changes."""
+        self._fingerprint = self.inner.fingerprint()
+        theirs = self.inner.load()
+        ours = self._state
+        for section in ALL_SECTIONS:
+            mine, other = getattr(ours, section), getattr(theirs, section)
+            original = self._base.get(section)
+            if other == original:
+                continue  # unchanged there
+            # Their version is the new base; ours may now share ``other``, so keep a copy.
+            self._base[section] = copy.deepcopy(other)
+            if section in self._dirty and section in _KEYED_SECTIONS and mine != original:
+                setattr(ours, section, self._merge_keyed(section, original or [], mine, other))
+            else:
+                # Changed only there, or on both sides of a plain section: the external write wins.
+                setattr(ours, section, other)
+        self._stats["merges"] += 1
+        logger.info("Runtime state changed on disk; merged with unflushed sections %s", sorted(self._dirty))
+
+    @staticmethod
+    def _merge_keyed(section: str, base: list, ours: list, theirs: list) -> list:
+        """Three-way merge by id: adds, deletes and edits on either side all survive."""
+        key, version = _KEYED_SECTIONS[section]
+        original = {_field(item, key): item for item in base}
+        mine = {_field(item, key): item for item in ours}
+        other = {_field(item, key): item for item in theirs}
+        merged = []
+        for ident, item in mine.items():
+            if ident in other:
+                their_item = other[ident]
+                if item == original.get(ident) or (
+                    version is not None
+                    and their_item != original.get(ident)
+                    and (_field(their_item, version) or "") > (_field(item, version) or "")
+                ):
+                    item = their_item
+                merged.append(item)
+            elif ident not in original:
+                merged.append(item)  # added here; otherwise deleted there
+        merged.extend(item for ident, item in other.items() if ident not in mine and ident not in original)
+        if section in _HISTORY_ORDER:
+            order, window = _HISTORY_ORDER[section]
+            merged.sort(key=lambda item: str(_field(item, order) or ""))
+            merged = merged[-window:]
+        return merged
+
+    def _changed_externally(self) -> bool:
+        current = self.inner.fingerprint()
+        return current is not None and current != self._fingerprint
+
+    def _mark_dirty(self, sections: Iterable[str] | None) -> None:
+        self._dirty |= ALL_SECTIONS if sections is None else set(sections) & ALL_SECTIONS
+        if self._dirty_since is None:
+            self._dirty_since = time.monotonic()
+
+    def _clear_dirty(self) -> None:
+        self._dirty = set()
+        self._dirty_since = None
+
+    def _schedule_flush(self) -> None:
+        if self.flush_delay <= 0:
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop in this thread (scripts, sync tests): write through.
+            self.flush()
+            return
+
+        age = time.monotonic() - (self._dirty_since or time.monotonic())
+        remaining = self.max_dirty_age - age
+        if remaining <= 0:
+            self.flush()
+            return
+
+        self._cancel_timer()
+        self._timer = loop.call_later(min(self.flush_delay, remaining), self._flush_from_timer)
+        self._timer_loop = loop
+
+    def _flush_from_timer(self) -> None:
+        self._timer = None
+        try:
+            self.flush()
+        except Exception:  # noqa: BLE001
+            logger.exception("Runtime state flush failed; will retry on next save")
+
+    def _cancel_timer(self) -> None:
+        if self._timer is None:
+            return
+        timer, loop = self._timer, self._timer_loop
+        self._timer = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            timer.cancel()
+        else:
+            loop.call_soon_threadsafe(timer.cancel)
@@ -13,11 +13,23 @@ if str(BACKEND_ROOT) not in sys.path:
 
 STATE_FILE = BACKEND_ROOT / "state" / "runtime_state.json"
 os.environ.setdefault("NEO4J_URI", "")
+os.environ.setdefault("AGENT_ANALYSIS_CACHE_PERSIST", "0")
+os.environ.setdefault("AGENT_EXTRACT_PROCESSES", "0")
+
+
+def _flush_app_state() -> None:
+    """Write out the session app's unflushed state first, so the reset below replaces it
+    instead of being merged with it."""
+    app = getattr(sys.modules.get("main"), "app", None)
+    master = getattr(getattr(app, "state", None), "always_on_master", None)
+    if master is not None:
+        master.store.flush()
 
 
 def _reset_runtime_state() -> None:
     from state.store import JsonStateStore
 
+    _flush_app_state()
     store = JsonStateStore(STATE_FILE)
     state = store._default_state()
     store.save(state)
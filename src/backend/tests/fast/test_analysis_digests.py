@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from daemon import analysis_cache
+from daemon.analysis_cache import AnalysisCache
+from pipeline import extractor
+
+SCENARIO = {"id": "scen_001", "title": "Ship the side project"}
+
+
+def _write(path, records, mode="w"):
+    with path.open(mode) as f:
+        f.writelines(json.dumps(r) + "\n" for r in records)
+
+
+def _lifelog(idx: int) -> dict:
+    return {"id": f"ll_{idx}", "ts": f"2026-03-{idx + 1:02d}T09:00:00", "text": f"entry {idx}", "tags": ["focus"]}
+
+
+def _refresh(cache: AnalysisCache) -> None:
+    cache._refresh_profile()
+    for domain in cache._stale_domains():
+        cache._extract_domain(domain)
+    cache._rebuild_data_refs()
+
+
+@pytest.fixture
+def persona_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractor, "_data_root", lambda persona_id: tmp_path)
+    (tmp_path / "persona_profile.json").write_text(json.dumps({"name": "Theo", "job": "designer"}))
+    _write(tmp_path / "lifelog.jsonl", [_lifelog(i) for i in range(6)])
+    _write(tmp_path / "transactions.jsonl", [{"id": "t1", "ts": "2026-03-02T10:00:00", "text": "$12 coffee", "tags": []}])
+    return tmp_path
+
+
+@pytest.mark.fast
+def test_appended_records_extend_the_refs_digest_and_match_a_fresh_build(persona_dir):
+    cache = AnalysisCache(persona_dir)
+    _refresh(cache)
+    refs = cache._domains["lifelog"].refs
+    before = (cache._hash_scenario_inputs(), cache._hash_action_inputs(SCENARIO))
+
+    _write(persona_dir / "lifelog.jsonl", [_lifelog(20)], mode="a")
+    cache._extract_domain("lifelog")
+    cache._rebuild_data_refs()
+
+    assert cache._domains["lifelog"].refs is refs
+    assert refs.count == 7
+    after = (cache._hash_scenario_inputs(), cache._hash_action_inputs(SCENARIO))
+    assert after[0] != before[0] and after[1] != before[1]
+
+    fresh = AnalysisCache(persona_dir)
+    _refresh(fresh)
+    assert (fresh._hash_scenario_inputs(), fresh._hash_action_inputs(SCENARIO)) == after
+
+
+@pytest.mark.fast
+def test_profile_or_scenario_change_changes_the_top_level_digest(persona_dir):
+    cache = AnalysisCache(persona_dir)
+    _refresh(cache)
+    scenario_hash = cache._hash_scenario_inputs()
+    action_hash = cache._hash_action_inputs(SCENARIO)
+
+    assert cache._hash_action_inputs({**SCENARIO, "title": "Move abroad"}) != action_hash
+
+    (persona_dir / "persona_profile.json").write_text(json.dumps({"name": "Theo", "job": "founder"}))
+    cache._profile_mtime = 0.0
+    cache._refresh_profile()
+    assert cache._hash_scenario_inputs() != scenario_hash
+    assert cache._hash_action_inputs(SCENARIO) != action_hash
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_cache_hit_hashes_digests_not_records(persona_dir, monkeypatch):
+    async def fake_actions_llm(scenario, extracted, has_llm, kg_snippets, persona_id="p05"):
+        return {"actions": [{"id": "act_1"}]}
+
+    async def no_kg(self, has_llm):
+        return []
+
+    monkeypatch.setattr(analysis_cache, "_run_actions_llm", fake_actions_llm)
+    monkeypatch.setattr(AnalysisCache, "_fetch_kg_snippets", no_kg)
+    cache = AnalysisCache(persona_dir)
+    await cache.get_actions(SCENARIO)
+
+    hashed = []
+    real_sha256 = analysis_cache._sha256
+
+    def recording_sha256(obj):
+        hashed.append(obj)
+        return real_sha256(obj)
+
+    monkeypatch.setattr(analysis_cache, "_sha256", recording_sha256)
+    actions, regenerated = await cache.get_actions(SCENARIO)
+
+    assert (actions, regenerated) == ([{"id": "act_1"}], False)
+    assert hashed
+    assert all(obj is not cache._data_refs for obj in hashed)
+    assert all(obj is not snap.raw for obj in hashed for snap in cache._domains.values())
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from daemon import analysis_cache
+from daemon.analysis_cache import AnalysisCache, AnalysisCacheRegistry
+from pipeline import extractor
+
+
+def _personas(tmp_path, *ids):
+    for pid in ids:
+        (tmp_path / f"persona_{pid}").mkdir()
+    return tmp_path
+
+
+@pytest.mark.fast
+def test_registry_builds_one_cache_per_known_persona(tmp_path):
+    registry = AnalysisCacheRegistry(_personas(tmp_path, "p01", "p02"))
+
+    p01 = registry.get("p01")
+    assert p01 is registry.get("p01")
+    assert p01.persona_id == "p01"
+    assert registry.get("p02") is not p01
+    assert registry.get("p09") is None
+    assert registry.get("../p01") is None
+
+
+@pytest.mark.fast
+def test_registry_evicts_least_recently_used_persona(tmp_path):
+    registry = AnalysisCacheRegistry(_personas(tmp_path, "p01", "p02", "p03"), max_personas=2)
+    p01 = registry.get("p01")
+    registry.get("p02")
+    registry.get("p01")
+    registry.get("p03")
+
+    assert set(registry.stats()["personas"]) == {"p01", "p03"}
+    assert registry.stats()["evicted"] == 1
+    assert registry.get("p01") is p01
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_registry_does_not_evict_a_cache_in_use(tmp_path):
+    registry = AnalysisCacheRegistry(_personas(tmp_path, "p01", "p02", "p03"), max_personas=1)
+    p01 = registry.get("p01")
+    async with p01._lock:
+        registry.get("p02")
+        assert registry.get("p01") is p01
+    registry.get("p03")
+    assert set(registry.stats()["personas"]) == {"p03"}
+
+
+@pytest.mark.fast
+def test_registry_evicts_to_stay_within_its_byte_budget(tmp_path, monkeypatch):
+    root = _personas(tmp_path, "p01", "p02", "p03")
+    for pid, posts in (("p01", 10), ("p02", 10), ("p03", 40)):
+        lines = (json.dumps({"id": f"{pid}_{i}", "text": "x" * 80}) for i in range(posts))
+        (root / f"persona_{pid}" / "social_posts.jsonl").write_text("\n".join(lines) + "\n")
+    monkeypatch.setattr(extractor, "_data_root", lambda pid: root / f"persona_{pid}")
+    registry = AnalysisCacheRegistry(root, max_personas=8, max_bytes=3000)
+
+    for pid in ("p01", "p02"):
+        registry.get(pid)._extractor.extract("social")
+    assert set(registry.stats()["personas"]) == {"p01", "p02"}
+    assert registry.stats()["bytes"] <= 3000
+
+    # p03 alone is over the budget: everything older goes, p03 itself stays.
+    registry.get("p03")._extractor.extract("social")
+    registry.get("p03")
+    assert set(registry.stats()["personas"]) == {"p03"}
+    assert registry.stats()["evicted"] == 2
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_one_personas_llm_call_does_not_block_another(tmp_path, monkeypatch):
+    registry = AnalysisCacheRegistry(_personas(tmp_path, "p01", "p02"))
+    release_p01 = asyncio.Event()
+
+    async def fake_scenario_llm(extracted, persona_id, has_llm, kg_snippets):
+        if persona_id == "p01":
+            await release_p01.wait()
+        return [{"id": f"scen_{persona_id}"}]
+
+    async def no_kg(self, has_llm):
+        return []
+
+    monkeypatch.setattr(analysis_cache, "_run_scenario_llm", fake_scenario_llm)
+    monkeypatch.setattr(AnalysisCache, "_fetch_kg_snippets", no_kg)
+
+    slow = asyncio.create_task(registry.get("p01").get_scenarios())
+    await asyncio.sleep(0)
+    fast, _ = await asyncio.wait_for(registry.get("p02").get_scenarios(), timeout=1)
+    assert fast == [{"id": "scen_p02"}]
+    assert not slow.done()
+
+    release_p01.set()
+    assert (await slow)[0] == [{"id": "scen_p01"}]
+    await registry.get("p01").get_scenarios()
+    personas = registry.stats()["personas"]
+    assert personas["p01"]["scenario_llm_calls"] == 1
+    assert personas["p01"]["scenario_hits"] == 1
+    assert personas["p02"]["scenario_llm_calls"] == 1
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_extraction_does_not_block_the_event_loop(tmp_path, monkeypatch):
+    def slow_refresh(self, changed_domains):
+        time.sleep(0.3)
+        return set()
+
+    monkeypatch.setattr(AnalysisCache, "_refresh_inputs", slow_refresh)
+    cache = AnalysisCache(tmp_path)
+    cache._scenarios = analysis_cache._ScenariosNode(scenarios=[{"id": "scen_1"}], input_hash="h")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        scenarios, regenerated = await cache.get_scenarios()
+    finally:
+        task.cancel()
+    assert (scenarios, regenerated) == ([{"id": "scen_1"}], False)
+    assert ticks >= 10
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from daemon import analysis_cache
+from daemon.analysis_cache import AnalysisCache
+from daemon.analysis_store import AnalysisNodeStore, create_analysis_store
+
+
+@pytest.mark.fast
+def test_store_round_trip_keyed_by_hash_and_model(tmp_path):
+    store = AnalysisNodeStore(tmp_path)
+    store.put("scenarios", "p05", "gpt-4o-mini", "h1", [{"id": "scen_1"}])
+
+    assert store.get("scenarios", "p05", "gpt-4o-mini", "h1") == [{"id": "scen_1"}]
+    assert store.get("scenarios", "p05", "gpt-4o-mini", "h2") is None
+    assert store.get("scenarios", "p05", "gpt-4o", "h1") is None
+    assert store.get("actions", "p05", "gpt-4o-mini", "h1") is None
+    assert AnalysisNodeStore(tmp_path).get("scenarios", "p05", "gpt-4o-mini", "h1") == [{"id": "scen_1"}]
+
+
+@pytest.mark.fast
+def test_store_evicts_least_recently_used_over_size_bound(tmp_path):
+    store = AnalysisNodeStore(tmp_path, max_bytes=10**6)
+    for idx, name in enumerate(("a", "b", "c")):
+        store.put("actions", "p05", "m", name, ["x" * 200])
+        path = store._path(store.key("actions", "p05", "m", name))
+        os.utime(path, (1000 + idx, 1000 + idx))
+    store.get("actions", "p05", "m", "a")  # refreshes a's mtime
+
+    # Room for exactly two of the three files.
+    store.max_bytes = sum(store._path(store.key("actions", "p05", "m", n)).stat().st_size for n in ("a", "c"))
+    store._evict()
+
+    assert store.get("actions", "p05", "m", "b") is None
+    assert store.get("actions", "p05", "m", "a") is not None
+    assert store.get("actions", "p05", "m", "c") is not None
+    assert store.stats()["evicted"] == 1
+
+
+@pytest.mark.fast
+def test_invalidate_clears_only_its_own_persona(tmp_path):
+    store = AnalysisNodeStore(tmp_path / "store")
+    store.put("scenarios", "p05", "m", "h1", [{"id": "scen_1"}])
+    store.put("scenarios", "p02", "m", "h1", [{"id": "scen_2"}])
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+
+    AnalysisCache(data_dir, persona_id="p05", store=store).invalidate()
+
+    assert store.get("scenarios", "p05", "m", "h1") is None
+    assert store.get("scenarios", "p02", "m", "h1") == [{"id": "scen_2"}]
+    store.clear()
+    assert store.stats()["entries"] == 0
+
+
+@pytest.mark.fast
+def test_create_analysis_store_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_ANALYSIS_CACHE_PERSIST", "0")
+    assert create_analysis_store(tmp_path) is None
+    monkeypatch.setenv("AGENT_ANALYSIS_CACHE_PERSIST", "1")
+    assert create_analysis_store(tmp_path).root == tmp_path / "analysis_cache"
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_warm_restart_serves_stored_nodes_without_llm(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_scenario_llm(extracted, persona_id, has_llm, kg_snippets):
+        calls.append("scenarios")
+        return [{"id": "scen_1", "title": f"Scenario {len(calls)}"}]
+
+    async def fake_actions_llm(scenario, extracted, has_llm, kg_snippets, persona_id):
+        calls.append("actions")
+        return {"actions": [{"id": "act_1"}]}
+
+    async def no_kg(self, has_llm):
+        return []
+
+    monkeypatch.setattr(analysis_cache, "_run_scenario_llm", fake_scenario_llm)
+    monkeypatch.setattr(analysis_cache, "_run_actions_llm", fake_actions_llm)
+    monkeypatch.setattr(AnalysisCache, "_fetch_kg_snippets", no_kg)
+    monkeypatch.setenv("LLM_MODEL", "gpt-4o-mini")
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    store_dir = tmp_path / "store"
+
+    first = AnalysisCache(data_dir, store=AnalysisNodeStore(store_dir))
+    scenarios, regenerated = await first.get_scenarios()
+    actions, _ = await first.get_actions(scenarios[0])
+    assert regenerated and calls == ["scenarios", "actions"]
+
+    # Same inputs after a restart: served from disk.
+    second = AnalysisCache(data_dir, store=AnalysisNodeStore(store_dir))
+    assert await second.get_scenarios() == (scenarios, True)
+    assert await second.get_actions(scenarios[0]) == (actions, True)
+    assert await second.get_scenarios() == (scenarios, False)
+    assert calls == ["scenarios", "actions"]
+
+    # A different model is a different key.
+    monkeypatch.setenv("LLM_MODEL", "gpt-4o")
+    third = AnalysisCache(data_dir, store=AnalysisNodeStore(store_dir))
+    await third.get_scenarios()
+    assert calls == ["scenarios", "actions", "scenarios"]
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from utils import (
+    ClientMessage,
+    TextDelta,
+    ToolError,
+    ToolResult,
+    aiter_ollama_events,
+    aiter_openai_events,
+    wrap_stream,
+)
+
+
+def _chunk(content=None, tool_calls=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+def _tool_call(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class _FakeAsyncOpenAI:
+    def __init__(self, chunks, *follow_ups):
+        self.rounds = [chunks, *follow_ups]
+        self.calls = []
+
+        async def create(**kwargs):
+            self.calls.append({**kwargs, "messages": list(kwargs["messages"])})
+            return _aiter(self.rounds[len(self.calls) - 1])
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_async_openai_events_stream_text_and_await_async_tools():
+    client = _FakeAsyncOpenAI(
+        [
+            _chunk(content="Hi"),
+            _chunk(tool_calls=[_tool_call(0, id="call_1", name="lookup", arguments='{"q": ')]),
+            _chunk(tool_calls=[_tool_call(0, arguments='"theo"}')], finish_reason="tool_calls"),
+        ]
+    )
+
+    async def lookup(q):
+        return {"found": q}
+
+    events = [
+        e
+        async for e in aiter_openai_events(
+            [ClientMessage(role="user", content="hello")],
+            system_prompt="be brief",
+            available_tools={"lookup": lookup},
+            client=client,
+        )
+    ]
+
+    assert events[0] == TextDelta(text="Hi")
+    assert events[-1] == ToolResult(tool_call_id="call_1", output={"found": "theo"})
+    assert client.calls[0]["messages"][0] == {"role": "system", "content": "be brief"}
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_async_ollama_events_stream_text():
+    chunks = [SimpleNamespace(message=SimpleNamespace(content=t)) for t in ("a", "", "b")]
+
+    class _FakeOllama:
+        async def chat(self, **kwargs):
+            return _aiter(chunks)
+
+    events = [
+        e async for e in aiter_ollama_events([ClientMessage(role="user", content="x")], host="h", model="m", client=_FakeOllama())
+    ]
+    assert events == [TextDelta(text="a"), TextDelta(text="b")]
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_wrap_stream_async_matches_sync_frames():
+    events = [TextDelta(text="Hel"), TextDelta(text="lo")]
+    sync_frames = list(wrap_stream(events))
+    async_frames = [f async for f in wrap_stream(_aiter(events))]
+
+    # Only the random message id differs.
+    assert len(async_frames) == len(sync_frames)
+    assert async_frames[1:] == sync_frames[1:]
+    assert async_frames[-1] == "data: [DONE]\n\n"
+
+
+def _two_tool_calls():
+    return [
+        _chunk(tool_calls=[_tool_call(0, id="call_kg", name="kg_lookup", arguments="{}")]),
+        _chunk(tool_calls=[_tool_call(1, id="call_cal", name="calendar", arguments="{}")], finish_reason="tool_calls"),
+    ]
+
+
+_TOOL_DEFS = [{"type": "function", "function": {"name": "kg_lookup"}}, {"type": "function", "function": {"name": "calendar"}}]
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_and_emit_in_completion_order():
+    calendar_done = asyncio.Event()
+
+    async def kg_lookup():
+        # Only finishes once calendar has run, so sequential execution would deadlock.
+        await asyncio.wait_for(calendar_done.wait(), 1)
+        return "kg"
+
+    def calendar():
+        time.sleep(0.05)
+        calendar_done.set()
+        return ["standup"]
+
+    client = _FakeAsyncOpenAI(_two_tool_calls())
+    events = [
+        e
+        async for e in aiter_openai_events(
+            [ClientMessage(role="user", content="plan")],
+            available_tools={"kg_lookup": kg_lookup, "calendar": calendar},
+            client=client,
+        )
+    ]
+
+    results = [e for e in events if isinstance(e, ToolResult)]
+    assert results == [
+        ToolResult(tool_call_id="call_cal", output=["standup"]),
+        ToolResult(tool_call_id="call_kg", output="kg"),
+    ]
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_slow_tool_times_out_without_blocking_others():
+    async def kg_lookup():
+        await asyncio.sleep(5)
+
+    async def calendar():
+        return "free"
+
+    client = _FakeAsyncOpenAI(_two_tool_calls())
+    events = [
+        e
+        async for e in aiter_openai_events(
+            [ClientMessage(role="user", content="plan")],
+            available_tools={"kg_lookup": kg_lookup, "calendar": calendar},
+            client=client,
+            tool_timeout=0.05,
+        )
+    ]
+
+    assert events[-2] == ToolResult(tool_call_id="call_cal", output="free")
+    assert events[-1] == ToolError(tool_call_id="call_kg", error="Tool 'kg_lookup' timed out after 0.05s.")
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_tool_results_feed_a_follow_up_turn():
+    client = _FakeAsyncOpenAI(_two_tool_calls(), [_chunk(content="You are free at 3."), _chunk(finish_reason="stop")])
+
+    async def kg_lookup():
+        return {"facts": 1}
+
+    events = [
+        e
+        async for e in aiter_openai_events(
+            [ClientMessage(role="user", content="plan")],
+            tool_definitions=_TOOL_DEFS,
+            available_tools={"kg_lookup": kg_lookup},
+            client=client,
+        )
+    ]
+
+    assert events[-1] == TextDelta(text="You are free at 3.")
+    assert len(client.calls) == 2
+    follow_up = client.calls[1]["messages"]
+    assert [c["id"] for c in follow_up[1]["tool_calls"]] == ["call_kg", "call_cal"]
+    assert follow_up[2] == {"role": "tool", "tool_call_id": "call_kg", "content": '{"facts": 1}'}
+    assert follow_up[3] == {"role": "tool", "tool_call_id": "call_cal", "content": "Error: Tool 'calendar' not found."}
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_last_tool_round_is_offered_no_tools():
+    client = _FakeAsyncOpenAI(_two_tool_calls(), [_chunk(content="done"), _chunk(finish_reason="stop")])
+
+    events = [
+        e
+        async for e in aiter_openai_events(
+            [ClientMessage(role="user", content="plan")],
+            tool_definitions=_TOOL_DEFS,
+            client=client,
+            max_tool_rounds=1,
+        )
+    ]
+
+    assert events[-1] == TextDelta(text="done")
+    assert client.calls[0]["tools"] == _TOOL_DEFS
+    assert client.calls[1]["tools"] is openai.NOT_GIVEN
+
+
+def _sse_parts(text):
+    return [json.loads(line[6:]) for line in text.splitlines() if line.startswith("data: {")]
+
+
+def _patch_chat(monkeypatch, retrieve):
+    from app.api.v1 import messages
+
+    prompts = []
+
+    async def fake_ollama(messages_, host, model, system_prompt=""):
+        prompts.append(system_prompt)
+        yield TextDelta(text="hello")
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(messages, "_retrieve_kg_context", retrieve)
+    monkeypatch.setattr(messages, "aiter_ollama_events", fake_ollama)
+    return prompts
+
+
+@pytest.mark.fast
+def test_chat_starts_before_slow_kg_and_proceeds_without_it(client, monkeypatch):
+    async def slow_retrieve(query, mode, intent):
+        await asyncio.sleep(2)
+        return "SLOW KG CONTEXT", "factual"
+
+    prompts = _patch_chat(monkeypatch, slow_retrieve)
+    monkeypatch.setenv("AGENT_CHAT_KG_BUDGET_MS", "50")
+
+    started = time.perf_counter()
+    r = client.post("/v1/messages", json={"messages": [{"role": "user", "content": "how much did I spend?"}]})
+    assert time.perf_counter() - started < 1.5
+
+    parts = _sse_parts(r.text)
+    assert [p["type"] for p in parts[:3]] == ["start", "data-kg-status", "data-kg-status"]
+    assert parts[1]["data"]["status"] == "retrieving"
+    assert parts[2]["data"] == {"status": "timeout", "context": False, "wait_ms": parts[2]["data"]["wait_ms"]}
+    assert parts[2]["transient"] is True
+    assert "SLOW KG CONTEXT" not in prompts[0]
+    assert r.headers["Server-Timing"].startswith('prep;desc="request prep before streaming";dur=')
+
+
+@pytest.mark.fast
+def test_chat_uses_kg_context_within_budget(client, monkeypatch):
+    routed = []
+
+    async def fast_retrieve(query, mode, intent):
+        routed.append(intent)
+        return "FAST KG CONTEXT", intent
+
+    prompts = _patch_chat(monkeypatch, fast_retrieve)
+    monkeypatch.setenv("AGENT_CHAT_KG_BUDGET_MS", "1000")
+
+    r = client.post("/v1/messages", json={"messages": [{"role": "user", "content": "how much did I spend?"}]})
+
+    parts = _sse_parts(r.text)
+    status = [p["data"] for p in parts if p["type"] == "data-kg-status"][-1]
+    assert status["status"] == "ready" and status["context"] is True
+    assert "FAST KG CONTEXT" in prompts[0]
+    # The header reports the intent retrieval was routed by.
+    assert routed == [r.headers["x-porthon-intent"]]
+    usage = next(p["data"] for p in parts if p["type"] == "data-prompt-usage")
+    assert 0 < usage["prompt_tokens"] <= usage["budget"]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from state.event_log import EventLog, append_recent
+
+
+def _event(idx: int, event_type: str = "cycle_end", created_at: str | None = None) -> dict:
+    return {
+        "event_id": f"evt_{idx}",
+        "type": event_type,
+        "payload": {"n": idx},
+        "created_at": created_at or datetime(2026, 3, 1, tzinfo=UTC).isoformat(),
+    }
+
+
+@pytest.mark.fast
+def test_event_log_keyset_reads_and_type_filter(tmp_path: Path):
+    log = EventLog(tmp_path)
+    for idx in range(10):
+        log.append(_event(idx, "cycle_end" if idx % 2 else "cycle_start"))
+
+    page, has_more = log.read(after_seq=0, limit=4)
+    assert [e["seq"] for e in page] == [1, 2, 3, 4]
+    assert has_more is True
+
+    page, has_more = log.read(after_seq=log.seq_for_id("evt_7"), limit=4)
+    assert [e["event_id"] for e in page] == ["evt_8", "evt_9"]
+    assert has_more is False
+
+    ends, _ = log.read(limit=100, types=["cycle_end"])
+    assert [e["event_id"] for e in ends] == ["evt_1", "evt_3", "evt_5", "evt_7", "evt_9"]
+
+    newest, has_more = log.read(limit=3, descending=True)
+    assert [e["event_id"] for e in newest] == ["evt_9", "evt_8", "evt_7"]
+    older, _ = log.read(limit=3, before_seq=newest[-1]["seq"], descending=True, types=["cycle_end"])
+    assert [e["event_id"] for e in older] == ["evt_5", "evt_3", "evt_1"]
+
+
+@pytest.mark.fast
+def test_event_log_rotates_reopens_and_seeks_by_time(tmp_path: Path):
+    base = datetime.now(UTC) - timedelta(hours=1)
+    log = EventLog(tmp_path, segment_bytes=400)
+    for idx in range(30):
+        log.append(_event(idx, created_at=(base + timedelta(minutes=idx)).isoformat()))
+    log.close()
+
+    reopened = EventLog(tmp_path, segment_bytes=400)
+    assert reopened.stats()["segments"] > 1
+    assert reopened.last_seq == 30
+    assert reopened.append(_event(30)) == 31
+
+    seq = reopened.seq_at_or_after((base + timedelta(minutes=12, seconds=30)).isoformat())
+    page, _ = reopened.read(after_seq=seq - 1, limit=1)
+    assert page[0]["event_id"] == "evt_13"
+
+    newest_first, _ = reopened.read(limit=100, descending=True)
+    assert [e["seq"] for e in newest_first] == list(range(31, 0, -1))
+
+
+@pytest.mark.fast
+def test_event_log_retention_drops_oldest_segments(tmp_path: Path):
+    old = (datetime.now(UTC) - timedelta(days=30)).isoformat()
+    log = EventLog(tmp_path, segment_bytes=400, retention_bytes=10_000, retention_seconds=86400)
+    for idx in range(10):
+        log.append(_event(idx, created_at=old))
+    for idx in range(10, 20):
+        log.append(_event(idx, created_at=datetime.now(UTC).isoformat()))
+
+    assert log.seq_for_id("evt_0") is None
+    assert log.first_seq > 1
+    page, _ = log.read(limit=100)
+    assert page[-1]["event_id"] == "evt_19"
+    assert all(e["created_at"] != old for e in page[1:])
+
+
+@pytest.mark.fast
+def test_event_log_readers_see_other_writers_incrementally(tmp_path: Path, monkeypatch):
+    now = datetime.now(UTC).isoformat()
+    writer = EventLog(tmp_path, segment_bytes=400)
+    writer.append(_event(0, created_at=now))
+    reader = EventLog(tmp_path, segment_bytes=400)
+    reopened = []
+    monkeypatch.setattr(EventLog, "_open", lambda self, repair=True: reopened.append(self))
+
+    for idx in range(1, 12):
+        writer.append(_event(idx, created_at=now))
+    page, _ = reader.read(limit=100)
+    assert [e["event_id"] for e in page] == [f"evt_{i}" for i in range(12)]
+    assert reader.stats()["segments"] == writer.stats()["segments"] > 1
+
+    assert reader.append(_event(12, created_at=now)) == 13
+    assert writer.append(_event(13, created_at=now)) == 14
+    assert [e["seq"] for e in reader.read(after_seq=12)[0]] == [13, 14]
+    assert reopened == []
+
+
+@pytest.mark.fast
+def test_event_log_finds_ids_other_writers_appended(tmp_path: Path):
+    now = datetime.now(UTC).isoformat()
+    writer = EventLog(tmp_path)
+    writer.append(_event(0, created_at=now))
+    reader = EventLog(tmp_path)
+    writer.append(_event(1, created_at=now))
+    assert reader.seq_for_id("evt_1") == 2
+
+
+@pytest.mark.fast
+def test_event_log_honours_an_explicit_zero(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("AGENT_EVENT_SEGMENT_BYTES", "4096")
+    log = EventLog(tmp_path, segment_bytes=0, retention_bytes=0, retention_seconds=0)
+    assert (log.segment_bytes, log.retention_bytes, log.retention_seconds) == (0, 0, 0)
+
+
+@pytest.mark.fast
+def test_event_log_reader_leaves_a_line_in_progress_alone(tmp_path: Path):
+    writer = EventLog(tmp_path)
+    writer.append(_event(0))
+    reader = EventLog(tmp_path)
+    segment = next(tmp_path.glob("events-*.jsonl"))
+    line = b'{"seq":2,"event_id":"evt_1","type":"cycle_end","created_at":"2026-03-01T00:00:00+00:00"}\n'
+    with segment.open("ab") as fh:
+        fh.write(line[:20])
+
+    assert [e["seq"] for e in reader.read(limit=10)[0]] == [1]
+    assert segment.stat().st_size > reader.stats()["bytes"]
+
+    with segment.open("ab") as fh:
+        fh.write(line[20:])
+    assert [e["seq"] for e in reader.read(limit=10)[0]] == [1, 2]
+
+
+@pytest.mark.fast
+def test_append_recent_keeps_window_in_place():
+    history: list[dict] = []
+    for idx in range(150):
+        append_recent(history, {"n": idx})
+    assert len(history) == 100
+    assert history[0]["n"] == 50
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from pipeline import extractor
+from pipeline.extractor import IncrementalExtractor
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record) + "\n"
+
+
+def _lifelog(idx: int, ts: str | None = None, tags=("focus",)) -> dict:
+    return {"id": f"ll_{idx}", "ts": ts or f"2026-03-{idx + 1:02d}T09:00:00", "text": f"entry {idx}", "tags": list(tags)}
+
+
+@pytest.fixture
+def persona_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractor, "_data_root", lambda persona_id: tmp_path)
+    return tmp_path
+
+
+@pytest.mark.fast
+def test_appended_lines_are_parsed_incrementally_and_match_full_extract(persona_dir):
+    path = persona_dir / "lifelog.jsonl"
+    path.write_text("".join(_line(_lifelog(i)) for i in range(8)))
+    inc = IncrementalExtractor("p05")
+    assert inc.extract("lifelog") == extractor.extract_lifelog("p05")
+
+    with path.open("a") as f:
+        f.write(_line(_lifelog(20, tags=("gym", "focus"))))
+    summary, raw = inc.extract("lifelog")
+
+    assert (summary, raw) == extractor.extract_lifelog("p05")
+    assert summary["recent"][0]["id"] == "ll_20"
+    assert summary["top_tags"] == {"focus": 9, "gym": 1}
+    assert inc.metrics == {"lines_parsed": 9, "full_rebuilds": 1, "incremental_reads": 1}
+
+
+@pytest.mark.fast
+def test_running_sums_and_status_counts_match_full_extract(persona_dir):
+    tx = persona_dir / "transactions.jsonl"
+    tx.write_text(_line({"id": "t1", "ts": "2026-03-02T10:00:00", "text": "$12.50 coffee", "tags": ["food"]}))
+    leads = persona_dir / "notion_leads.jsonl"
+    leads.write_text(_line({"id": "nl_1", "name": "A", "status": "Lead", "deal_size": 500}))
+    inc = IncrementalExtractor("p05")
+    inc.extract("finance")
+    inc.extract("notion_leads")
+
+    with tx.open("a") as f:
+        f.write(_line({"id": "t2", "ts": "2026-03-03T10:00:00", "text": "$1,200 rent", "tags": ["housing"]}))
+    with leads.open("a") as f:
+        f.write(_line({"id": "nl_2", "name": "B", "status": "Won", "deal_size": 900}))
+
+    assert inc.extract("finance") == extractor.extract_transactions("p05")
+    summary, _ = inc.extract("notion_leads")
+    assert summary == extractor.extract_notion_leads("p05")[0]
+    assert summary["status_counts"] == {"Lead": 1, "Won": 1}
+    assert summary["open_pipeline_value"] == 500.0
+
+
+@pytest.mark.fast
+@pytest.mark.parametrize("change", ["truncate", "rewrite", "replace"])
+def test_truncation_rewrite_or_replacement_triggers_full_rebuild(persona_dir, change):
+    path = persona_dir / "lifelog.jsonl"
+    path.write_text("".join(_line(_lifelog(i)) for i in range(4)))
+    inc = IncrementalExtractor("p05")
+    inc.extract("lifelog")
+
+    if change == "truncate":
+        path.write_text(_line(_lifelog(9)))
+    elif change == "rewrite":
+        # Same inode, longer file, different bytes before the old offset.
+        with path.open("r+") as f:
+            f.write("".join(_line(_lifelog(i + 10)) for i in range(6)))
+    else:
+        tmp = persona_dir / "lifelog.tmp"
+        tmp.write_text("".join(_line(_lifelog(i)) for i in range(4)) + _line(_lifelog(7)))
+        os.replace(tmp, path)
+
+    assert inc.extract("lifelog") == extractor.extract_lifelog("p05")
+    assert inc.metrics["full_rebuilds"] == 2
+
+
+@pytest.mark.fast
+def test_half_written_line_waits_for_the_rest(persona_dir):
+    path = persona_dir / "social_posts.jsonl"
+    record = {"id": "sp_1", "ts": "2026-03-01", "text": "shipped", "tags": []}
+    encoded = json.dumps(record)
+    path.write_text(encoded[:10])
+    inc = IncrementalExtractor("p05")
+    assert inc.extract("social") == ([], [])
+
+    with path.open("a") as f:
+        f.write(encoded[10:])
+    summary, raw = inc.extract("social")
+    assert raw == [record]
+    assert inc.metrics["full_rebuilds"] == 1
+
+
+@pytest.mark.fast
+def test_recent_entries_break_timestamp_ties_in_file_order(persona_dir):
+    path = persona_dir / "lifelog.jsonl"
+    path.write_text("".join(_line(_lifelog(i, ts="2026-03-01T09:00:00")) for i in range(7)))
+    inc = IncrementalExtractor("p05")
+    assert inc.extract("lifelog")[0]["recent"] == extractor.extract_lifelog("p05")[0]["recent"]
+
+
+@pytest.mark.fast
+def test_prime_builds_domains_on_a_process_pool_and_keeps_tailing(persona_dir):
+    (persona_dir / "lifelog.jsonl").write_text("".join(_line(_lifelog(i)) for i in range(5)))
+    tx = persona_dir / "transactions.jsonl"
+    tx.write_text(_line({"id": "t1", "ts": "2026-03-02T10:00:00", "text": "$12.50 coffee", "tags": ["food"]}))
+    inc = IncrementalExtractor("p05")
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        inc.prime({"lifelog", "finance", "conversations"}, pool)
+    assert inc.untracked({"lifelog", "finance"}) == []
+    assert inc.metrics["full_rebuilds"] == 2
+
+    with tx.open("a") as f:
+        f.write(_line({"id": "t2", "ts": "2026-03-03T10:00:00", "text": "$40 groceries", "tags": ["food"]}))
+    assert inc.extract("finance") == extractor.extract_transactions("p05")
+    assert inc.extract("lifelog") == extractor.extract_lifelog("p05")
+    assert inc.metrics["full_rebuilds"] == 2
+
+
+@pytest.mark.fast
+def test_parallel_full_extract_matches_inline(monkeypatch):
+    monkeypatch.setenv("AGENT_EXTRACT_PROCESSES", "2")
+    monkeypatch.setattr(extractor, "_extraction_pool", None)
+    try:
+        parallel = extractor.extract_persona_data("p05", parallel=True)
+        assert extractor._extraction_pool is not None
+        assert extractor._extraction_pool._mp_context.get_start_method() in {"forkserver", "spawn"}
+    finally:
+        extractor.shutdown_extraction_pool()
+    assert json.dumps(parallel, default=str) == json.dumps(extractor.extract_persona_data("p05"), default=str)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_route_extraction_runs_on_the_process_pool(monkeypatch):
+    # What the scenario/quest/action routes call; the suite otherwise runs with the pool off.
+    monkeypatch.setenv("AGENT_EXTRACT_PROCESSES", "2")
+    monkeypatch.setattr(extractor, "_extraction_pool", None)
+    try:
+        pooled = await extractor.aextract_persona_data("p05")
+        assert extractor._extraction_pool is not None
+    finally:
+        extractor.shutdown_extraction_pool()
+    assert json.dumps(pooled, default=str) == json.dumps(extractor.extract_persona_data("p05"), default=str)
+
+
+@pytest.mark.fast
+def test_broken_pool_falls_back_inline_and_is_rebuilt(monkeypatch):
+    monkeypatch.setenv("AGENT_EXTRACT_PROCESSES", "1")
+    broken = ProcessPoolExecutor(max_workers=1)
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+    monkeypatch.setattr(extractor, "_extraction_pool", broken)
+
+    result = extractor.extract_persona_data("p05", parallel=True)
+
+    assert json.dumps(result, default=str) == json.dumps(extractor.extract_persona_data("p05"), default=str)
+    assert extractor._extraction_pool is None
+    broken.shutdown()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import pytest
+
+from deepagent.workers import kg_worker
+from deepagent.workers.base import WorkerExecution
+from deepagent.workers.kg_worker import KgRetrievalCache, KgWorker, kg_insert, normalize_query
+
+
+def _execution(text="ctx"):
+    return WorkerExecution(ok=True, message="KG found 1 relevant snippets", data={"snippets": [text], "intent": "factual"})
+
+
+@pytest.mark.fast
+def test_normalize_query_ignores_case_spacing_and_trailing_punctuation():
+    assert normalize_query("  How much did I   spend last month?? ") == "how much did i spend last month"
+    assert normalize_query("How much did I spend last month") == "how much did i spend last month"
+
+
+@pytest.mark.fast
+def test_cache_hits_until_ttl_and_reports_saved_latency():
+    cache = KgRetrievalCache(max_entries=4, ttl_seconds=10)
+    key = cache.key("What did I spend?", "factual", "mix")
+    assert cache.get(key, now=0) is None
+    cache.put(key, _execution(), cost_seconds=1.5, version=cache.version, now=0)
+
+    hit = cache.get(cache.key("what did i spend", "factual", "mix"), now=5)
+    assert hit == _execution()
+    hit.data["snippets"].append("mutated")
+    assert cache.get(key, now=6).data["snippets"] == ["ctx"]
+
+    assert cache.get(key, now=11) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (2, 2, 1)
+    assert stats["hit_ratio"] == 0.5
+    assert stats["saved_seconds"] == 3.0
+
+
+@pytest.mark.fast
+def test_cache_evicts_least_recently_used():
+    cache = KgRetrievalCache(max_entries=2, ttl_seconds=60)
+    for q in ("a", "b"):
+        cache.put(cache.key(q, "factual", "mix"), _execution(q), 0.1, cache.version, now=0)
+    cache.get(cache.key("a", "factual", "mix"), now=1)
+    cache.put(cache.key("c", "factual", "mix"), _execution("c"), 0.1, cache.version, now=1)
+
+    assert cache.get(cache.key("b", "factual", "mix"), now=2) is None
+    assert cache.get(cache.key("a", "factual", "mix"), now=2) is not None
+    assert cache.stats()["evicted"] == 1
+
+
+@pytest.mark.fast
+def test_version_bump_invalidates_and_drops_in_flight_results():
+    cache = KgRetrievalCache(max_entries=4, ttl_seconds=60)
+    key = cache.key("q", "factual", "mix")
+    cache.put(key, _execution(), 0.1, cache.version, now=0)
+    started_at = cache.version
+
+    cache.bump_version()
+    assert cache.get(key, now=1) is None
+    # A retrieval that began before the KG write must not be cached.
+    cache.put(key, _execution(), 0.1, started_at, now=1)
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_kg_insert_bumps_version(monkeypatch):
+    cache = KgRetrievalCache()
+    monkeypatch.setattr(kg_worker, "_retrieval_cache", cache)
+    inserted = []
+
+    class _Rag:
+        async def ainsert(self, text):
+            inserted.append(text)
+
+    await kg_insert(_Rag(), "new record")
+    assert inserted == ["new record"]
+    assert cache.version == 1
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_search_serves_repeat_queries_from_cache(monkeypatch):
+    monkeypatch.delenv("PORTTHON_OFFLINE_MODE", raising=False)
+    monkeypatch.setattr(kg_worker, "_retrieval_cache", KgRetrievalCache())
+    monkeypatch.setattr(kg_worker, "_create_rag_instance", lambda: object())
+    calls = []
+
+    async def fake_query(self, rag, query, intent, mode):
+        calls.append(query)
+        return _execution()
+
+    monkeypatch.setattr(KgWorker, "_query_kg", fake_query)
+    worker = KgWorker()
+
+    first = await worker._search({"query": "How much did I spend last month?"})
+    second = await worker._search({"query": "how much did i spend last month"})
+
+    assert first == second
+    assert calls == ["How much did I spend last month?"]
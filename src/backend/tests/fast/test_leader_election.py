@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from deepagent.leader import LeaderElection
+from deepagent.loop import AlwaysOnMaster
+from deepagent.workers.base import WorkerExecution
+from state.models import TaskStatus
+from state.store import JsonStateStore
+from state.task_queue import TaskQueue
+from state.write_behind import WriteBehindStateStore
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+# Follower process: enqueue a task, forward the cycle to the leader, linger, shut down.
+_FOLLOWER = textwrap.dedent(
+    """
+    import asyncio, sys
+    from pathlib import Path
+    from deepagent.leader import LeaderElection
+    from deepagent.loop import AlwaysOnMaster
+
+    async def main(state_path, leader_db):
+        master = AlwaysOnMaster(state_path=Path(state_path), tick_seconds=900)
+        election = LeaderElection(Path(leader_db))
+        master.set_cycle_forwarder(election.forward)
+        await master.start(lead=False)
+        result = await master.ingest_event(
+            "user_ping",
+            {"enqueue": True, "worker_id": "kg_worker", "action": "search", "task_payload": {"from": "follower"}},
+        )
+        print(result["task_id"], flush=True)
+        await asyncio.sleep(1.0)
+        await master.stop()
+
+    asyncio.run(main(*sys.argv[1:]))
+    """
+)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_single_leader_and_failover(tmp_path: Path):
+    changes: list[bool] = []
+    first = LeaderElection(tmp_path / "leader.db", holder_id="host:1:a", ttl_seconds=10)
+    second = LeaderElection(tmp_path / "leader.db", holder_id="host:2:b", ttl_seconds=10)
+
+    async def record(leader: bool) -> None:
+        changes.append(leader)
+
+    second.on_change(record)
+    assert await first.check(now=100.0) is True
+    assert await second.check(now=101.0) is False
+    assert second.status()["leader_id"] == "host:1:a"
+    assert changes == []
+
+    # Followers forward cycle triggers; only the leader drains them.
+    second.forward("webhook")
+    second.forward("approval")
+    assert first.drain_wakeups() == ["webhook", "approval"]
+    assert first.drain_wakeups() == []
+
+    # The lease lapses without renewal: the follower takes over with a new term.
+    assert await second.check(now=111.0) is True
+    assert changes == [True]
+    assert second.status()["term"] == 2 and second.status()["transitions"] == 1
+    assert await first.check(now=112.0) is False
+
+    await second.stop()  # releases the lease
+    assert await first.check(now=113.0) is True
+    await first.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_lease_of_dead_local_process_is_taken_over(tmp_path: Path):
+    dead = LeaderElection(tmp_path / "leader.db", holder_id=f"{socket.gethostname()}:999999999:x", ttl_seconds=60)
+    assert dead.try_acquire() is True
+    live = LeaderElection(tmp_path / "leader.db", ttl_seconds=60)
+    assert await live.check() is True
+    await live.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_follower_master_forwards_cycles_until_promoted(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    forwarded: list[str] = []
+    master.set_cycle_forwarder(forwarded.append)
+    await master.start(lead=False)
+
+    result = await master.request_cycle(trigger="user_ping")
+    assert result == {"forwarded": True, "trigger": "user_ping"}
+    assert forwarded == ["user_ping"]
+    assert master._tick_task is None
+
+    await master.set_leader(True)
+    assert master._tick_task is not None
+    cycle = await master.request_cycle(trigger="user_ping")
+    assert "cycle_id" in cycle
+    assert forwarded == ["user_ping"]
+
+    await master.set_leader(False)
+    assert master._tick_task is None
+    await master.stop()
+
+
+class _RecordingKg:
+    worker_id = "kg_worker"
+
+    def __init__(self) -> None:
+        self.payloads: list[dict] = []
+
+    async def execute(self, action: str, payload: dict) -> WorkerExecution:
+        self.payloads.append(payload)
+        return WorkerExecution(ok=True, message="ok")
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_task_forwarded_by_follower_process_runs_on_leader(tmp_path: Path):
+    state_path = tmp_path / "runtime_state.json"
+    leader_db = tmp_path / "runtime_leader.db"
+    # Long flush windows on both sides: the follower's write and the leader's
+    # own unflushed changes must both survive.
+    store = WriteBehindStateStore(JsonStateStore(state_path), flush_delay=5.0, max_dirty_age=10.0)
+    master = AlwaysOnMaster(state_path=state_path, tick_seconds=900, store=store, coalesce_seconds=0)
+    kg = _RecordingKg()
+    master.dispatcher.workers = {"kg_worker": kg}
+    election = LeaderElection(leader_db, ttl_seconds=30, poll_seconds=0.05)
+
+    async def on_wakeup(triggers: list[str]) -> None:
+        for trigger in triggers:
+            await master.request_cycle(trigger=trigger)
+
+    election.on_wakeup(on_wakeup)
+    await master.start()
+    await election.start()
+    assert election.is_leader
+    note = await master.ingest_event("leader_note", {}, dispatch=False)
+    assert store.stats()["dirty_sections"]
+
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_ROOT), "AGENT_STATE_FLUSH_DELAY": "5", "AGENT_STATE_MAX_DIRTY_AGE": "10"}
+    follower = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", _FOLLOWER, str(state_path), str(leader_db),
+        cwd=str(BACKEND_ROOT), env=env, stdout=asyncio.subprocess.PIPE,
+    )
+    task_id = (await asyncio.wait_for(follower.stdout.readline(), timeout=30)).decode().strip()
+
+    task = None
+    for _ in range(100):
+        task = TaskQueue.of(store.load()).get(task_id)
+        if task is not None and task.status == TaskStatus.COMPLETED:
+            break
+        await asyncio.sleep(0.05)
+    await asyncio.wait_for(follower.wait(), timeout=30)
+
+    assert task is not None and task.status == TaskStatus.COMPLETED
+    assert kg.payloads == [{"from": "follower"}]
+
+    await election.stop()
+    await master.stop()
+    persisted = JsonStateStore(state_path).load()
+    assert persisted.queue[0].task_id == task_id
+    assert persisted.queue[0].status == TaskStatus.COMPLETED
+    assert note["event"]["event_id"] in {e["event_id"] for e in persisted.event_history}
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
 
 import pytest
 
 from deepagent.loop import AlwaysOnMaster
-from state.models import TaskStatus
+from deepagent.workers.base import WorkerExecution
+from state.models import TaskStatus, WorkerTask
+from state.task_queue import TaskQueue
 
 
 @pytest.mark.fast
@@ -106,3 +110,331 @@ async def test_facebook_publish_goes_to_approval(tmp_path: Path):
     assert resolved["decision"] == "approved"
 
     await master.stop()
+
+
+class _BlockingWorker:
+    worker_id = "kg_worker"
+
+    def __init__(self) -> None:
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def execute(self, action: str, payload: dict) -> WorkerExecution:
+        self.started.set()
+        await self.release.wait()
+        return WorkerExecution(ok=True, message="done")
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_worker_io_runs_outside_master_lock(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    worker = _BlockingWorker()
+    master.dispatcher.workers = {"kg_worker": worker}
+
+    state = master.store.load()
+    TaskQueue.of(state).add(
+        WorkerTask(task_id="task_slow", worker_id="kg_worker", action="search", created_at="x", updated_at="x")
+    )
+    master.store.save(state)
+    cycle = asyncio.create_task(master.run_cycle(trigger="slow"))
+    await asyncio.wait_for(worker.started.wait(), timeout=5)
+
+    # The cycle is blocked inside the worker; other writers must not wait on it.
+    merged = await asyncio.wait_for(master.update_workflow_key("probe", {"ok": True}), timeout=1)
+    assert merged == {"ok": True}
+    running = [t for t in master.store.load().queue if t.status == TaskStatus.RUNNING]
+    assert running and running[0].lease_owner is not None
+
+    worker.release.set()
+    result = await asyncio.wait_for(cycle, timeout=5)
+    assert result["executed_tasks"] == [running[0].task_id]
+    task = next(t for t in master.store.load().queue if t.task_id == running[0].task_id)
+    assert task.status == TaskStatus.COMPLETED
+    assert task.lease_owner is None
+
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_expired_lease_returns_task_to_pending(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    state = master.store.load()
+    claim_state = state.model_copy(deep=True)
+    TaskQueue.of(claim_state).add(
+        WorkerTask(task_id="task_1", worker_id="kg_worker", action="search", created_at="x", updated_at="x")
+    )
+    claim = master.dispatcher.claim(claim_state)
+    task = TaskQueue.of(claim_state).get("task_1")
+    assert task.status == TaskStatus.RUNNING
+
+    # Simulate the owning process dying: the lease lapses before commit.
+    task.lease_expires_at = (datetime.now(UTC) - timedelta(seconds=1)).isoformat()
+    assert master.dispatcher.reclaim_expired(claim_state) == ["task_1"]
+    assert task.status == TaskStatus.PENDING and task.lease_owner is None
+
+    # A late commit from the lost claim must not overwrite the re-queued task.
+    claim.tasks[0].result = WorkerExecution(ok=True, message="late")
+    result = master.dispatcher.commit(claim_state, claim)
+    assert result["executed_tasks"] == []
+    assert task.status == TaskStatus.PENDING
+
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_concurrent_triggers_coalesce_into_one_cycle(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900, coalesce_seconds=0.05)
+    state = master.store.load()
+    next(b for b in state.budgets if b.worker_id == "kg_worker").max_concurrency = 5
+    master.store.save(state)
+    await master.start()
+
+    results = await asyncio.gather(
+        *[
+            master.ingest_event(
+                "user_ping",
+                {"enqueue": True, "worker_id": "kg_worker", "action": "search", "task_payload": {"n": idx}},
+            )
+            for idx in range(5)
+        ]
+    )
+
+    cycle_ids = {r["cycle"]["cycle_id"] for r in results}
+    assert len(cycle_ids) == 1
+    assert results[0]["cycle"]["coalesced_triggers"] == 5
+    # Every enqueued task was claimed by the shared cycle.
+    tasks = [t for t in master.store.load().queue if "n" in t.payload]
+    assert len(tasks) == 5
+    assert all(t.status != TaskStatus.PENDING or t.retries == 1 for t in tasks)
+
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_claim_caps_running_tasks_per_worker(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    state = master.store.load().model_copy(deep=True)
+    queue = TaskQueue.of(state)
+    for idx in range(5):
+        queue.add(
+            WorkerTask(task_id=f"notion_{idx}", worker_id="notion_leads_worker", action="sync_leads", priority=1, created_at="x", updated_at="x")
+        )
+    queue.add(WorkerTask(task_id="kg", worker_id="kg_worker", action="search", priority=50, created_at="x", updated_at="x"))
+
+    claim = master.dispatcher.claim(state, max_tasks=4)
+    claimed = [c.task_id for c in claim.tasks]
+    # notion_leads_worker has max_concurrency=2, so the KG search still gets a slot.
+    assert len([c for c in claimed if c.startswith("notion_")]) == 2
+    assert "kg" in claimed
+    assert queue.count(TaskStatus.PENDING) == 3
+
+    await master.stop()
+
+
+class _FlakyWorker:
+    worker_id = "kg_worker"
+
+    def __init__(self, ok: bool) -> None:
+        self.ok = ok
+
+    async def execute(self, action: str, payload: dict) -> WorkerExecution:
+        return WorkerExecution(ok=self.ok, message="ok" if self.ok else "upstream 503")
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_failed_task_backs_off_and_half_open_circuit_probes_once(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    dispatcher = master.dispatcher
+    dispatcher.workers = {"kg_worker": _FlakyWorker(ok=False)}
+    state = master.store.load().model_copy(deep=True)
+    budget = next(b for b in state.budgets if b.worker_id == "kg_worker")
+    budget.backoff_jitter = 0
+    budget.max_concurrency = 3
+    queue = TaskQueue.of(state)
+    for idx in range(3):
+        queue.add(WorkerTask(task_id=f"t{idx}", worker_id="kg_worker", action="search", created_at=f"{idx}", updated_at="x"))
+
+    await dispatcher.dispatch_cycle(state)
+    retried = queue.get("t0")
+    assert retried.status == TaskStatus.PENDING and retried.retries == 1
+    delay = datetime.fromisoformat(retried.not_before) - datetime.now(UTC)
+    assert timedelta(seconds=3) < delay <= timedelta(seconds=budget.backoff_base_seconds)
+    # Not due yet: the next claim does not pick any of them up.
+    assert dispatcher.claim(state).tasks == []
+
+    # Third consecutive failure opened the circuit; let it lapse into half-open.
+    circuit = next(c for c in state.circuits if c.worker_id == "kg_worker")
+    assert circuit.open_until is not None
+    circuit.open_until = (datetime.now(UTC) - timedelta(seconds=1)).isoformat()
+    for task in queue.with_status(TaskStatus.PENDING):
+        queue.set_status(task, TaskStatus.RUNNING)
+        task.not_before = None
+        queue.set_status(task, TaskStatus.PENDING)
+
+    claim = dispatcher.claim(state)
+    assert len(claim.tasks) == 1
+    assert circuit.probe_task_id == claim.tasks[0].task_id
+    assert dispatcher.claim(state).tasks == []
+
+    dispatcher.workers = {"kg_worker": _FlakyWorker(ok=True)}
+    await dispatcher.execute(claim)
+    dispatcher.commit(state, claim)
+    assert circuit.open_until is None and circuit.probe_task_id is None
+    assert len(dispatcher.claim(state).tasks) == 2
+
+    await master.stop()
+
+
+class _RecordingWorker:
+    def __init__(self, worker_id: str, data: dict | None = None) -> None:
+        self.worker_id = worker_id
+        self.data = data or {}
+        self.payloads: list[dict] = []
+
+    async def execute(self, action: str, payload: dict) -> WorkerExecution:
+        self.payloads.append(payload)
+        return WorkerExecution(ok=True, message="ok", data=self.data)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_dependent_task_receives_kg_result_in_same_cycle(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    kg = _RecordingWorker("kg_worker", data={"snippets": ["ctx"]})
+    figma = _RecordingWorker("figma_worker")
+    master.dispatcher.workers = {"kg_worker": kg, "figma_worker": figma}
+    state = master.store.load().model_copy(deep=True)
+    queue = TaskQueue.of(state)
+    queue.add(WorkerTask(task_id="kg", worker_id="kg_worker", action="search", priority=50, created_at="x", updated_at="x"))
+    queue.add(
+        WorkerTask(task_id="figma", worker_id="figma_worker", action="generate_challenge", priority=1, depends_on=["kg"], created_at="x", updated_at="x")
+    )
+
+    result = await master.dispatcher.dispatch_cycle(state)
+
+    assert result["executed_tasks"] == ["kg", "figma"]
+    assert result["waves"] == 2
+    assert figma.payloads == [{"kg_context": {"snippets": ["ctx"]}}]
+    assert queue.get("kg").result_data == {"snippets": ["ctx"]}
+    assert [c.cycle_id for c in state.cycle_history].count(result["cycle_id"]) == 1
+
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_repeated_enqueue_merges_into_pending_task(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    event = {
+        "enqueue": True,
+        "worker_id": "notion_leads_worker",
+        "action": "sync_leads",
+        "task_payload": {"database_id": "db_1"},
+    }
+
+    first = await master.ingest_event("integration.notion.webhook.received", event, dispatch=False)
+    retry = await master.ingest_event("integration.notion.webhook.received", dict(event), dispatch=False)
+
+    assert first["deduplicated"] is False
+    assert retry["deduplicated"] is True and retry["task_id"] == first["task_id"]
+    tasks = [t for t in master.store.load().queue if t.worker_id == "notion_leads_worker"]
+    assert len(tasks) == 1 and tasks[0].merged_count == 1
+    assert any(e["type"] == "task_deduplicated" for e in master.store.load().event_history)
+
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_cycle_drains_more_tasks_than_the_bulkhead_allows(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    kg = _RecordingWorker("kg_worker")
+    master.dispatcher.workers = {"kg_worker": kg}
+    state = master.store.load().model_copy(deep=True)
+    next(b for b in state.budgets if b.worker_id == "kg_worker").max_concurrency = 2
+    queue = TaskQueue.of(state)
+    for idx in range(6):
+        queue.add(WorkerTask(task_id=f"kg_{idx}", worker_id="kg_worker", action="search", created_at=f"{idx}", updated_at="x"))
+
+    result = await master.dispatcher.dispatch_cycle(state)
+
+    assert sorted(result["executed_tasks"]) == [f"kg_{idx}" for idx in range(6)]
+    assert result["waves"] == 3
+    assert queue.count(TaskStatus.PENDING) == 0
+
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_bulkhead_backlog_past_the_wave_budget_requests_another_cycle(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("AGENT_DISPATCH_MAX_WAVES", "1")
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900, coalesce_seconds=0)
+    master.dispatcher.workers = {"kg_worker": _RecordingWorker("kg_worker")}
+    state = master.store.load()
+    next(b for b in state.budgets if b.worker_id == "kg_worker").max_concurrency = 2
+    queue = TaskQueue.of(state)
+    for idx in range(5):
+        queue.add(WorkerTask(task_id=f"kg_{idx}", worker_id="kg_worker", action="search", created_at=f"{idx}", updated_at="x"))
+    master.store.save(state)
+    await master.start()
+
+    first = await master.request_cycle("test")
+    assert len(first["executed_tasks"]) == 2
+    for _ in range(100):
+        if TaskQueue.of(master.store.load()).count(TaskStatus.PENDING) == 0:
+            break
+        await asyncio.sleep(0.01)
+
+    assert TaskQueue.of(master.store.load()).count(TaskStatus.PENDING) == 0
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_ingest_waits_for_its_task_past_the_per_cycle_cap(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("AGENT_DISPATCH_MAX_WAVES", "1")
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900, coalesce_seconds=0)
+    master.dispatcher.workers = {"kg_worker": _RecordingWorker("kg_worker")}
+    state = master.store.load()
+    budget = next(b for b in state.budgets if b.worker_id == "kg_worker")
+    budget.max_concurrency = budget.max_queue_items = 50
+    queue = TaskQueue.of(state)
+    for idx in range(15):
+        queue.add(WorkerTask(task_id=f"kg_{idx}", worker_id="kg_worker", action="search", priority=1, created_at=f"{idx}", updated_at="x"))
+    master.store.save(state)
+    await master.start()
+
+    # The first cycle is filled by the 15 higher-priority tasks; ours only runs in a later one.
+    result = await master.ingest_event("user_ping", {"enqueue": True, "worker_id": "kg_worker", "priority": 90})
+
+    task = TaskQueue.of(master.store.load()).get(result["task_id"])
+    assert task.status == TaskStatus.COMPLETED
+    await master.stop()
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_cycles_requested_without_the_scheduler_do_not_overlap(tmp_path: Path):
+    master = AlwaysOnMaster(state_path=tmp_path / "runtime_state.json", tick_seconds=900)
+    running = peak = 0
+    run_cycle = master._run_cycle
+
+    async def counting(trigger, coalesced):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        try:
+            return await run_cycle(trigger, coalesced)
+        finally:
+            running -= 1
+
+    master._run_cycle = counting
+    await asyncio.gather(*(master.request_cycle("test") for _ in range(3)))
+    assert peak == 1
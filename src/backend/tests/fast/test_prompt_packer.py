@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import pytest
+
+from deepagent.persona import prompt_packer
+from deepagent.persona.prompt_packer import ActionItem, count_tokens, pack_prompt, prompt_budget
+
+
+def _text(m):
+    return m["content"]
+
+
+def _history(n, words=50):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * words} for i in range(n)]
+
+
+def _base_tokens(model):
+    return pack_prompt(model, [{"role": "user", "content": "hi"}], _text, budget=10**6).usage["prompt_tokens"]
+
+
+@pytest.mark.fast
+def test_fits_budget_untouched():
+    packed = pack_prompt("gpt-4o-mini", _history(3), _text, context="a\n\nb", budget=10**6)
+    assert len(packed.messages) == 3
+    assert packed.usage["dropped_turns"] == packed.usage["dropped_snippets"] == 0
+    assert "a\n\nb" in packed.system_prompt
+    assert packed.usage["prompt_tokens"] == packed.usage["system_tokens"] + packed.usage["history_tokens"] + 3
+
+
+@pytest.mark.fast
+def test_drops_oldest_turns_before_kg_snippets():
+    model = "gpt-4o-mini"
+    budget = _base_tokens(model) + 200
+    history = _history(10)
+    packed = pack_prompt(model, history, _text, context="first snippet\n\nsecond snippet", budget=budget)
+
+    assert packed.messages == history[-len(packed.messages):]
+    assert packed.usage["dropped_turns"] > 0
+    assert packed.usage["dropped_snippets"] == 0
+    assert packed.usage["prompt_tokens"] <= budget
+
+
+@pytest.mark.fast
+def test_then_drops_lowest_ranked_snippets_then_action_details():
+    model = "gpt-4o-mini"
+    actions = [ActionItem("Call Theo", ["Rationale: x"]), ActionItem("Ship portfolio", ["Rationale: " + "detailmark " * 40])]
+    context = "TOP SNIPPET\n\n" + "LOW SNIPPET " * 60
+    history = _history(4)
+    # Exactly the size of: latest turn + top snippet + full action details.
+    budget = pack_prompt(model, history[-1:], _text, context="TOP SNIPPET", actions=actions, budget=10**6).usage[
+        "prompt_tokens"
+    ]
+
+    packed = pack_prompt(model, history, _text, context=context, actions=actions, budget=budget)
+    assert len(packed.messages) == 1
+    assert "TOP SNIPPET" in packed.system_prompt and "LOW SNIPPET" not in packed.system_prompt
+    assert packed.usage["trimmed_action_details"] == 0
+
+    no_context = pack_prompt(model, history[-1:], _text, actions=actions, budget=10**6).usage["prompt_tokens"]
+    tight = pack_prompt(model, history, _text, context=context, actions=actions, budget=no_context - 1)
+    assert tight.usage["dropped_snippets"] == 2
+    assert "02. Ship portfolio" in tight.system_prompt and "detailmark" not in tight.system_prompt
+    assert "01. Call Theo\n    Rationale: x" in tight.system_prompt
+    assert tight.usage["trimmed_action_details"] == 1
+
+
+@pytest.mark.fast
+def test_latest_turn_always_kept_and_over_budget_reported():
+    packed = pack_prompt("gpt-4o-mini", _history(3, words=500), _text, budget=10)
+    assert len(packed.messages) == 1
+    assert packed.usage["over_budget"] is True
+
+
+@pytest.mark.fast
+def test_budget_per_model_with_env_override(monkeypatch):
+    monkeypatch.delenv("AGENT_CHAT_PROMPT_TOKENS", raising=False)
+    assert prompt_budget("qwen3:8b") < prompt_budget("gpt-4o-mini")
+    assert prompt_budget("unknown-model") == prompt_packer.DEFAULT_PROMPT_BUDGET
+    monkeypatch.setenv("AGENT_CHAT_PROMPT_TOKENS", "900")
+    assert prompt_budget("gpt-4o-mini") == 900
+
+
+@pytest.mark.fast
+def test_encoder_lookup_is_cached():
+    prompt_packer.get_encoder.cache_clear()
+    count_tokens("hello", "gpt-4o-mini")
+    count_tokens("world", "gpt-4o-mini")
+    assert prompt_packer.get_encoder.cache_info().misses == 1
+
+
+@pytest.mark.fast
+def test_trimmed_history_starts_on_a_user_turn():
+    model = "gpt-4o-mini"
+    history = _history(9)
+    for extra in range(0, 400, 25):
+        packed = pack_prompt(model, history, _text, budget=_base_tokens(model) + extra)
+        assert packed.messages[0]["role"] == "user"
+        assert packed.messages == history[-len(packed.messages):]
+
+
+@pytest.mark.fast
+def test_dropping_snippets_does_not_rebuild_the_prompt_per_snippet(monkeypatch):
+    builds = []
+    real_build = prompt_packer.build_system_prompt
+
+    def counting_build(**kwargs):
+        builds.append(kwargs)
+        return real_build(**kwargs)
+
+    monkeypatch.setattr(prompt_packer, "build_system_prompt", counting_build)
+    model = "gpt-4o-mini"
+    context = "\n\n".join(f"snippet {i} " + "filler " * 20 for i in range(30))
+    packed = pack_prompt(model, _history(1), _text, context=context, budget=_base_tokens(model) + 100)
+
+    assert packed.usage["dropped_snippets"] > 20
+    assert not packed.usage["over_budget"]
+    assert len(builds) <= 3
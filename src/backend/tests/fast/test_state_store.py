@@ -1,10 +1,37 @@
 from __future__ import annotations
 
+import subprocess
+import sys
+import textwrap
 from pathlib import Path
 
 import pytest
 
-from state.store import JsonStateStore
+from state.models import TaskStatus, WorkerTask
+from state.sqlite_store import SqliteStateStore
+from state.store import JsonStateStore, create_state_store
+from state.task_queue import TaskQueue
+from state.write_behind import WriteBehindStateStore
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+# Appends tasks one flush at a time, as a worker process sharing the state file would.
+_APPENDER = textwrap.dedent(
+    """
+    import sys
+    from pathlib import Path
+    from state.models import WorkerTask
+    from state.store import JsonStateStore
+    from state.write_behind import WriteBehindStateStore
+
+    path, prefix, count = Path(sys.argv[1]), sys.argv[2], int(sys.argv[3])
+    store = WriteBehindStateStore(JsonStateStore(path), flush_delay=0)
+    for i in range(count):
+        state = store.load()
+        state.queue.append(WorkerTask(task_id=f"{prefix}{i}", worker_id="kg_worker", action="search", created_at="t", updated_at="t"))
+        store.save(state, sections={"queue"})
+    """
+)
 
 
 @pytest.mark.fast
@@ -17,3 +44,180 @@ def test_state_store_bootstraps_default_state(tmp_path: Path):
     assert len(state.budgets) == 6
     assert len(state.circuits) == 6
     assert state.active_scenario is None
+
+
+@pytest.mark.fast
+def test_create_state_store_selects_backend_from_env(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("AGENT_STATE_BACKEND", "sqlite")
+    store = create_state_store(tmp_path / "runtime_state.json")
+    assert isinstance(store, SqliteStateStore)
+    assert store.path == tmp_path / "runtime_state.db"
+    store.close()
+
+    monkeypatch.setenv("AGENT_STATE_BACKEND", "json")
+    assert isinstance(create_state_store(tmp_path / "runtime_state.json"), JsonStateStore)
+
+    monkeypatch.setenv("AGENT_STATE_BACKEND", "redis")
+    with pytest.raises(ValueError):
+        create_state_store(tmp_path / "runtime_state.json")
+
+
+@pytest.mark.fast
+def test_sqlite_store_migrates_existing_json_state(tmp_path: Path):
+    json_store = JsonStateStore(tmp_path / "runtime_state.json")
+    state = json_store.load()
+    state.workflow_state["figma_watch"] = {"enabled": True}
+    state.event_history.append({"event_id": "evt_1", "type": "cycle_end", "payload": {}, "created_at": "t"})
+    state.queue.append(
+        WorkerTask(task_id="task_1", worker_id="kg_worker", action="search", created_at="t", updated_at="t")
+    )
+    json_store.save(state)
+
+    store = SqliteStateStore(tmp_path / "runtime_state.db", json_path=tmp_path / "runtime_state.json")
+    loaded = store.load()
+
+    assert loaded.workflow_state == {"figma_watch": {"enabled": True}}
+    assert [e["event_id"] for e in loaded.event_history] == ["evt_1"]
+    assert [t.task_id for t in loaded.queue] == ["task_1"]
+    assert len(loaded.workers) == 6
+    store.close()
+
+
+@pytest.mark.fast
+def test_sqlite_store_save_only_touches_changed_rows(tmp_path: Path):
+    store = SqliteStateStore(tmp_path / "runtime_state.db")
+    state = store.load()
+    for idx in range(20):
+        state.queue.append(
+            WorkerTask(task_id=f"task_{idx}", worker_id="kg_worker", action="search", created_at="t", updated_at="t")
+        )
+    store.save(state)
+
+    state = store.load()
+    state.queue[3].status = TaskStatus.COMPLETED
+    state.queue = [t for t in state.queue if t.task_id != "task_7"]
+    before = store._conn.total_changes
+    store.save(state)
+    # one task update + one task delete + meta.updated_at
+    assert store._conn.total_changes - before == 3
+
+    reloaded = SqliteStateStore(tmp_path / "runtime_state.db").load()
+    assert len(reloaded.queue) == 19
+    assert reloaded.queue[3].status == TaskStatus.COMPLETED
+    assert [t.task_id for t in reloaded.queue][:4] == ["task_0", "task_1", "task_2", "task_3"]
+    store.close()
+
+
+@pytest.mark.fast
+def test_sqlite_store_workflow_key_roundtrip(tmp_path: Path):
+    store = SqliteStateStore(tmp_path / "runtime_state.db")
+    assert store.get_workflow_key("lead_os") is None
+
+    store.put_workflow_key("lead_os", {"pods": []})
+    assert store.get_workflow_key("lead_os") == {"pods": []}
+    assert store.load().workflow_state["lead_os"] == {"pods": []}
+    store.close()
+
+
+class _CountingStore(JsonStateStore):
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self.saves = 0
+
+    def save(self, state, sections=None) -> None:
+        self.saves += 1
+        super().save(state, sections=sections)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_write_behind_coalesces_event_burst(tmp_path: Path):
+    from deepagent.loop import AlwaysOnMaster
+
+    inner = _CountingStore(tmp_path / "runtime_state.json")
+    store = WriteBehindStateStore(inner, flush_delay=0.2, max_dirty_age=5.0)
+    master = AlwaysOnMaster(state_path=inner.path, store=store)
+    inner.saves = 0
+
+    for idx in range(50):
+        await master.ingest_event("webhook_ping", {"n": idx})
+
+    assert inner.saves <= 5
+    state = await master.get_state()
+    assert len(state["cycle_history"]) == 50
+
+    await master.stop()
+    persisted = JsonStateStore(inner.path).load()
+    assert len(persisted.cycle_history) == 50
+
+
+def _task(task_id: str, updated_at: str = "2026-03-01T00:00:00+00:00") -> WorkerTask:
+    return WorkerTask(task_id=task_id, worker_id="kg_worker", action="search", created_at=updated_at, updated_at=updated_at)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_write_behind_merges_external_writes_with_unflushed_sections(tmp_path: Path):
+    inner = JsonStateStore(tmp_path / "runtime_state.json")
+    seed = inner.load()
+    seed.queue = [_task("shared"), _task("deleted_here"), _task("deleted_there")]
+    inner.save(seed)
+
+    store = WriteBehindStateStore(inner, flush_delay=10.0, max_dirty_age=10.0)
+    state = store.load()
+    state.persona_id = "p01"
+    state.value_signals = {"momentum": 1}
+    state.queue = [t for t in state.queue if t.task_id != "deleted_here"] + [_task("added_here")]
+    store.save(state, sections={"persona_id", "value_signals", "queue"})  # still unflushed
+
+    # Another process writes meanwhile.
+    other = JsonStateStore(inner.path)
+    theirs = other.load()
+    theirs.persona_id = "p02"
+    theirs.workflow_state["from_other"] = True
+    theirs.queue = [t for t in theirs.queue if t.task_id != "deleted_there"] + [_task("added_there")]
+    next(t for t in theirs.queue if t.task_id == "shared").updated_at = "2026-03-02T00:00:00+00:00"
+    other.save(theirs)
+
+    merged = store.load()
+    assert merged is state
+    assert merged.value_signals == {"momentum": 1}
+    # Plain sections changed on both sides take the external version.
+    assert merged.persona_id == "p02"
+    assert merged.workflow_state["from_other"] is True
+    assert {t.task_id for t in merged.queue} == {"shared", "added_here", "added_there"}
+    assert TaskQueue.of(merged).get("shared").updated_at.startswith("2026-03-02")
+
+    assert store.flush() is True
+    persisted = JsonStateStore(inner.path).load()
+    assert persisted.value_signals == {"momentum": 1}
+    assert persisted.workflow_state["from_other"] is True
+    assert {t.task_id for t in persisted.queue} == {"shared", "added_here", "added_there"}
+    assert store.stats()["merges"] == 1
+
+
+@pytest.mark.fast
+def test_write_behind_processes_flushing_concurrently_lose_no_updates(tmp_path: Path):
+    path = tmp_path / "runtime_state.json"
+    JsonStateStore(path).load()
+    procs = [
+        subprocess.Popen([sys.executable, "-c", _APPENDER, str(path), prefix, "100"], cwd=str(BACKEND_ROOT))
+        for prefix in ("a", "b")
+    ]
+    assert [proc.wait(timeout=120) for proc in procs] == [0, 0]
+
+    ids = {task.task_id for task in JsonStateStore(path).load().queue}
+    assert len(ids) == 200
+
+
+@pytest.mark.fast
+def test_write_behind_flush_snapshots_only_the_sections_it_wrote(tmp_path: Path):
+    store = WriteBehindStateStore(JsonStateStore(tmp_path / "runtime_state.json"), flush_delay=0)
+    state = store.load()
+    queue_base = store._base["queue"]
+
+    state.workflow_state["k"] = 1
+    store.save(state, sections={"workflow_state"})
+
+    assert store._base["workflow_state"] == {"k": 1}
+    assert store._base["queue"] is queue_base
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+
 import pytest
 
-from deepagent.stream import StreamBroker
+from deepagent.stream import StreamBroker, create_stream_broker
+from deepagent.stream_sqlite import SqliteStreamBroker
 
 
 @pytest.mark.fast
@@ -14,7 +17,155 @@ async def test_stream_broker_publish_subscribe():
     payload = {"type": "cycle_end", "created_at": "2026-03-04T00:00:00Z"}
     await broker.publish(payload)
 
-    received = await queue.get()
-    assert received == payload
+    frame = await queue.get()
+    assert frame.event == payload
+    assert frame.seq == broker.last_seq == 1
+    assert frame.data == b'id: 1\ndata: {"type": "cycle_end", "created_at": "2026-03-04T00:00:00Z"}\n\n'
+
+    broker.unsubscribe(sid)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_replay_resumes_after_last_event_id():
+    broker = StreamBroker(buffer_size=10)
+    for idx in range(5):
+        await broker.publish({"type": "data_changed", "n": idx})
+
+    sid, queue = broker.subscribe()
+    backlog = broker.replay(3)
+    await broker.publish({"type": "cycle_end"})
 
+    assert [(f.seq, f.event["n"]) for f in backlog] == [(4, 3), (5, 4)]
+    assert (await queue.get()).seq == 6
+    assert broker.replay(6) == []
     broker.unsubscribe(sid)
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_replay_reports_gap_when_id_was_evicted_or_reset():
+    broker = StreamBroker(buffer_size=3)
+    for idx in range(6):
+        await broker.publish({"type": "data_changed", "n": idx})
+
+    backlog = broker.replay(1)
+    gap = backlog[0]
+    assert gap.type == "stream_gap"
+    assert gap.event["payload"] == {"last_event_id": 1, "oldest_available": 4, "reason": "evicted"}
+    assert gap.seq == 3 and gap.data.startswith(b"id: 3\n")
+    assert [f.seq for f in backlog[1:]] == [4, 5, 6]
+
+    # An id from a previous process (sequence restarted) is a gap too.
+    reset = broker.replay(99)
+    assert reset[0].event["payload"]["reason"] == "reset"
+    assert [f.seq for f in reset[1:]] == [4, 5, 6]
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_filtered_subscribers_share_one_encoded_frame():
+    broker = StreamBroker()
+    _, everything = broker.subscribe()
+    ends_sid, cycle_ends = broker.subscribe(types=["cycle_end"])
+    _, quest_events = broker.subscribe(quest="scen_a")
+
+    event = {"type": "cycle_end", "event_id": "abc", "payload": {"scenario_id": "scen_a"}}
+    await broker.publish(event)
+    await broker.publish({"type": "data_changed", "payload": {"scenario_id": "scen_b"}})
+
+    shared = await everything.get()
+    assert (await cycle_ends.get()).data is shared.data
+    assert (await quest_events.get()).data is shared.data
+    assert b'"event_id": "evt_abc"' in shared.data and event["event_id"] == "abc"
+    assert everything.qsize() == 1 and cycle_ends.empty() and quest_events.empty()
+
+    assert [f.type for f in broker.replay(0, sid=ends_sid)] == ["cycle_end"]
+    broker.unsubscribe(ends_sid)
+    assert "cycle_end" not in broker._by_type
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_slow_consumer_drop_oldest_and_coalesce():
+    broker = StreamBroker(queue_size=3, coalesce_types=["analysis_running"])
+    _, dropping = broker.subscribe(policy="drop_oldest")
+    _, coalescing = broker.subscribe(policy="coalesce")
+
+    for idx in range(4):
+        await broker.publish({"type": "analysis_running", "n": idx})
+    await broker.publish({"type": "data_changed"})
+
+    assert [(await dropping.get()).event.get("n") for _ in range(3)] == [2, 3, None]
+    # Only the latest analysis_running survives the backlog.
+    assert [(await coalescing.get()).event.get("n") for _ in range(2)] == [3, None]
+    assert coalescing.empty()
+
+    stats = broker.stats()
+    assert stats["dropped"] == 2
+    assert stats["coalesced"] == 3
+    assert stats["high_water"] == 3
+    assert stats["subscribers"] == 2
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_slow_consumer_disconnect_ends_with_terminal_event():
+    broker = StreamBroker(queue_size=2)
+    sid, queue = broker.subscribe(policy="disconnect")
+    await broker.publish({"type": "cycle_end"})
+    assert (await queue.get()).seq == 1
+
+    for _ in range(3):
+        await broker.publish({"type": "cycle_end"})
+
+    closed = await queue.get()
+    assert closed.type == "stream_closed" and closed.seq is None
+    assert closed.event["payload"] == {"reason": "slow_consumer", "resume_from": 1}
+    assert not closed.data.startswith(b"id:")
+    assert queue.empty()
+    assert broker.stats()["disconnected"] == 1 and broker.stats()["subscribers"] == 0
+
+    with pytest.raises(ValueError):
+        broker.subscribe(policy="block")
+
+
+@pytest.mark.fast
+@pytest.mark.asyncio
+async def test_sqlite_broker_fans_out_across_processes(tmp_path):
+    # Two brokers on one database stand in for two uvicorn workers.
+    worker_a = SqliteStreamBroker(tmp_path / "stream.db", poll_seconds=0.01)
+    worker_b = SqliteStreamBroker(tmp_path / "stream.db", poll_seconds=0.01)
+    await worker_b.start()
+    _, on_a = worker_a.subscribe()
+    _, on_b = worker_b.subscribe(types=["cycle_end"])
+
+    await worker_a.publish({"type": "cycle_end", "payload": {"n": 1}})
+    await worker_b.publish({"type": "data_changed"})
+    await worker_a.publish({"type": "cycle_end", "payload": {"n": 2}})
+
+    frame = await asyncio.wait_for(on_b.get(), timeout=2)
+    assert frame.seq == 1 and frame.event["payload"] == {"n": 1}
+    assert (await asyncio.wait_for(on_b.get(), timeout=2)).seq == 3
+    # worker_a sees worker_b's event in order once it pumps (publish pumps too).
+    assert [(await on_a.get()).seq for _ in range(3)] == [1, 2, 3]
+
+    # A client resuming on the other worker replays from the shared table.
+    fresh = SqliteStreamBroker(tmp_path / "stream.db")
+    sid, _ = fresh.subscribe()
+    assert [f.seq for f in fresh.replay(1, sid=sid)] == [2, 3]
+    assert fresh.stats()["backend"] == "sqlite"
+
+    for broker in (worker_a, worker_b, fresh):
+        await broker.close()
+
+
+@pytest.mark.fast
+def test_create_stream_broker_selects_backend(tmp_path, monkeypatch):
+    assert type(create_stream_broker(tmp_path / "runtime_state.json")) is StreamBroker
+    monkeypatch.setenv("AGENT_STREAM_BACKEND", "sqlite")
+    broker = create_stream_broker(tmp_path / "runtime_state.json")
+    assert isinstance(broker, SqliteStreamBroker)
+    assert broker.path == tmp_path / "runtime_stream.db"
+    with pytest.raises(ValueError):
+        create_stream_broker(tmp_path / "runtime_state.json", backend="redis")
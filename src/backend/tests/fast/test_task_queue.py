@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import pytest
+
+from state.models import AgentRuntimeState, TaskStatus, WorkerBudget, WorkerTask
+from state.task_queue import QueueAdmissionError, TaskQueue, task_dedupe_key
+
+
+def _task(task_id: str, worker_id: str = "kg_worker", priority: int = 50, created_at: str = "2026-01-01T00:00:00+00:00", **kwargs) -> WorkerTask:
+    return WorkerTask(
+        task_id=task_id,
+        worker_id=worker_id,
+        action="search",
+        priority=priority,
+        created_at=created_at,
+        updated_at=created_at,
+        **kwargs,
+    )
+
+
+@pytest.mark.fast
+def test_take_pending_orders_by_priority_then_created_at():
+    state = AgentRuntimeState(updated_at="")
+    queue = TaskQueue.of(state)
+    queue.add(_task("late", priority=10, created_at="2026-01-02T00:00:00+00:00"))
+    queue.add(_task("early", priority=10, created_at="2026-01-01T00:00:00+00:00"))
+    queue.add(_task("urgent", priority=1))
+    queue.add(_task("low", priority=90))
+    queue.add(_task("done", priority=0, status=TaskStatus.COMPLETED))
+
+    taken = queue.take_pending(3)
+    assert [t.task_id for t in taken] == ["urgent", "early", "late"]
+
+    # Taken tasks that were not started go back in line.
+    queue.requeue(taken[2])
+    assert [t.task_id for t in queue.take_pending(5)] == ["late", "low"]
+    assert [t.task_id for t in state.queue] == ["late", "early", "urgent", "low", "done"]
+
+
+@pytest.mark.fast
+def test_status_and_worker_indexes_follow_transitions():
+    state = AgentRuntimeState(updated_at="")
+    queue = TaskQueue.of(state)
+    a = queue.add(_task("a", worker_id="kg_worker"))
+    b = queue.add(_task("b", worker_id="kg_worker"))
+    queue.add(_task("c", worker_id="figma_worker"))
+
+    assert queue.depth("kg_worker") == 2
+    assert queue.count(TaskStatus.PENDING) == 3
+
+    queue.set_status(a, TaskStatus.RUNNING)
+    queue.set_status(b, TaskStatus.COMPLETED)
+    assert queue.depth("kg_worker") == 1
+    assert queue.count(TaskStatus.PENDING, TaskStatus.RUNNING) == 2
+    assert [t.task_id for t in queue.with_status(TaskStatus.RUNNING)] == ["a"]
+
+    # A retried task becomes schedulable again.
+    queue.set_status(a, TaskStatus.PENDING)
+    assert {t.task_id for t in queue.take_pending(10)} == {"a", "c"}
+
+    queue.retain(lambda t: t.status != TaskStatus.COMPLETED)
+    assert queue.get("b") is None
+    assert len(state.queue) == 2
+
+
+@pytest.mark.fast
+def test_index_rebuilds_after_reload_and_serializes_back():
+    state = AgentRuntimeState(updated_at="")
+    TaskQueue.of(state).add(_task("a", priority=5))
+    state.queue.append(_task("b", priority=1))  # appended without the index
+
+    queue = TaskQueue.of(state)
+    assert [t.task_id for t in queue.take_pending(2)] == ["b", "a"]
+
+    reloaded = AgentRuntimeState(**state.model_dump(mode="json"))
+    assert "_task_queue" not in state.model_dump(mode="json")
+    assert TaskQueue.of(reloaded).count(TaskStatus.PENDING) == 2
+
+
+@pytest.mark.fast
+def test_admission_rejects_or_sheds_when_worker_queue_is_full():
+    queue = TaskQueue.of(AgentRuntimeState(updated_at=""))
+    budget = WorkerBudget(worker_id="kg_worker", max_queue_items=2)
+    queue.admit(_task("a", priority=50), budget)
+    queue.admit(_task("b", priority=60), budget)
+    queue.admit(_task("other", worker_id="figma_worker"), budget=None)
+
+    with pytest.raises(QueueAdmissionError) as exc_info:
+        queue.admit(_task("c", priority=10), budget)
+    assert exc_info.value.code == "queue_full"
+
+    budget.overflow_policy = "shed_lowest"
+    shed = queue.admit(_task("c", priority=10), budget)
+    assert shed is not None and shed.task_id == "b"
+    assert shed.status == TaskStatus.FAILED and shed.error_code == "shed"
+    assert queue.depth("kg_worker", statuses=(TaskStatus.PENDING,)) == 2
+
+    # Nothing ranks below a lowest-priority newcomer, so it is still rejected.
+    with pytest.raises(QueueAdmissionError):
+        queue.admit(_task("d", priority=99), budget)
+
+
+@pytest.mark.fast
+def test_take_pending_skip_leaves_tasks_queued():
+    queue = TaskQueue.of(AgentRuntimeState(updated_at=""))
+    for idx in range(4):
+        queue.add(_task(f"notion_{idx}", worker_id="notion_leads_worker", priority=1))
+    queue.add(_task("kg", worker_id="kg_worker", priority=50))
+
+    taken = queue.take_pending(2, skip=lambda t: t.worker_id == "notion_leads_worker")
+    assert [t.task_id for t in taken] == ["kg"]
+    assert queue.count(TaskStatus.PENDING) == 5
+    assert len(queue.take_pending(10)) == 4
+
+
+@pytest.mark.fast
+def test_delayed_tasks_wait_for_not_before():
+    queue = TaskQueue.of(AgentRuntimeState(updated_at=""))
+    queue.add(_task("later", priority=1, not_before="2026-01-01T00:10:00+00:00"))
+    queue.add(_task("now", priority=50))
+    start = datetime(2026, 1, 1, tzinfo=UTC).timestamp()
+
+    assert [t.task_id for t in queue.take_pending(5, now=start)] == ["now"]
+    assert queue.next_due() == start + 600
+    assert queue.take_pending(5, now=start + 599) == []
+    assert [t.task_id for t in queue.take_pending(5, now=start + 600)] == ["later"]
+    assert queue.next_due() is None
+
+
+@pytest.mark.fast
+def test_dependents_wait_until_upstream_settles():
+    queue = TaskQueue.of(AgentRuntimeState(updated_at=""))
+    upstream = queue.add(_task("kg", priority=50))
+    queue.add(_task("figma", worker_id="figma_worker", priority=1, depends_on=["kg"]))
+    queue.add(_task("orphan", worker_id="figma_worker", priority=2, depends_on=["gone"]))
+
+    assert [t.task_id for t in queue.take_pending(5)] == ["orphan", "kg"]
+    assert queue.has_dependents("kg")
+
+    queue.set_status(upstream, TaskStatus.RUNNING)
+    assert queue.take_pending(5) == []
+    queue.set_status(upstream, TaskStatus.COMPLETED)
+    assert queue.pop_unblocked() == ["figma"]
+    assert [t.task_id for t in queue.take_pending(5)] == ["figma"]
+    assert [t.task_id for t in queue.upstream(queue.get("figma"))] == ["kg"]
+
+
+@pytest.mark.fast
+def test_dependency_index_survives_rebuild():
+    state = AgentRuntimeState(updated_at="")
+    state.queue.append(_task("figma", worker_id="figma_worker", depends_on=["kg"]))
+    state.queue.append(_task("kg"))
+
+    queue = TaskQueue.of(state)
+    assert [t.task_id for t in queue.take_pending(5)] == ["kg"]
+
+
+@pytest.mark.fast
+def test_duplicate_dedupe_key_merges_into_active_task():
+    queue = TaskQueue.of(AgentRuntimeState(updated_at=""))
+    key = task_dedupe_key("notion_leads_worker", "sync_leads", {"b": 1, "a": [1, 2]})
+    assert key == task_dedupe_key("notion_leads_worker", "sync_leads", {"a": [1, 2], "b": 1})
+    first = queue.add(_task("first", worker_id="notion_leads_worker", priority=50, dedupe_key=key))
+    queue.add(_task("other", worker_id="notion_leads_worker", priority=20))
+
+    merged = queue.merge_duplicate(_task("retry", worker_id="notion_leads_worker", priority=10, dedupe_key=key))
+    assert merged is first and first.merged_count == 1
+    # The merged task takes the higher priority and is re-ranked.
+    assert [t.task_id for t in queue.take_pending(5)] == ["first", "other"]
+
+    queue.set_status(first, TaskStatus.RUNNING)
+    assert queue.merge_duplicate(_task("again", dedupe_key=key)) is first
+    queue.set_status(first, TaskStatus.COMPLETED)
+    assert queue.find_by_key(key) is None
+    assert queue.merge_duplicate(_task("later", dedupe_key=key)) is None
@@ -16,6 +16,7 @@ os.environ["RAG_STORAGE_DIR"] = ""
 from fastapi.testclient import TestClient
 import pytest
 
+from app.api.v1.schemas import generate_id
 from main import app
 
 
@@ -245,6 +246,10 @@ def test_v1_health(client):
     assert body["object"] == "health"
     assert body["status"] == "ok"
     assert "livemode" in body
+    assert {"published", "dropped", "coalesced", "disconnected", "high_water"} <= set(body["stream"])
+    assert body["leader"]["role"] == "leader"
+    assert body["kg_cache"]["max_entries"] >= 0
+    assert body["analysis_cache"]["max_personas"] >= 1
 
 
 @pytest.mark.fast
@@ -286,6 +291,28 @@ def test_v1_workers_list(client):
         assert w["object"] == "worker"
 
 
+@pytest.mark.fast
+def test_v1_workers_report_concurrency_and_admission(client):
+    master = client.app.state.always_on_master
+    state = master.store.load()
+    for budget in state.budgets:
+        if budget.worker_id == "kg_worker":
+            budget.max_queue_items = 0
+    master.store.save(state)
+
+    r = client.post(
+        "/v1/events",
+        json={"type": "test_ping", "payload": {"enqueue": True, "worker_id": "kg_worker", "action": "search"}},
+    )
+    assert r.status_code == 429
+    assert r.json()["error"]["code"] == "queue_full"
+
+    worker = client.get("/v1/workers/wrkr_kg_worker").json()
+    assert worker["concurrency"]["limit"] == 2
+    assert worker["admission"]["max_queue_items"] == 0
+    assert worker["admission"]["rejected"] == 1
+
+
 @pytest.mark.fast
 def test_v1_workers_get_by_id(client):
     """Bug: GET /v1/workers/{id} should find a worker by its prefixed ID."""
@@ -517,6 +544,62 @@ def test_v1_events_list(client):
         assert "cycle_duration_ms" in cycle_ends[0]["payload"]
 
 
+@pytest.mark.fast
+def test_v1_events_list_keyset_cursor_and_type_filter(client):
+    _activate_scenario(client)
+    first = client.get("/v1/events", params={"limit": 2}).json()
+    assert len(first["data"]) == 2
+    assert first["has_more"] is True
+
+    nxt = client.get(
+        "/v1/events", params={"limit": 2, "starting_after": first["data"][-1]["id"]}
+    ).json()
+    assert {e["id"] for e in nxt["data"]}.isdisjoint({e["id"] for e in first["data"]})
+
+    back = client.get(
+        "/v1/events", params={"limit": 2, "ending_before": nxt["data"][0]["id"]}
+    ).json()
+    assert [e["id"] for e in back["data"]] == [e["id"] for e in first["data"]]
+
+    ends = client.get("/v1/events", params={"type": "cycle_end", "limit": 100}).json()
+    assert ends["data"]
+    assert all(e["type"] == "cycle_end" for e in ends["data"])
+
+    missing = client.get("/v1/events", params={"starting_after": "evt_missing"})
+    assert missing.status_code == 400
+
+    for created in ("not-a-date", "99999999999999999999", "-99999999999999"):
+        r = client.get("/v1/events", params={"created[gte]": created})
+        assert r.status_code == 400, created
+        assert r.json()["error"]["param"] == "created[gte]"
+
+
+@pytest.mark.fast
+def test_v1_events_list_quest_filter(client):
+    # The event log outlives a test run; a fresh scenario id keeps earlier runs out of the page.
+    quest = generate_id("scen_")
+    for idx in range(3):
+        for scenario in (quest, generate_id("scen_")):
+            client.post("/v1/events", json={"type": "quest_ping", "payload": {"scenario_id": scenario, "n": idx}})
+
+    first = client.get("/v1/events", params={"quest": quest, "limit": 2}).json()
+    assert [e["payload"]["n"] for e in first["data"]] == [2, 1]
+    assert first["has_more"] is True
+    rest = client.get(
+        "/v1/events", params={"quest": quest, "limit": 2, "starting_after": first["data"][-1]["id"]}
+    ).json()
+    assert [e["payload"]["n"] for e in rest["data"]] == [0]
+    assert rest["has_more"] is False
+    assert all(e["payload"]["scenario_id"] == quest for e in first["data"] + rest["data"])
+
+
+@pytest.mark.fast
+def test_v1_events_stream_rejects_malformed_last_event_id(client):
+    r = client.get("/v1/events/stream", headers={"Last-Event-ID": "evt_abc"})
+    assert r.status_code == 400
+    assert r.json()["error"]["param"] == "last_event_id"
+
+
 @pytest.mark.fast
 def test_demo_runtime_artifacts_visible_in_demo_mode(client):
     client.post(
@@ -1,7 +1,22 @@
+import asyncio
+import inspect
 import json
+import os
 import uuid
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+)
 
 import ollama
 import openai
@@ -69,7 +84,16 @@ class ToolError:
     error: str
 
 
-StreamEvent = TextDelta | ToolStart | ToolArgsDelta | ToolResult | ToolError
+@dataclass
+class DataPart:
+    """Custom ``data-<name>`` part; transient parts reach the client but are not kept in message history."""
+
+    name: str
+    data: Any
+    transient: bool = False
+
+
+StreamEvent = TextDelta | ToolStart | ToolArgsDelta | ToolResult | ToolError | DataPart
 
 
 # ---------------------------------------------------------------------------
@@ -77,42 +101,35 @@ StreamEvent = TextDelta | ToolStart | ToolArgsDelta | ToolResult | ToolError
 # ---------------------------------------------------------------------------
 
 
-def iter_openai_events(
-    messages: List[ClientMessage],
-    model: str = "gpt-4o-mini",
-    tool_definitions: Sequence[Dict[str, Any]] = (),
-    available_tools: Mapping[str, Callable[..., Any]] = {},
-    system_prompt: str = "",
-) -> Iterator[StreamEvent]:
+def _format_messages(messages: List[ClientMessage], system_prompt: str) -> List[Dict[str, str]]:
     formatted = [{"role": m.role, "content": extract_text(m)} for m in messages]
     if system_prompt:
         formatted.insert(0, {"role": "system", "content": system_prompt})
-    client = openai.OpenAI()
+    return formatted
 
-    stream = client.chat.completions.create(
-        model=model,
-        messages=formatted,  # type: ignore[arg-type]
-        stream=True,
-        tools=list(tool_definitions) or openai.NOT_GIVEN,  # type: ignore[arg-type]
-    )
 
-    tool_calls_state: Dict[int, Dict[str, Any]] = {}
-    finish_reason = None
+class _OpenAIChunkParser:
+    """Turns streamed chat-completion chunks into typed events, collecting tool calls."""
 
-    for chunk in stream:
+    def __init__(self) -> None:
+        self.tool_calls: Dict[int, Dict[str, Any]] = {}
+        self.finish_reason: Optional[str] = None
+
+    def feed(self, chunk: Any) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
         for choice in chunk.choices:
             if choice.finish_reason:
-                finish_reason = choice.finish_reason
+                self.finish_reason = choice.finish_reason
 
             delta = choice.delta
             if delta is None:
                 continue
 
             if delta.content:
-                yield TextDelta(text=delta.content)
+                events.append(TextDelta(text=delta.content))
 
             for tc in delta.tool_calls or []:
-                state = tool_calls_state.setdefault(
+                state = self.tool_calls.setdefault(
                     tc.index, {"id": None, "name": None, "arguments": "", "started": False}
                 )
                 if tc.id:
@@ -125,14 +142,20 @@ def iter_openai_events(
                         state["arguments"] += fn.arguments
 
                 if state["id"] and state["name"] and not state["started"]:
-                    yield ToolStart(tool_call_id=state["id"], tool_name=state["name"])
+                    events.append(ToolStart(tool_call_id=state["id"], tool_name=state["name"]))
                     state["started"] = True
 
                 if fn and fn.arguments and state["id"]:
-                    yield ToolArgsDelta(tool_call_id=state["id"], delta=fn.arguments)
-
-    if finish_reason == "tool_calls":
-        for state in tool_calls_state.values():
+                    events.append(ToolArgsDelta(tool_call_id=state["id"], delta=fn.arguments))
+        return events
+
+    def pending_calls(
+        self, available_tools: Mapping[str, Callable[..., Any]]
+    ) -> Iterator[tuple[str, Optional[Callable[..., Any]], Dict[str, Any], Optional[StreamEvent]]]:
+        """Yield ``(tool_call_id, fn, args, error)`` for each completed tool call."""
+        if self.finish_reason != "tool_calls":
+            return
+        for state in self.tool_calls.values():
             tool_call_id = state.get("id")
             tool_name = state.get("name")
             if not tool_call_id or not tool_name:
@@ -141,18 +164,44 @@ def iter_openai_events(
             try:
                 parsed = json.loads(state["arguments"]) if state["arguments"] else {}
             except Exception as e:
-                yield ToolError(tool_call_id=tool_call_id, error=str(e))
+                yield tool_call_id, None, {}, ToolError(tool_call_id=tool_call_id, error=str(e))
                 continue
 
             fn = available_tools.get(tool_name)
             if fn is None:
-                yield ToolError(tool_call_id=tool_call_id, error=f"Tool '{tool_name}' not found.")
+                yield tool_call_id, None, {}, ToolError(tool_call_id=tool_call_id, error=f"Tool '{tool_name}' not found.")
                 continue
+            yield tool_call_id, fn, parsed, None
 
-            try:
-                yield ToolResult(tool_call_id=tool_call_id, output=fn(**parsed))
-            except Exception as e:
-                yield ToolError(tool_call_id=tool_call_id, error=str(e))
+
+def iter_openai_events(
+    messages: List[ClientMessage],
+    model: str = "gpt-4o-mini",
+    tool_definitions: Sequence[Dict[str, Any]] = (),
+    available_tools: Mapping[str, Callable[..., Any]] = {},
+    system_prompt: str = "",
+) -> Iterator[StreamEvent]:
+    client = openai.OpenAI()
+
+    stream = client.chat.completions.create(
+        model=model,
+        messages=_format_messages(messages, system_prompt),  # type: ignore[arg-type]
+        stream=True,
+        tools=list(tool_definitions) or openai.NOT_GIVEN,  # type: ignore[arg-type]
+    )
+
+    parser = _OpenAIChunkParser()
+    for chunk in stream:
+        yield from parser.feed(chunk)
+
+    for tool_call_id, fn, args, error in parser.pending_calls(available_tools):
+        if error is not None:
+            yield error
+            continue
+        try:
+            yield ToolResult(tool_call_id=tool_call_id, output=fn(**args))
+        except Exception as e:
+            yield ToolError(tool_call_id=tool_call_id, error=str(e))
 
 
 def iter_ollama_events(
@@ -161,11 +210,166 @@ def iter_ollama_events(
     model: str,
     system_prompt: str = "",
 ) -> Iterator[StreamEvent]:
-    formatted = [{"role": m.role, "content": extract_text(m)} for m in messages]
-    if system_prompt:
-        formatted.insert(0, {"role": "system", "content": system_prompt})
     client = ollama.Client(host=host)
-    for chunk in client.chat(model=model, messages=formatted, stream=True):
+    for chunk in client.chat(model=model, messages=_format_messages(messages, system_prompt), stream=True):
+        if chunk.message.content:
+            yield TextDelta(text=chunk.message.content)
+
+
+# Async clients are shared so concurrent chats reuse one connection pool.
+_async_openai: Optional[openai.AsyncOpenAI] = None
+_async_ollama: Dict[str, ollama.AsyncClient] = {}
+
+
+def get_async_openai() -> openai.AsyncOpenAI:
+    global _async_openai
+    if _async_openai is None:
+        _async_openai = openai.AsyncOpenAI()
+    return _async_openai
+
+
+def get_async_ollama(host: str) -> ollama.AsyncClient:
+    client = _async_ollama.get(host)
+    if client is None:
+        client = _async_ollama[host] = ollama.AsyncClient(host=host)
+    return client
+
+
+def _tool_timeout() -> float:
+    return float(os.environ.get("AGENT_TOOL_TIMEOUT_SECONDS", "20"))
+
+
+async def _call_tool(fn: Callable[..., Any], args: Dict[str, Any]) -> Any:
+    # Sync tools run in a worker thread so a slow one cannot stall the stream.
+    if inspect.iscoroutinefunction(fn):
+        return await fn(**args)
+    output = await asyncio.to_thread(fn, **args)
+    if inspect.isawaitable(output):
+        output = await output
+    return output
+
+
+async def _run_tool_calls(
+    parser: _OpenAIChunkParser,
+    available_tools: Mapping[str, Callable[..., Any]],
+    timeout: float,
+) -> AsyncIterator[StreamEvent]:
+    """Run every completed tool call concurrently; yield results in completion order."""
+
+    async def run(tool_call_id: str, name: str, fn: Callable[..., Any], args: Dict[str, Any]) -> StreamEvent:
+        try:
+            output = await asyncio.wait_for(_call_tool(fn, args), timeout)
+        except asyncio.TimeoutError:
+            return ToolError(tool_call_id=tool_call_id, error=f"Tool '{name}' timed out after {timeout:g}s.")
+        except Exception as e:
+            return ToolError(tool_call_id=tool_call_id, error=str(e))
+        return ToolResult(tool_call_id=tool_call_id, output=output)
+
+    names = {state["id"]: state["name"] for state in parser.tool_calls.values()}
+    tasks = []
+    for tool_call_id, fn, args, error in parser.pending_calls(available_tools):
+        if error is not None:
+            yield error
+        else:
+            tasks.append(asyncio.create_task(run(tool_call_id, names[tool_call_id], fn, args)))
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away mid-call: do not leave tools running.
+        for task in tasks:
+            task.cancel()
+
+
+def _tool_turn(parser: _OpenAIChunkParser, text: str, results: List[StreamEvent]) -> List[Dict[str, Any]]:
+    """The assistant tool-call message plus one ``tool`` message per call, for the follow-up request."""
+    calls = [state for state in parser.tool_calls.values() if state["id"] and state["name"]]
+    turn: List[Dict[str, Any]] = [
+        {
+            "role": "assistant",
+            "content": text or None,
+            "tool_calls": [
+                {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"]}}
+                for c in calls
+            ],
+        }
+    ]
+    by_id = {r.tool_call_id: r for r in results}
+    for c in calls:
+        result = by_id.get(c["id"])
+        if isinstance(result, ToolResult):
+            content = result.output if isinstance(result.output, str) else json.dumps(result.output, default=str)
+        else:
+            content = f"Error: {result.error if result is not None else 'tool did not run'}"
+        turn.append({"role": "tool", "tool_call_id": c["id"], "content": content})
+    return turn
+
+
+async def aiter_openai_events(
+    messages: List[ClientMessage],
+    model: str = "gpt-4o-mini",
+    tool_definitions: Sequence[Dict[str, Any]] = (),
+    available_tools: Mapping[str, Callable[..., Any]] = {},
+    system_prompt: str = "",
+    client: Optional[openai.AsyncOpenAI] = None,
+    tool_timeout: Optional[float] = None,
+    max_tool_rounds: int = 3,
+) -> AsyncIterator[StreamEvent]:
+    """Async :func:`iter_openai_events` on the shared ``AsyncOpenAI`` client.
+
+    Tool calls from one model turn run concurrently (sync tools in threads),
+    each bounded by ``tool_timeout`` (``AGENT_TOOL_TIMEOUT_SECONDS``, default
+    20), and their results are emitted as they finish. The results are then
+    sent back to the model for a follow-up turn, up to ``max_tool_rounds``
+    times; the last turn is offered no tools so it has to answer.
+    """
+    client = client or get_async_openai()
+    timeout = tool_timeout if tool_timeout is not None else _tool_timeout()
+    conversation: List[Dict[str, Any]] = _format_messages(messages, system_prompt)
+
+    for round_idx in range(max_tool_rounds + 1):
+        offer_tools = bool(tool_definitions) and round_idx < max_tool_rounds
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=conversation,  # type: ignore[arg-type]
+            stream=True,
+            tools=list(tool_definitions) if offer_tools else openai.NOT_GIVEN,  # type: ignore[arg-type]
+        )
+
+        parser = _OpenAIChunkParser()
+        text: List[str] = []
+        async for chunk in stream:
+            for event in parser.feed(chunk):
+                if isinstance(event, TextDelta):
+                    text.append(event.text)
+                yield event
+
+        if parser.finish_reason != "tool_calls":
+            return
+
+        results: List[StreamEvent] = []
+        async for event in _run_tool_calls(parser, available_tools, timeout):
+            results.append(event)
+            yield event
+
+        if not tool_definitions:
+            # Tools were not offered through this call, so there is no turn to continue.
+            return
+        conversation = [*conversation, *_tool_turn(parser, "".join(text), results)]
+
+
+async def aiter_ollama_events(
+    messages: List[ClientMessage],
+    host: str,
+    model: str,
+    system_prompt: str = "",
+    client: Optional[ollama.AsyncClient] = None,
+) -> AsyncIterator[StreamEvent]:
+    """Async :func:`iter_ollama_events` on a shared ``ollama.AsyncClient`` per host."""
+    stream = await (client or get_async_ollama(host)).chat(
+        model=model, messages=_format_messages(messages, system_prompt), stream=True
+    )
+    async for chunk in stream:
         if chunk.message.content:
             yield TextDelta(text=chunk.message.content)
 
@@ -179,38 +383,82 @@ def _sse(payload: dict) -> str:
     return f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
 
 
-def wrap_stream(events: Iterable[StreamEvent]) -> Iterator[str]:
-    """Translate typed stream events into Vercel AI SDK SSE frames."""
-    message_id = f"msg-{uuid.uuid4().hex}"
+class _UIMessageFramer:
+    """Vercel AI SDK UI-message frames for one response, shared by the sync and async wrappers."""
+
     text_stream_id = "text-1"
-    text_started = False
 
-    yield _sse({"type": "start", "messageId": message_id})
+    def __init__(self) -> None:
+        self.message_id = f"msg-{uuid.uuid4().hex}"
+        self.text_started = False
 
-    for event in events:
+    def start(self) -> List[str]:
+        return [_sse({"type": "start", "messageId": self.message_id})]
+
+    def frames(self, event: StreamEvent) -> List[str]:
         if isinstance(event, TextDelta):
-            if not text_started:
-                yield _sse({"type": "text-start", "id": text_stream_id})
-                text_started = True
-            yield _sse({"type": "text-delta", "id": text_stream_id, "delta": event.text})
+            out = []
+            if not self.text_started:
+                out.append(_sse({"type": "text-start", "id": self.text_stream_id}))
+                self.text_started = True
+            out.append(_sse({"type": "text-delta", "id": self.text_stream_id, "delta": event.text}))
+            return out
+
+        if isinstance(event, ToolStart):
+            return [_sse({"type": "tool-input-start", "toolCallId": event.tool_call_id, "toolName": event.tool_name})]
 
-        elif isinstance(event, ToolStart):
-            yield _sse({"type": "tool-input-start", "toolCallId": event.tool_call_id, "toolName": event.tool_name})
+        if isinstance(event, ToolArgsDelta):
+            return [_sse({"type": "tool-input-delta", "toolCallId": event.tool_call_id, "inputTextDelta": event.delta})]
 
-        elif isinstance(event, ToolArgsDelta):
-            yield _sse({"type": "tool-input-delta", "toolCallId": event.tool_call_id, "inputTextDelta": event.delta})
+        if isinstance(event, ToolResult):
+            return [_sse({"type": "tool-output-available", "toolCallId": event.tool_call_id, "output": event.output})]
 
-        elif isinstance(event, ToolResult):
-            yield _sse({"type": "tool-output-available", "toolCallId": event.tool_call_id, "output": event.output})
+        if isinstance(event, ToolError):
+            return [_sse({"type": "tool-output-error", "toolCallId": event.tool_call_id, "errorText": event.error})]
 
-        elif isinstance(event, ToolError):
-            yield _sse({"type": "tool-output-error", "toolCallId": event.tool_call_id, "errorText": event.error})
+        if isinstance(event, DataPart):
+            part = {"type": f"data-{event.name}", "data": event.data}
+            if event.transient:
+                part["transient"] = True
+            return [_sse(part)]
+
+        return []
+
+    def end(self) -> List[str]:
+        out = [_sse({"type": "text-end", "id": self.text_stream_id})] if self.text_started else []
+        out.append(_sse({"type": "finish"}))
+        out.append("data: [DONE]\n\n")
+        return out
+
+
+def wrap_stream(events: Iterable[StreamEvent] | AsyncIterable[StreamEvent]) -> Iterator[str] | AsyncIterator[str]:
+    """Translate typed stream events into Vercel AI SDK SSE frames.
+
+    An async iterable gives an async generator, which Starlette streams on the
+    event loop instead of holding a threadpool thread for the whole response.
+    """
+    if isinstance(events, AsyncIterable):
+        return _awrap_stream(events)
+    return _wrap_stream(events)
+
+
+def _wrap_stream(events: Iterable[StreamEvent]) -> Iterator[str]:
+    framer = _UIMessageFramer()
+    yield from framer.start()
+    for event in events:
+        yield from framer.frames(event)
+    yield from framer.end()
 
-    if text_started:
-        yield _sse({"type": "text-end", "id": text_stream_id})
 
-    yield _sse({"type": "finish"})
-    yield "data: [DONE]\n\n"
+async def _awrap_stream(events: AsyncIterable[StreamEvent]) -> AsyncIterator[str]:
+    framer = _UIMessageFramer()
+    for frame in framer.start():
+        yield frame
+    async for event in events:
+        for frame in framer.frames(event):
+            yield frame
+    for frame in framer.end():
+        yield frame
 
 
 def patch_response_with_headers(response: StreamingResponse) -> StreamingResponse:
@@ -219,5 +467,5 @@ def patch_response_with_headers(response: StreamingResponse) -> StreamingRespons
     response.headers["Cache-Control"] = "no-cache"
     response.headers["Connection"] = "keep-alive"
     response.headers["X-Accel-Buffering"] = "no"
-    response.headers["Access-Control-Expose-Headers"] = "x-porthon-intent"
+    response.headers["Access-Control-Expose-Headers"] = "x-porthon-intent, Server-Timing"
     return response